@@ -7,11 +7,22 @@ load_dotenv()
 # Gemini Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Store the system instruction and knowledge block with Gemini context caching
+# (needs an explicit model version such as models/gemini-1.5-flash-002)
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+# Smaller system instructions are sent inline; the API rejects caches below its minimum size
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "32768"))
 
 # Application Settings
 APP_NAME = os.getenv("APP_NAME", "Diamond Chatbot")
 APP_VERSION = os.getenv("APP_VERSION", "1.0.0")
 
+# Logging Settings (the file rotates once it reaches LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old files)
+LOG_FILE = os.getenv("LOG_FILE", "logs/app.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
 # Excel Data Path
 EXCEL_FILE_PATH = os.getenv("EXCEL_FILE_PATH", "data/diamonds.xlsx")
 
@@ -23,3 +34,120 @@ CORS_ORIGINS = cors_env.split(",") if cors_env else []
 # Image Data Settings
 IMAGE_DATA_DIR = os.getenv("IMAGE_DATA_DIR", "app/cygni_data")
 DATA_CACHE_FILE = os.getenv("DATA_CACHE_FILE", "data/extracted_data.json")
+IMAGE_CACHE_FILE = os.getenv("IMAGE_CACHE_FILE", "data/image_analysis.jsonl")
+IMAGE_INGEST_WORKERS = int(os.getenv("IMAGE_INGEST_WORKERS", "8"))
+IMAGE_INGEST_MAX_RETRIES = int(os.getenv("IMAGE_INGEST_MAX_RETRIES", "3"))
+IMAGE_INGEST_BACKOFF = float(os.getenv("IMAGE_INGEST_BACKOFF", "1.0"))
+# Photos are upright-rotated, downsampled to IMAGE_MAX_EDGE pixels and re-encoded
+# ("jpeg" or "webp" at IMAGE_QUALITY) before upload; derived files are cached by content hash
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "jpeg").lower()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_DERIVED_DIR = os.getenv("IMAGE_DERIVED_DIR", "data/image_derived")
+# Photos whose perceptual hashes differ in at most this many of 64 bits share one analysis
+IMAGE_DEDUPE = os.getenv("IMAGE_DEDUPE", "true").lower() == "true"
+IMAGE_DEDUPE_DISTANCE = int(os.getenv("IMAGE_DEDUPE_DISTANCE", "0"))
+
+# Retrieval Settings
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_EMBEDDING_BACKEND = os.getenv("RETRIEVAL_EMBEDDING_BACKEND", "")
+
+# How diamond rows are rendered for the model: "blocks" (one labelled field per
+# line) or "table" (header once, one pipe-separated line per diamond)
+KNOWLEDGE_TEXT_FORMAT = os.getenv("KNOWLEDGE_TEXT_FORMAT", "blocks").lower()
+
+# Inventory Reload Settings (seconds between source checks, 0 disables the watcher)
+KNOWLEDGE_RELOAD_INTERVAL = float(os.getenv("KNOWLEDGE_RELOAD_INTERVAL", "10"))
+# Compiled columnar snapshot, memory-mapped at startup when the sources are unchanged
+KNOWLEDGE_SNAPSHOT_DIR = os.getenv("KNOWLEDGE_SNAPSHOT_DIR", "data/knowledge_snapshot")
+
+# Chat History Database Settings
+DB_FILE = os.getenv("DB_FILE", "chat_history.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# Queue inserts and write them in batched transactions from a background thread
+DB_WRITE_BEHIND = os.getenv("DB_WRITE_BEHIND", "false").lower() == "true"
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "500"))
+DB_WRITE_FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "0.005"))
+
+# Chat History Retention (sessions idle for CHAT_RETENTION_DAYS are moved to gzip JSONL
+# archives, one file per day of last activity, and deleted from the database in batches
+# of CHAT_RETENTION_BATCH_SESSIONS; 0 days keeps everything in the database)
+CHAT_RETENTION_DAYS = float(os.getenv("CHAT_RETENTION_DAYS", "30"))
+CHAT_RETENTION_INTERVAL = float(os.getenv("CHAT_RETENTION_INTERVAL", "3600"))
+CHAT_RETENTION_BATCH_SESSIONS = int(os.getenv("CHAT_RETENTION_BATCH_SESSIONS", "200"))
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "data/chat_archive")
+# VACUUM after a retention run once this share of the database file is free pages
+CHAT_VACUUM_FREE_RATIO = float(os.getenv("CHAT_VACUUM_FREE_RATIO", "0.25"))
+
+# Session Cache Settings (recent turns per session held in memory)
+SESSION_CACHE_MAX_SESSIONS = int(os.getenv("SESSION_CACHE_MAX_SESSIONS", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "1800"))
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Check a cached session's message count against SQLite before each use, so turns
+# written by other workers are seen; only needed with several workers and no sticky sessions
+SESSION_CACHE_VALIDATE = os.getenv("SESSION_CACHE_VALIDATE", "false").lower() == "true"
+
+# History Window Settings (conversation sent per request: a rolling summary of
+# older turns plus the most recent messages verbatim; a budget of 0 sends the raw history)
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+HISTORY_RECENT_MESSAGES = int(os.getenv("HISTORY_RECENT_MESSAGES", "12"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+
+# Chat model backend: "gemini", or "stub" for load tests without an API key
+# (fixed latency to the first token, output tokens per second, reply length and
+# concurrent calls accepted before answering 429, 0 = unlimited)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0.5"))
+LLM_STUB_TOKENS_PER_SECOND = float(os.getenv("LLM_STUB_TOKENS_PER_SECOND", "100"))
+LLM_STUB_REPLY_TOKENS = int(os.getenv("LLM_STUB_REPLY_TOKENS", "40"))
+LLM_STUB_CONCURRENCY = int(os.getenv("LLM_STUB_CONCURRENCY", "0"))
+# Injected slow responses: this share of stub calls waits LLM_STUB_SLOW_LATENCY extra seconds
+LLM_STUB_SLOW_RATE = float(os.getenv("LLM_STUB_SLOW_RATE", "0"))
+LLM_STUB_SLOW_LATENCY = float(os.getenv("LLM_STUB_SLOW_LATENCY", "5"))
+
+# LLM Dispatch Settings (concurrent model calls, calls queued beyond that before
+# requests are turned away with 429, requests per second with bursts, 0 rate = unlimited,
+# and the pause after the provider answers 429/503)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "0"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+LLM_PROVIDER_BACKOFF = float(os.getenv("LLM_PROVIDER_BACKOFF", "10"))
+
+# Chat Deadline Settings (seconds a chat request may take before its model call is
+# cancelled and it gets 504, 0 = no deadline)
+CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE", "30"))
+# Hedged model calls: once a chat call has run longer than LLM_HEDGE_PERCENTILE of recent
+# calls (and at least LLM_HEDGE_MIN_DELAY seconds), a second one is sent and the first to
+# answer wins; at most LLM_HEDGE_BUDGET of calls are hedged, and only while slots are free
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+
+# Live Gemini chat sessions reused across turns of a conversation
+CHAT_SESSION_POOL_SIZE = int(os.getenv("CHAT_SESSION_POOL_SIZE", "2000"))
+CHAT_SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_IDLE_TTL", "900"))
+
+# WebSocket Chat Settings (open connections per worker, 0 = unlimited, and seconds
+# between heartbeat events on a quiet connection, 0 = none)
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "10000"))
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+
+# Greeting Pool Settings (pre-generated greetings handed to new sessions; size 0 generates per session)
+GREETING_POOL_SIZE = int(os.getenv("GREETING_POOL_SIZE", "20"))
+GREETING_POOL_CONCURRENCY = int(os.getenv("GREETING_POOL_CONCURRENCY", "4"))
+GREETING_POOL_RETRY_DELAY = float(os.getenv("GREETING_POOL_RETRY_DELAY", "30"))
+
+# Response Cache Settings (replies to repeated standalone questions)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Minimum trigram Jaccard similarity for a near-duplicate hit (1 = exact matches only)
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.75"))
+RESPONSE_CACHE_MIN_WORDS = int(os.getenv("RESPONSE_CACHE_MIN_WORDS", "4"))
+
+# Fast Path Settings (factual inventory questions answered from the index without a model call)
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_MAX_WORDS = int(os.getenv("FAST_PATH_MAX_WORDS", "20"))
@@ -1,75 +1,523 @@
 
+import asyncio
+import queue
 import sqlite3
-from typing import List, Dict, Any
-from datetime import datetime
-import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple, TypeVar
+from app.config import (
+    DB_FILE as DEFAULT_DB_FILE, DB_POOL_SIZE,
+    DB_WRITE_BEHIND, DB_WRITE_BATCH_SIZE, DB_WRITE_FLUSH_INTERVAL
+)
 from app.utils.logger import logger
 
-DB_FILE = "chat_history.db"
+DB_FILE = DEFAULT_DB_FILE
+
+T = TypeVar("T")
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    # WAL lets readers proceed while a write is in progress; NORMAL sync is
+    # durable across application crashes and only fsyncs at checkpoints
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
     return conn
 
-def init_db():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+
+class ConnectionPool:
+    """Fixed-size pool of reusable SQLite connections"""
+
+    def __init__(self, size: int = DB_POOL_SIZE):
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return get_db_connection()
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; the transaction is committed or rolled back on return"""
+        conn = self._acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+
+
+class WriteBehindQueue:
+    """Background writer that batches queued inserts into single transactions"""
+
+    # A batch that fails to commit (e.g. the database is locked) is rolled back and retried
+    WRITE_ATTEMPTS = 5
+    RETRY_DELAY = 0.1
+
+    def __init__(self, pool: ConnectionPool,
+                 batch_size: int = DB_WRITE_BATCH_SIZE,
+                 flush_interval: float = DB_WRITE_FLUSH_INTERVAL):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Tuple[str, str, str, str]]]" = queue.Queue()
+        # Messages still queued, per session, so reads can include them without waiting
+        self._unwritten: Dict[str, List[Dict[str, Any]]] = {}
+        # Odd while a batch is being committed, bumped again once it is visible and removed above
+        self._generation = 0
+        self._committed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def submit(self, session_id: str, role: str, content: str) -> None:
+        # Stamped now, in CURRENT_TIMESTAMP's format, so queued and stored copies agree
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        with self._committed:
+            self._unwritten.setdefault(session_id, []).append(
+                {"role": role, "content": content, "timestamp": timestamp}
             )
-        ''')
-        conn.commit()
-        conn.close()
+        self._queue.put((session_id, role, content, timestamp))
+
+    def read(self, session_id: str, query: Callable[[], T]) -> Tuple[T, List[Dict[str, Any]]]:
+        """Run a query for one session, plus that session's messages queued but not yet in its result"""
+        for _ in range(5):
+            with self._committed:
+                self._committed.wait_for(lambda: self._generation % 2 == 0)
+                generation = self._generation
+                queued = list(self._unwritten.get(session_id, ()))
+            result = query()
+            # No batch committed meanwhile, so nothing queued is also in the result
+            if self._generation == generation:
+                return result, queued
+        self.flush()
+        return query(), []
+
+    def flush(self) -> None:
+        """Block until every queued message has been written"""
+        self._queue.join()
+
+    def stop(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            row = self._queue.get()
+            batch = [row]
+            # Give concurrent writers a moment to join this transaction
+            if row is not None and self.flush_interval > 0:
+                time.sleep(self.flush_interval)
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [item for item in batch if item is not None]
+            try:
+                if rows:
+                    self._write(rows)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if len(rows) < len(batch):
+                return
+
+    def _write(self, rows: List[Tuple[str, str, str, str]]) -> None:
+        """Commit one batch, then drop its rows from the per-session queued messages"""
+        for attempt in range(1, self.WRITE_ATTEMPTS + 1):
+            with self._committed:
+                self._generation += 1
+            written = False
+            try:
+                with self.pool.connection() as conn:
+                    conn.executemany(
+                        'INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)',
+                        rows
+                    )
+                written = True
+            except Exception as e:
+                logger.error(f"Error writing {len(rows)} batched messages to DB (attempt {attempt}): {e}")
+            finally:
+                with self._committed:
+                    # A failed attempt was rolled back, so its rows stay queued for the next one
+                    if written or attempt == self.WRITE_ATTEMPTS:
+                        for session_id, *_ in rows:
+                            queued = self._unwritten[session_id]
+                            queued.pop(0)
+                            if not queued:
+                                del self._unwritten[session_id]
+                    self._generation += 1
+                    self._committed.notify_all()
+            if written:
+                return
+            if attempt < self.WRITE_ATTEMPTS:
+                time.sleep(self.RETRY_DELAY * 2 ** (attempt - 1))
+        logger.error(f"Dropped {len(rows)} batched messages after {self.WRITE_ATTEMPTS} failed writes")
+
+
+_pool: Optional[ConnectionPool] = None
+_writer: Optional[WriteBehindQueue] = None
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool()
+    return _pool
+
+
+def init_db(write_behind: bool = DB_WRITE_BEHIND):
+    global _writer
+    try:
+        close_db()
+        with get_pool().connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_messages_session_id_id
+                ON messages (session_id, id)
+            ''')
+            # Rolling summary of the turns that no longer fit in the history window;
+            # covered is how many of the session's oldest messages it includes
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS session_summaries (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    covered INTEGER NOT NULL,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # Sessions moved out of messages by retention: each batch is one gzip
+            # member of a daily archive file, found again by its byte range
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS archived_sessions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    archive TEXT NOT NULL,
+                    member_offset INTEGER NOT NULL,
+                    member_length INTEGER NOT NULL,
+                    messages INTEGER NOT NULL,
+                    last_message_at DATETIME,
+                    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_archived_sessions_session_id
+                ON archived_sessions (session_id, id)
+            ''')
+        if write_behind:
+            _writer = WriteBehindQueue(get_pool())
         logger.info("Database initialized successfully.")
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
 
+def close_db():
+    """Flush queued writes and close pooled connections"""
+    global _pool, _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
 def save_message(session_id: str, role: str, content: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)',
-            (session_id, role, content)
-        )
-        conn.commit()
-        conn.close()
+        if _writer is not None:
+            _writer.submit(session_id, role, content)
+            return
+        with get_pool().connection() as conn:
+            conn.execute(
+                'INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)',
+                (session_id, role, content)
+            )
         logger.info(f"Message saved to DB for session {session_id}")
     except Exception as e:
         logger.error(f"Error saving message to DB: {e}")
 
 def get_chat_history(session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        # Get the most recent messages, then sort them back to chronological order
-        cursor.execute(
-            '''
-            SELECT role, content, timestamp 
-            FROM (
-                SELECT role, content, timestamp 
-                FROM messages 
-                WHERE session_id = ? 
-                ORDER BY timestamp DESC 
+        def query() -> List[Dict[str, Any]]:
+            with get_pool().connection() as conn:
+                # Walk the (session_id, id) index backwards for the most recent
+                # messages; id gives a stable order where timestamps tie
+                rows = conn.execute(
+                    '''
+                    SELECT role, content, timestamp
+                    FROM messages
+                    WHERE session_id = ?
+                    ORDER BY id DESC
+                    LIMIT ?
+                    ''',
+                    (session_id, limit)
+                ).fetchall()
+            return [dict(row) for row in reversed(rows)]
+
+        if _writer is None:
+            return query()
+        # Read-your-writes: add the session's queued messages instead of waiting for them
+        stored, queued = _writer.read(session_id, query)
+        return (stored + queued)[-limit:] if limit > 0 else []
+    except Exception as e:
+        logger.error(f"Error retrieving chat history: {e}")
+        return []
+
+def count_messages(session_id: str) -> int:
+    """Number of messages stored for a session"""
+    try:
+        def query() -> int:
+            with get_pool().connection() as conn:
+                return conn.execute(
+                    'SELECT COUNT(*) FROM messages WHERE session_id = ?',
+                    (session_id,)
+                ).fetchone()[0]
+
+        if _writer is None:
+            return query()
+        stored, queued = _writer.read(session_id, query)
+        return stored + len(queued)
+    except Exception as e:
+        logger.error(f"Error counting messages: {e}")
+        return 0
+
+def get_session_summary(session_id: str) -> Optional[Dict[str, Any]]:
+    """Rolling summary of a session as {"summary", "covered"}, or None if there is none"""
+    try:
+        with get_pool().connection() as conn:
+            row = conn.execute(
+                'SELECT summary, covered FROM session_summaries WHERE session_id = ?',
+                (session_id,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+    except Exception as e:
+        logger.error(f"Error retrieving session summary: {e}")
+        return None
+
+def save_session_summary(session_id: str, summary: str, covered: int):
+    try:
+        with get_pool().connection() as conn:
+            conn.execute(
+                '''
+                INSERT INTO session_summaries (session_id, summary, covered, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    summary = excluded.summary,
+                    covered = excluded.covered,
+                    updated_at = excluded.updated_at
+                ''',
+                (session_id, summary, covered)
+            )
+    except Exception as e:
+        logger.error(f"Error saving session summary: {e}")
+
+def _last_id_before(conn: sqlite3.Connection, before: str) -> int:
+    """Largest message id stamped before a timestamp, by binary search (ids grow with time)"""
+    low, high = conn.execute('SELECT MIN(id), MAX(id) FROM messages').fetchone()
+    found = 0
+    while low is not None and low <= high:
+        row = conn.execute(
+            'SELECT id, timestamp FROM messages WHERE id >= ? ORDER BY id LIMIT 1',
+            ((low + high) // 2,)
+        ).fetchone()
+        if row is not None and row["timestamp"] < before:
+            found, low = row["id"], row["id"] + 1
+        else:
+            high = (low + high) // 2 - 1
+    return found
+
+def find_idle_sessions(before: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Sessions with no message since a UTC timestamp ('YYYY-MM-DD HH:MM:SS')
+
+    Returns up to limit sessions as {"session_id", "last_id", "messages",
+    "last_message_at"}, least recently active first.
+    """
+    try:
+        with get_pool().connection() as conn:
+            last_id = _last_id_before(conn, before)
+            if not last_id:
+                return []
+            # Covered by the (session_id, id) index apart from one lookup per session
+            rows = conn.execute(
+                '''
+                SELECT s.session_id, s.last_id, s.messages, m.timestamp AS last_message_at
+                FROM (
+                    SELECT session_id, MAX(id) AS last_id, COUNT(*) AS messages
+                    FROM messages
+                    GROUP BY session_id
+                    HAVING MAX(id) <= ?
+                ) AS s
+                JOIN messages AS m ON m.id = s.last_id
+                ORDER BY s.last_id
                 LIMIT ?
-            ) 
-            ORDER BY timestamp ASC
+                ''',
+                (last_id, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        logger.error(f"Error finding idle sessions: {e}")
+        return []
+
+def iter_session_messages(sessions: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Messages of each session up to its last_id, session by session, oldest first"""
+    with get_pool().connection() as conn:
+        for session in sessions:
+            cursor = conn.execute(
+                '''
+                SELECT session_id, role, content, timestamp
+                FROM messages
+                WHERE session_id = ? AND id <= ?
+                ORDER BY id
+                ''',
+                (session["session_id"], session["last_id"])
+            )
+            for row in cursor:
+                yield dict(row)
+
+def archive_sessions(segments: List[Dict[str, Any]]) -> int:
+    """
+    Record where sessions were archived and delete them from the database
+
+    Each segment is a session from find_idle_sessions plus its "archive",
+    "member_offset" and "member_length". Runs as one short transaction;
+    messages a session received after its last_id stay in place. Its
+    rolling summary is dropped, since it counts messages that are gone.
+    Returns the number of messages deleted.
+    """
+    with get_pool().connection() as conn:
+        conn.executemany(
+            '''
+            INSERT INTO archived_sessions
+                (session_id, archive, member_offset, member_length, messages, last_message_at)
+            VALUES (:session_id, :archive, :member_offset, :member_length, :messages, :last_message_at)
             ''',
-            (session_id, limit)
+            segments
+        )
+        deleted = 0
+        for segment in segments:
+            deleted += conn.execute(
+                'DELETE FROM messages WHERE session_id = ? AND id <= ?',
+                (segment["session_id"], segment["last_id"])
+            ).rowcount
+        conn.executemany(
+            'DELETE FROM session_summaries WHERE session_id = ?',
+            [(segment["session_id"],) for segment in segments]
         )
-        rows = cursor.fetchall()
-        conn.close()
+    return deleted
+
+def get_archived_segments(session_id: str) -> List[Dict[str, Any]]:
+    """Archive locations of a session, oldest first"""
+    try:
+        with get_pool().connection() as conn:
+            rows = conn.execute(
+                '''
+                SELECT archive, member_offset, member_length, messages, last_message_at
+                FROM archived_sessions
+                WHERE session_id = ?
+                ORDER BY id
+                ''',
+                (session_id,)
+            ).fetchall()
         return [dict(row) for row in rows]
     except Exception as e:
-        logger.error(f"Error retrieving chat history: {e}")
+        logger.error(f"Error retrieving archived segments: {e}")
         return []
 
-# Initialize DB on import
-init_db()
+def iter_messages(session_id: str, page_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """Every stored message of a session, oldest first, read a page at a time"""
+    if _writer is not None and _writer.pending:
+        _writer.flush()
+    after = 0
+    while True:
+        with get_pool().connection() as conn:
+            rows = conn.execute(
+                '''
+                SELECT id, role, content, timestamp
+                FROM messages
+                WHERE session_id = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+                ''',
+                (session_id, after, page_size)
+            ).fetchall()
+        for row in rows:
+            yield {"role": row["role"], "content": row["content"], "timestamp": row["timestamp"]}
+        if len(rows) < page_size:
+            return
+        after = rows[-1]["id"]
+
+def optimize_db(vacuum_free_ratio: float) -> Dict[str, Any]:
+    """
+    Refresh query planner statistics, and VACUUM when enough of the file is free pages
+
+    VACUUM rewrites the whole file and holds off writers while it runs, so it
+    only happens after deletes have freed vacuum_free_ratio of the pages.
+    """
+    result = {"analyzed": False, "vacuumed": False, "free_ratio": 0.0}
+    try:
+        with get_pool().connection() as conn:
+            conn.execute('ANALYZE')
+            result["analyzed"] = True
+            pages = conn.execute('PRAGMA page_count').fetchone()[0]
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            result["free_ratio"] = free / pages if pages else 0.0
+            if 0 < vacuum_free_ratio <= result["free_ratio"]:
+                conn.execute('VACUUM')
+                # Don't leave a copy of the whole database in the WAL file
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                result["vacuumed"] = True
+    except Exception as e:
+        logger.error(f"Error optimizing database: {e}")
+    return result
+
+async def save_message_async(session_id: str, role: str, content: str):
+    """Save a message without blocking the event loop"""
+    await asyncio.to_thread(save_message, session_id, role, content)
+
+async def get_chat_history_async(session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Retrieve chat history without blocking the event loop"""
+    return await asyncio.to_thread(get_chat_history, session_id, limit)
+
+async def count_messages_async(session_id: str) -> int:
+    """Count a session's messages without blocking the event loop"""
+    return await asyncio.to_thread(count_messages, session_id)
+
+async def get_session_summary_async(session_id: str) -> Optional[Dict[str, Any]]:
+    """Retrieve a session summary without blocking the event loop"""
+    return await asyncio.to_thread(get_session_summary, session_id)
+
+async def save_session_summary_async(session_id: str, summary: str, covered: int):
+    """Save a session summary without blocking the event loop"""
+    await asyncio.to_thread(save_session_summary, session_id, summary, covered)
@@ -1,16 +1,50 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import APP_NAME, APP_VERSION, CORS_ORIGINS
-from app.routes import chat
+from app.database import init_db, close_db
+from app.routes import chat, diamonds, insight, knowledge
+from app.services.chat_service import chat_service
+from app.services.gemini_client import gemini_client
+from app.services.history_retention import history_retention
+from app.services.knowledge_base import knowledge_base, knowledge_watcher
 
 from app.utils.logger import logger
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load state and start background workers on startup, stop them on shutdown"""
+    start = time.perf_counter()
+    init_db()
+    # Loads the prebuilt snapshot when the inventory sources are unchanged
+    await asyncio.to_thread(knowledge_base.load)
+    gemini_client.warm_up()
+    knowledge_watcher.start()
+    # Pre-generate greetings in the background so the first visitors don't wait
+    chat_service.greeting_pool.refill()
+    # Archive sessions idle past the retention period, dropping them from the caches too
+    history_retention.on_archived = chat_service.forget_sessions
+    history_retention.start()
+    logger.info(f"Startup completed in {time.perf_counter() - start:.3f}s")
+    yield
+    await chat_service.greeting_pool.stop()
+    await chat_service.history_manager.stop()
+    await history_retention.stop()
+    knowledge_watcher.stop()
+    # Flushes any queued write-behind inserts
+    close_db()
+
+
 # Create FastAPI app
 app = FastAPI(
     title=APP_NAME,
     version=APP_VERSION,
-    description="Diamond chatbot API with knowledge-based responses"
+    description="Diamond chatbot API with knowledge-based responses",
+    lifespan=lifespan
 )
 
 
@@ -25,3 +59,6 @@ app.add_middleware(
 
 # Include routers
 app.include_router(chat.router)
+app.include_router(diamonds.router)
+app.include_router(knowledge.router)
+app.include_router(insight.router)
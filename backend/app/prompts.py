@@ -23,6 +23,16 @@ CHAT_SYSTEM_INSTRUCTION = (
     "If you don't know something, say you'll check with the team."
 )
 
+HISTORY_SUMMARY_PROMPT = (
+    "You keep running notes on a chat between a customer and a diamond store assistant. "
+    "Update the notes with the new messages below. Keep what the customer is looking for "
+    "(shape, carat, color, clarity, cut, budget, occasion), specific diamonds or items discussed "
+    "with their prices, decisions made and open questions. Drop greetings and small talk. "
+    "Write plain sentences, no more than {max_words} words, and reply with the notes only.\n\n"
+    "Current notes:\n{summary}\n\n"
+    "New messages:\n{messages}"
+)
+
 
 def format_chat_system_prompt(context: str) -> str:
     """Combines the system instruction with the provided context."""
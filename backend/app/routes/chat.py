@@ -1,16 +1,32 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Iterator
+
+from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
+from app.config import CHAT_DEADLINE
 from app.schemas.chat import ChatRequest, ChatResponse
+from app.services.chat_connections import connection_manager
 from app.services.chat_service import chat_service
+from app.services.gemini_client import gemini_client
+from app.services.history_retention import history_retention
+from app.services.llm_dispatch import LLMUnavailable, deadline_after
 from app.utils.logger import logger
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Messages written per chunk of the history export
+HISTORY_EXPORT_CHUNK = 200
+
 
 @router.post("", response_model=ChatResponse)
 async def chat(request: ChatRequest) -> ChatResponse:
     """
     Chat endpoint for diamond chatbot
     
+    Requests whose reply takes longer than CHAT_DEADLINE seconds get 504.
+
     - **message**: User's message
     - **session_id**: Unique session identifier for conversation tracking
     """
@@ -18,9 +34,10 @@ async def chat(request: ChatRequest) -> ChatResponse:
         logger.info(f"Received chat request from session: {request.session_id}")
         
         # Process message and get response
-        bot_response = chat_service.process_message(
+        bot_response = await chat_service.process_message(
             session_id=request.session_id,
-            user_message=request.message
+            user_message=request.message,
+            deadline=deadline_after(CHAT_DEADLINE)
         )
         
         return ChatResponse(
@@ -28,6 +45,8 @@ async def chat(request: ChatRequest) -> ChatResponse:
             session_id=request.session_id
         )
         
+    except LLMUnavailable as e:
+        raise _unavailable(e)
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(
@@ -36,6 +55,83 @@ async def chat(request: ChatRequest) -> ChatResponse:
         )
 
 
+def _unavailable(error: LLMUnavailable) -> HTTPException:
+    """429/503 response asking the client to retry later"""
+    logger.warning(f"Turned chat request away: {str(error)}")
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def _sse_event(data: dict, event: str = None) -> str:
+    """Format a Server-Sent Event frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest) -> StreamingResponse:
+    """
+    Streaming chat endpoint (Server-Sent Events)
+
+    Emits one `data: {"token": "..."}` event per generated chunk, followed by
+    an `event: done` event once the full reply has been saved.
+
+    - **message**: User's message
+    - **session_id**: Unique session identifier for conversation tracking
+    """
+    logger.info(f"Received streaming chat request from session: {request.session_id}")
+    # Fail fast with a status code while one can still be sent
+    try:
+        gemini_client.dispatcher.check()
+    except LLMUnavailable as e:
+        raise _unavailable(e)
+    deadline = deadline_after(CHAT_DEADLINE)
+
+    async def event_stream() -> AsyncIterator[str]:
+        stream = chat_service.stream_message(
+            session_id=request.session_id,
+            user_message=request.message,
+            deadline=deadline
+        )
+        try:
+            # Closed even if the client disconnects mid-reply, so the partial reply is saved
+            async with aclosing(stream):
+                async for token in stream:
+                    yield _sse_event({"token": token})
+            yield _sse_event({"session_id": request.session_id}, event="done")
+        except LLMUnavailable as e:
+            yield _sse_event({"detail": str(e), "retry_after": e.retry_after}, event="error")
+        except Exception as e:
+            logger.error(f"Error in chat stream endpoint: {str(e)}")
+            yield _sse_event({"detail": f"Error processing chat message: {str(e)}"}, event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def chat_ws(websocket: WebSocket, session_id: str) -> None:
+    """
+    Persistent chat channel (WebSocket)
+
+    The session is bound once when the connection opens and answered with a
+    `session` event carrying the greeting. Each `{"type": "message"}` event is
+    answered with `typing`, `token` and `done` events; `heartbeat` events keep
+    a quiet connection alive. See app/services/chat_connections.py for the
+    full protocol.
+
+    - **session_id**: Unique session identifier (query parameter)
+    """
+    logger.info(f"Chat connection opened for session: {session_id}")
+    await connection_manager.serve(websocket, session_id)
+
+
 @router.get("/greeting/{session_id}", response_model=ChatResponse)
 async def get_greeting(session_id: str) -> ChatResponse:
     """
@@ -46,7 +142,7 @@ async def get_greeting(session_id: str) -> ChatResponse:
     try:
         logger.info(f"Getting greeting for session: {session_id}")
         
-        greeting_message = chat_service.get_greeting(session_id)
+        greeting_message = await chat_service.get_greeting(session_id)
         
         return ChatResponse(
             message=greeting_message,
@@ -59,3 +155,34 @@ async def get_greeting(session_id: str) -> ChatResponse:
             status_code=500,
             detail=f"Error getting greeting: {str(e)}"
         )
+
+
+def _ndjson_chunks(messages: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """One JSON object per line, a few hundred lines per chunk"""
+    lines = []
+    for message in messages:
+        lines.append(json.dumps(message, ensure_ascii=False) + "\n")
+        if len(lines) >= HISTORY_EXPORT_CHUNK:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+@router.get("/history/{session_id}")
+async def get_history(session_id: str) -> StreamingResponse:
+    """
+    Export a session's full conversation as NDJSON, oldest message first
+
+    Each line is `{"role", "content", "timestamp"}`. Messages of sessions
+    already moved to the archive are read from it, then the ones still in
+    the database; nothing is loaded into memory as a whole.
+
+    - **session_id**: Unique session identifier
+    """
+    if not await asyncio.to_thread(history_retention.has_history, session_id):
+        raise HTTPException(status_code=404, detail=f"No chat history for session {session_id}")
+    return StreamingResponse(
+        _ndjson_chunks(history_retention.export(session_id)),
+        media_type="application/x-ndjson"
+    )
@@ -0,0 +1,53 @@
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from app.schemas.diamonds import DiamondSearchResponse
+from app.services.knowledge_base import knowledge_base
+from app.utils.logger import logger
+
+router = APIRouter(prefix="/diamonds", tags=["diamonds"])
+
+
+@router.get("/search", response_model=DiamondSearchResponse)
+async def search_diamonds(
+    carat_min: Optional[float] = Query(None, ge=0),
+    carat_max: Optional[float] = Query(None, ge=0),
+    price_min: Optional[float] = Query(None, ge=0),
+    price_max: Optional[float] = Query(None, ge=0),
+    cut: Optional[List[str]] = Query(None),
+    color: Optional[List[str]] = Query(None),
+    clarity: Optional[List[str]] = Query(None),
+    shape: Optional[List[str]] = Query(None),
+    sort_by: Optional[Literal["carat", "price"]] = None,
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(20, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+) -> DiamondSearchResponse:
+    """
+    Search the diamond inventory
+
+    - **carat_min / carat_max**: Inclusive carat range
+    - **price_min / price_max**: Inclusive price range
+    - **cut / color / clarity / shape**: Repeat to match any of several values, e.g. `color=D&color=E`
+    - **sort_by**: `carat` or `price`, with **order** `asc` or `desc`
+    - **limit / offset**: Page of results to return
+    """
+    try:
+        result = knowledge_base.query_diamonds(
+            ranges={"carat": (carat_min, carat_max), "price": (price_min, price_max)},
+            members={"cut": cut, "color": color, "clarity": clarity, "shape": shape},
+            sort_by=sort_by,
+            descending=order == "desc",
+            limit=limit,
+            offset=offset,
+        )
+        return DiamondSearchResponse(**result)
+
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unsupported filter for this inventory: {e.args[0]}")
+    except Exception as e:
+        logger.error(f"Error searching diamonds: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error searching diamonds: {str(e)}"
+        )
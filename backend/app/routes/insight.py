@@ -0,0 +1,90 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from app.services.chat_connections import connection_manager
+from app.services.chat_service import chat_service
+from app.services.fast_path import fast_path
+from app.services.gemini_client import gemini_client
+from app.services.history_retention import history_retention
+from app.services.image_preprocessing import image_preprocessor
+from app.services.knowledge_base import knowledge_base
+from app.utils.logger import read_logs
+from app.utils.metrics import (
+    HISTOGRAMS, chat_stage_seconds, llm_generation_seconds, llm_queue_wait_seconds, render_prometheus
+)
+
+router = APIRouter(tags=["insight"])
+
+
+def _component_stats() -> Dict[str, Any]:
+    """Counters of the caches, pools and model dispatcher in this worker"""
+    snapshot = knowledge_base.snapshot
+    return {
+        "knowledge": {
+            "version": snapshot.version,
+            "loaded_at": snapshot.loaded_at,
+            "diamonds": len(snapshot.diamond_documents),
+            "catalog_items": len(snapshot.image_documents),
+        },
+        "session_cache": chat_service.session_cache.stats(),
+        "fast_path": fast_path.stats(),
+        "response_cache": chat_service.response_cache.stats(),
+        "greeting_pool": chat_service.greeting_pool.stats(),
+        "history_window": chat_service.history_manager.stats(),
+        "chat_sessions": gemini_client.session_pool.stats(),
+        "llm_dispatch": gemini_client.dispatcher.stats(),
+        "websocket_connections": connection_manager.stats(),
+        "image_preprocessing": image_preprocessor.stats(),
+        "history_retention": history_retention.stats(),
+    }
+
+
+@router.get("/insight/stats")
+async def insight_stats() -> Dict[str, Any]:
+    """
+    Inventory summary, per-stage timings (seconds) and cache statistics
+
+    Timings and counters cover this worker process since it started.
+    """
+    # Computed once per inventory version, which can take a moment on large sheets
+    summary = await asyncio.to_thread(knowledge_base.get_summary_stats)
+    return {
+        **summary,
+        "timings": {
+            "chat_stages": chat_stage_seconds.snapshot(),
+            "llm_queue_wait": llm_queue_wait_seconds.snapshot(),
+            "llm_generation": llm_generation_seconds.snapshot(),
+        },
+        **_component_stats(),
+    }
+
+
+@router.get("/insight/logs")
+async def insight_logs(
+    cursor: Optional[str] = None,
+    lines: int = Query(100, ge=1, le=1000)
+) -> Dict[str, Any]:
+    """
+    Recent log lines; pass back the returned cursor to get only the lines written since
+
+    Without a cursor, or once the log has rotated past it, returns the last
+    lines of the current file and sets reset. "more" means further lines are
+    already waiting after the returned cursor.
+    """
+    return await asyncio.to_thread(read_logs, cursor, lines)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Prometheus metrics for this worker process"""
+    summary = await asyncio.to_thread(knowledge_base.get_summary_stats)
+    gauges = {
+        "inventory": {"total_diamonds": summary.get("total_diamonds", 0)},
+        **_component_stats(),
+    }
+    return PlainTextResponse(
+        render_prometheus(HISTOGRAMS, gauges),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,42 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+from app.schemas.knowledge import KnowledgeReloadResponse, KnowledgeStatusResponse
+from app.services.knowledge_base import knowledge_base
+from app.utils.logger import logger
+
+router = APIRouter(prefix="/knowledge", tags=["knowledge"])
+
+
+@router.get("/status", response_model=KnowledgeStatusResponse)
+async def knowledge_status() -> KnowledgeStatusResponse:
+    """Get the version and size of the inventory snapshot being served"""
+    snapshot = knowledge_base.snapshot
+    return KnowledgeStatusResponse(
+        version=snapshot.version,
+        loaded_at=snapshot.loaded_at,
+        diamonds=len(snapshot.diamond_documents),
+        catalog_items=len(snapshot.image_documents)
+    )
+
+
+@router.post("/reload", response_model=KnowledgeReloadResponse)
+async def reload_knowledge(force: bool = False) -> KnowledgeReloadResponse:
+    """
+    Reload inventory data without restarting the process
+
+    Only the sources that changed since the last load are rebuilt; requests
+    already in flight finish against the previous snapshot.
+
+    - **force**: Rebuild everything even if no source file changed
+    """
+    try:
+        result = await asyncio.to_thread(knowledge_base.reload, force)
+        return KnowledgeReloadResponse(**result)
+
+    except Exception as e:
+        logger.error(f"Error reloading knowledge base: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reloading knowledge base: {str(e)}"
+        )
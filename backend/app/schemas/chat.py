@@ -1,10 +1,13 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 
+# Longest user message accepted, over HTTP and WebSocket alike
+MAX_MESSAGE_LENGTH = 1000
+
 
 class ChatRequest(BaseModel):
     """Request schema for chat endpoint"""
-    message: str = Field(..., min_length=1, max_length=1000, description="User message")
+    message: str = Field(..., min_length=1, max_length=MAX_MESSAGE_LENGTH, description="User message")
     session_id: str = Field(..., min_length=1, description="Unique session identifier")
     
     class Config:
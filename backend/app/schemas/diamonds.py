@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List
+
+
+class DiamondSearchResponse(BaseModel):
+    """Response schema for diamond search endpoint"""
+    total: int = Field(..., description="Number of diamonds matching the filters")
+    results: List[Dict[str, Any]] = Field(..., description="Matching inventory rows for the requested page")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "total": 1,
+                "results": [{
+                    "diamond_id": "D002", "carat": 1.0, "cut": "Premium", "color": "E",
+                    "clarity": "VVS2", "price_usd": 5800, "shape": "Round"
+                }]
+            }
+        }
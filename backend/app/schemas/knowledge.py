@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+
+
+class KnowledgeReloadResponse(BaseModel):
+    """Response schema for knowledge reload endpoint"""
+    reloaded: bool = Field(..., description="Whether a new snapshot was swapped in")
+    version: int = Field(..., description="Knowledge snapshot version now being served")
+    excel: bool = Field(..., description="Whether the Excel inventory was rebuilt")
+    images: bool = Field(..., description="Whether the image inventory was rebuilt")
+
+
+class KnowledgeStatusResponse(BaseModel):
+    """Response schema for knowledge status endpoint"""
+    version: int = Field(..., description="Knowledge snapshot version now being served")
+    loaded_at: float = Field(..., description="Unix time the snapshot was built")
+    diamonds: int = Field(..., description="Number of diamond rows")
+    catalog_items: int = Field(..., description="Number of analyzed image items")
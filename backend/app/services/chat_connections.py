@@ -0,0 +1,180 @@
+"""
+WebSocket chat connections.
+
+A connection to /chat/ws?session_id=... binds its session once, when it
+opens, and keeps it in memory for every turn after that. Events are JSON
+objects with a "type":
+
+    client -> server   {"type": "message", "message": "..."}
+                       {"type": "ping"}
+    server -> client   {"type": "session", "session_id": "...", "greeting": "..."}
+                       {"type": "typing", "active": true | false}
+                       {"type": "token", "token": "..."}
+                       {"type": "done"}
+                       {"type": "error", "detail": "...", "retry_after": 5}
+                       {"type": "heartbeat"} / {"type": "pong"}
+
+One reply is generated at a time per connection; a message sent while one is
+still streaming gets an error event. A heartbeat goes out whenever the
+connection has been quiet for WS_HEARTBEAT_INTERVAL seconds (0 disables), which keeps
+proxies from dropping idle connections and notices dead clients.
+"""
+import asyncio
+import json
+import time
+from contextlib import aclosing
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from app.config import CHAT_DEADLINE, WS_MAX_CONNECTIONS, WS_HEARTBEAT_INTERVAL
+from app.schemas.chat import MAX_MESSAGE_LENGTH
+from app.services.chat_service import chat_service
+from app.services.llm_dispatch import LLMUnavailable, deadline_after
+from app.utils.logger import logger
+
+# Close code asking the client to reconnect later (RFC 6455 "Try Again Later")
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class ChatConnection:
+    """State of one open WebSocket: its session, the reply in progress and when it last sent"""
+
+    def __init__(self, websocket: WebSocket, session_id: str):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.turn: Optional[asyncio.Task] = None
+        self.last_sent = time.monotonic()
+        # Replies, heartbeats and pongs are sent from different tasks
+        self._send_lock = asyncio.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self.turn is not None and not self.turn.done()
+
+    async def send(self, event: Dict[str, Any]) -> None:
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(event))
+            self.last_sent = time.monotonic()
+
+
+class ConnectionManager:
+    """Open WebSocket chat connections of this worker"""
+
+    def __init__(self,
+                 max_connections: int = WS_MAX_CONNECTIONS,
+                 heartbeat_interval: float = WS_HEARTBEAT_INTERVAL):
+        self.max_connections = max_connections
+        self.heartbeat_interval = heartbeat_interval
+        self._connections: Dict[int, ChatConnection] = {}
+        self._stats = {"opened": 0, "rejected": 0, "turns": 0, "busy_rejections": 0}
+
+    @property
+    def full(self) -> bool:
+        return 0 < self.max_connections <= len(self._connections)
+
+    async def serve(self, websocket: WebSocket, session_id: str) -> None:
+        """Run a connection until the client goes away"""
+        await websocket.accept()
+        if self.full:
+            self._stats["rejected"] += 1
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Too many open connections")
+            return
+
+        connection = ChatConnection(websocket, session_id)
+        self._connections[id(connection)] = connection
+        self._stats["opened"] += 1
+        heartbeat = asyncio.create_task(self._heartbeat(connection))
+        try:
+            greeting = await chat_service.get_greeting(session_id)
+            await connection.send({"type": "session", "session_id": session_id, "greeting": greeting})
+            while True:
+                await self._handle(connection, await websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error(f"Error in chat connection for session {session_id}: {str(e)}")
+        finally:
+            heartbeat.cancel()
+            if connection.busy:
+                # Nobody is left to read the reply
+                connection.turn.cancel()
+            del self._connections[id(connection)]
+
+    async def _handle(self, connection: ChatConnection, text: str) -> None:
+        try:
+            event = json.loads(text)
+        except json.JSONDecodeError:
+            event = None
+        if not isinstance(event, dict):
+            await connection.send({"type": "error", "detail": "Events must be JSON objects"})
+            return
+
+        if event.get("type") == "ping":
+            await connection.send({"type": "pong"})
+        elif event.get("type") == "message":
+            message = event.get("message")
+            if not isinstance(message, str) or not message.strip() or len(message) > MAX_MESSAGE_LENGTH:
+                await connection.send({
+                    "type": "error",
+                    "detail": f"message must be a string of 1 to {MAX_MESSAGE_LENGTH} characters"
+                })
+            elif connection.busy:
+                self._stats["busy_rejections"] += 1
+                await connection.send({"type": "error", "detail": "A reply is still being generated"})
+            else:
+                # Keep reading while the reply streams, so pings and disconnects are noticed
+                connection.turn = asyncio.create_task(self._reply(connection, message))
+        else:
+            await connection.send({"type": "error", "detail": f"Unknown event type: {event.get('type')}"})
+
+    async def _reply(self, connection: ChatConnection, message: str) -> None:
+        self._stats["turns"] += 1
+        try:
+            await connection.send({"type": "typing", "active": True})
+            stream = chat_service.stream_message(
+                connection.session_id, message, ensure_session=False, deadline=deadline_after(CHAT_DEADLINE)
+            )
+            try:
+                # Closed even when the turn is cancelled by a disconnect, so the partial reply is saved
+                async with aclosing(stream):
+                    async for token in stream:
+                        await connection.send({"type": "token", "token": token})
+                await connection.send({"type": "done"})
+            except LLMUnavailable as e:
+                logger.warning(f"Turned chat message away: {str(e)}")
+                await connection.send({"type": "error", "detail": str(e), "retry_after": e.retry_after})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"Error in chat connection reply: {str(e)}")
+                await connection.send({"type": "error", "detail": f"Error processing chat message: {str(e)}"})
+            await connection.send({"type": "typing", "active": False})
+        except Exception:
+            # The client went away mid-reply; serve() cleans up
+            pass
+
+    async def _heartbeat(self, connection: ChatConnection) -> None:
+        if self.heartbeat_interval <= 0:
+            return
+        try:
+            while True:
+                idle = time.monotonic() - connection.last_sent
+                if idle >= self.heartbeat_interval:
+                    await connection.send({"type": "heartbeat"})
+                    idle = 0.0
+                await asyncio.sleep(self.heartbeat_interval - idle)
+        except Exception:
+            # The connection is gone; serve() notices on its next receive
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": len(self._connections),
+            "replying": sum(1 for c in self._connections.values() if c.busy),
+            "max_connections": self.max_connections,
+            **self._stats,
+        }
+
+
+# Global instance
+connection_manager = ConnectionManager()
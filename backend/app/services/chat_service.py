@@ -1,100 +1,316 @@
-from typing import Dict, List
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from app.services.knowledge_base import knowledge_base
-from app.services.gemini_client import gemini_client
-from app.database import save_message, get_chat_history as db_get_chat_history
+from app.services.gemini_client import gemini_client, FALLBACK_RESPONSE
+from app.services.greeting_pool import GreetingPool
+from app.services.history_manager import HistoryManager
+from app.services.llm_dispatch import DeadlineExceeded
+from app.services.knowledge_base import KnowledgeSnapshot
+from app.services.fast_path import fast_path
+from app.services.response_cache import ResponseCache
+from app.services.session_cache import SessionCache
+from app.database import (
+    save_message_async, get_chat_history_async as db_get_chat_history, count_messages_async as db_count_messages
+)
 from app.utils.logger import logger
+from app.utils.metrics import chat_stage_seconds
+
+# Greeting for new sessions when no generated one is available
+FALLBACK_GREETING = "Hello! Welcome to our diamond store. I'm here to help you find the perfect diamond. How can I assist you today?"
 
 
 class ChatService:
     """Manages chat sessions and conversation history"""
     
+    # Number of recent user turns used as the retrieval query
+    RETRIEVAL_QUERY_TURNS = 2
+    
     def __init__(self):
-        # System prompt is now just text context for Gemini
-        self.system_prompt = knowledge_base.get_knowledge_context()
+        # Recent turns per session, written through to SQLite
+        self.session_cache = SessionCache()
+        # Replies to repeated opening questions, per knowledge version
+        self.response_cache = ResponseCache()
+        # Greetings generated ahead of time so new sessions don't wait on the model
+        self.greeting_pool = GreetingPool(self._generate_pool_greeting)
+        # Recent turns verbatim plus a rolling summary of older ones, within a token budget
+        self.history_manager = HistoryManager()
     
-    def get_or_create_session(self, session_id: str) -> List[Dict[str, str]]:
+    async def get_or_create_session(self, session_id: str) -> List[Dict[str, str]]:
         """Get existing session or create new one with greeting"""
-        history = self.get_chat_history(session_id)
+        history = await self.get_chat_history(session_id)
         
         if not history:
             logger.info(f"Creating new session: {session_id}")
-            # Generate greeting for new session
-            greeting = self._generate_greeting()
-            self.add_message(session_id, "assistant", greeting)
-            return self.get_chat_history(session_id)
+            snapshot = knowledge_base.snapshot
+            greeting = self.greeting_pool.take(snapshot.version)
+            if greeting is None and not self.greeting_pool.enabled:
+                greeting = await self._generate_greeting(snapshot)
+            await self.add_message(session_id, "assistant", greeting or FALLBACK_GREETING)
+            return await self.get_chat_history(session_id)
         
         return history
     
-    def _generate_greeting(self) -> str:
-        """Generate initial greeting message"""
+    async def _generate_greeting(self, snapshot: KnowledgeSnapshot) -> Optional[str]:
+        """Generate initial greeting message, or None if the model call failed"""
         try:
             greeting_messages = [{
                 "role": "user",
                 "content": "Please greet me as a new customer visiting your diamond store."
             }]
             
-            # specific instructions for the chat flow
-            from app.prompts import format_chat_system_prompt
-            system_instruction = format_chat_system_prompt(self.system_prompt)
-
-            greeting = gemini_client.generate_response(
+            # The greeting only needs the static instructions, not specific items
+            greeting = await gemini_client.generate_response_async(
                 messages=greeting_messages,
-                system_prompt=system_instruction
+                system_instruction=snapshot.system_instruction,
+                instruction_key=snapshot.version,
+                stage="greeting"
             )
             
-            return greeting
+            return None if greeting == FALLBACK_RESPONSE else greeting
             
         except Exception as e:
             logger.error(f"Error generating greeting: {str(e)}")
-            # Fallback greeting
-            return "Hello! Welcome to our diamond store. I'm here to help you find the perfect diamond. How can I assist you today?"
+            return None
     
-    def add_message(self, session_id: str, role: str, content: str) -> None:
+    async def _generate_pool_greeting(self) -> Tuple[int, Optional[str]]:
+        """Generate a greeting for the greeting pool, tagged with its knowledge version"""
+        snapshot = knowledge_base.snapshot
+        return snapshot.version, await self._generate_greeting(snapshot)
+    
+    async def _build_turn_context(self,
+                                  history: List[Dict[str, str]],
+                                  snapshot: KnowledgeSnapshot,
+                                  summary: str = "") -> str:
+        """Inventory relevant to the recent turns; the static instructions go in the system instruction"""
+        recent_user_turns = [msg["content"] for msg in history if msg["role"] == "user"]
+        query = " ".join(recent_user_turns[-self.RETRIEVAL_QUERY_TURNS:])
+        turn_context = ""
+        if snapshot.retriever is not None:
+            # BM25 scores the whole catalog and the query embedding may be a network
+            # call, so retrieval runs off the event loop
+            turn_context = await asyncio.to_thread(snapshot.get_turn_context, query)
+        if summary:
+            # Turns that no longer fit in the history window
+            return f"EARLIER IN THIS CONVERSATION:\n{summary}\n\n{turn_context}".rstrip()
+        return turn_context
+    
+    @staticmethod
+    def _is_opening_question(history: List[Dict[str, str]]) -> bool:
+        """
+        Whether the next user message is the session's first
+
+        Only opening questions read or write the shared response cache or share
+        a model call: later ones may refer to this customer's earlier turns
+        ("the second diamond", "something cheaper") in ways no wording check catches.
+        """
+        return not any(msg["role"] == "user" for msg in history)
+    
+    def _instant_response(self,
+                          user_message: str,
+                          snapshot: KnowledgeSnapshot,
+                          opening: bool) -> Tuple[Optional[str], str]:
+        """Reply that needs no model call, and where it came from"""
+        with chat_stage_seconds.time("fast_path"):
+            response = fast_path.answer(user_message, snapshot)
+        if response is not None or not opening:
+            return response, "fast path"
+        return self.response_cache.get(user_message, snapshot.version), "response cache"
+    
+    async def add_message(self, session_id: str, role: str, content: str) -> None:
         """Add message to session history"""
-        save_message(session_id, role, content)
+        await save_message_async(session_id, role, content)
+        self.session_cache.append(session_id, {"role": role, "content": content})
     
-    def get_chat_history(self, session_id: str) -> List[Dict[str, str]]:
+    async def get_chat_history(self, session_id: str) -> List[Dict[str, str]]:
         """Get chat history for session"""
+        history, _ = await self._load_history(session_id)
+        return history
+    
+    async def _load_history(self, session_id: str) -> Tuple[List[Dict[str, str]], int]:
+        """Recent history and the number of older messages of the session it leaves out"""
+        cached = self.session_cache.get_with_offset(session_id)
+        if cached is not None and self.session_cache.validate:
+            history, offset = cached
+            # Another worker may have added turns; the count walks the (session_id, id) index only
+            if await db_count_messages(session_id) != offset + len(history):
+                self.session_cache.discard_stale(session_id)
+                cached = None
+        if cached is not None:
+            return cached
+        
         # Retrieve history from DB, removing timestamp/id if needed to match expected format
-        db_history = db_get_chat_history(session_id)
+        db_history = await db_get_chat_history(session_id, self.session_cache.max_messages)
         # Convert to format expected by Gemini client (role, content)
-        return [{"role": msg["role"], "content": msg["content"]} for msg in db_history]
+        history = [{"role": msg["role"], "content": msg["content"]} for msg in db_history]
+        offset = 0
+        if len(history) >= self.session_cache.max_messages:
+            offset = await db_count_messages(session_id) - len(history)
+        self.session_cache.set(session_id, history, offset)
+        return history, offset
     
-    def process_message(self, session_id: str, user_message: str) -> str:
-        """Process user message and generate response"""
-        try:
-            # Ensure session exists (creates greeting if new)
-            self.get_or_create_session(session_id)
-            
-            # Add user message to history
-            self.add_message(session_id, "user", user_message)
-            
-            # Get updated history for API call
-            current_history = self.get_chat_history(session_id)
-            
-            # specific instructions for the chat flow
-            from app.prompts import format_chat_system_prompt
-            system_instruction = format_chat_system_prompt(self.system_prompt)
+    async def process_message(self, session_id: str, user_message: str, deadline: Optional[float] = None) -> str:
+        """
+        Process user message and generate response
 
-            # Generate response
-            assistant_response = gemini_client.generate_response(
-                messages=current_history,
-                system_prompt=system_instruction
+        deadline is a time.monotonic() instant; a model call still queued or
+        running then is cancelled and DeadlineExceeded raised.
+        """
+        start = time.monotonic()
+        try:
+            with chat_stage_seconds.time("total"):
+                return await self._process_message(session_id, user_message, deadline)
+        except DeadlineExceeded as e:
+            logger.warning(
+                f"Chat request for session {session_id} ran out of time during the model {e.phase} "
+                f"after {time.monotonic() - start:.2f}s"
             )
-            
-            # Add assistant response to history
-            self.add_message(session_id, "assistant", assistant_response)
-            
-            logger.info(f"Processed message for session {session_id}")
-            return assistant_response
-            
+            raise
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}")
             raise
     
-    def get_greeting(self, session_id: str) -> str:
+    async def _process_message(self, session_id: str, user_message: str, deadline: Optional[float] = None) -> str:
+        # Ensure session exists (creates greeting if new)
+        with chat_stage_seconds.time("session"):
+            opening = self._is_opening_question(await self.get_or_create_session(session_id))
+        
+        # Factual inventory questions and repeated opening questions are answered without a model call
+        snapshot = knowledge_base.snapshot
+        instant_response, source = self._instant_response(user_message, snapshot, opening)
+        if instant_response is None:
+            # Turn the message away before it is recorded if the model is overloaded
+            gemini_client.dispatcher.check()
+        
+        # Add user message to history
+        with chat_stage_seconds.time("db_write"):
+            await self.add_message(session_id, "user", user_message)
+        
+        if instant_response is not None:
+            with chat_stage_seconds.time("persist"):
+                await self.add_message(session_id, "assistant", instant_response)
+            logger.info(f"Answered message for session {session_id} from {source}")
+            return instant_response
+        
+        try:
+            # Get updated history for API call
+            with chat_stage_seconds.time("db_read"):
+                current_history, offset = await self._load_history(session_id)
+        
+            with chat_stage_seconds.time("prompt_build"):
+                window, summary = await self.history_manager.build_window(session_id, current_history, offset)
+                # Only the retrieved items change per turn; instructions and the static
+                # knowledge block are built once per knowledge version
+                turn_context = await self._build_turn_context(current_history, snapshot, summary)
+                system_instruction = snapshot.system_instruction
+
+            # Generate response (queue wait and generation are also timed by the dispatcher)
+            with chat_stage_seconds.time("llm"):
+                assistant_response = await gemini_client.generate_response_async(
+                    messages=window,
+                    system_prompt=turn_context,
+                    session_id=session_id,
+                    system_instruction=system_instruction,
+                    instruction_key=snapshot.version,
+                    # Identical opening questions arriving together share one model call
+                    coalesce_key=self.response_cache.key(user_message, snapshot.version) if opening else None,
+                    deadline=deadline,
+                    hedge=True
+                )
+        except (Exception, asyncio.CancelledError):
+            # Out of time, failed or cancelled: still answer the saved user turn so the history keeps alternating
+            await self.add_message(session_id, "assistant", FALLBACK_RESPONSE)
+            raise
+        
+        # Add assistant response to history
+        with chat_stage_seconds.time("persist"):
+            if opening and assistant_response != FALLBACK_RESPONSE:
+                self.response_cache.put(user_message, snapshot.version, assistant_response)
+            await self.add_message(session_id, "assistant", assistant_response)
+        
+        logger.info(f"Processed message for session {session_id}")
+        return assistant_response
+    
+    async def stream_message(self,
+                             session_id: str,
+                             user_message: str,
+                             ensure_session: bool = True,
+                             deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Process user message and stream the response as it is generated
+
+        Callers that already opened the session (a WebSocket connection binds
+        it once) pass ensure_session=False to skip the lookup. A stream still
+        running at the deadline is cancelled with DeadlineExceeded. Callers
+        that stop reading early should aclose() the generator, so the partial
+        reply is saved right away.
+        """
+        with chat_stage_seconds.time("session"):
+            if ensure_session:
+                history = await self.get_or_create_session(session_id)
+            else:
+                history = await self.get_chat_history(session_id)
+            opening = self._is_opening_question(history)
+
+        snapshot = knowledge_base.snapshot
+        instant_response, source = self._instant_response(user_message, snapshot, opening)
+        if instant_response is None:
+            gemini_client.dispatcher.check()
+        with chat_stage_seconds.time("db_write"):
+            await self.add_message(session_id, "user", user_message)
+
+        if instant_response is not None:
+            # Saved before it is sent, so a client that goes away still leaves a complete turn
+            await self.add_message(session_id, "assistant", instant_response)
+            yield instant_response
+            logger.info(f"Streamed message for session {session_id} from {source}")
+            return
+
+        chunks: List[str] = []
+        try:
+            with chat_stage_seconds.time("db_read"):
+                current_history, offset = await self._load_history(session_id)
+            with chat_stage_seconds.time("prompt_build"):
+                window, summary = await self.history_manager.build_window(session_id, current_history, offset)
+                turn_context = await self._build_turn_context(current_history, snapshot, summary)
+                system_instruction = snapshot.system_instruction
+
+            start = time.perf_counter()
+            async for chunk in gemini_client.stream_response(
+                messages=window,
+                system_prompt=turn_context,
+                session_id=session_id,
+                system_instruction=system_instruction,
+                instruction_key=snapshot.version,
+                deadline=deadline
+            ):
+                if not chunks:
+                    chat_stage_seconds.observe(time.perf_counter() - start, "llm_first_token")
+                chunks.append(chunk)
+                yield chunk
+        except (Exception, asyncio.CancelledError, GeneratorExit):
+            # The stream failed or the client went away: still answer the saved user turn,
+            # with what was sent so far, so the history keeps alternating
+            await self.add_message(session_id, "assistant", "".join(chunks) or FALLBACK_RESPONSE)
+            raise
+
+        # Persist the complete reply once the stream has finished
+        with chat_stage_seconds.time("persist"):
+            assistant_response = "".join(chunks)
+            await self.add_message(session_id, "assistant", assistant_response)
+            if opening and assistant_response != FALLBACK_RESPONSE:
+                self.response_cache.put(user_message, snapshot.version, assistant_response)
+        logger.info(f"Streamed message for session {session_id}")
+
+    def forget_sessions(self, session_ids: List[str]) -> None:
+        """Drop in-memory state of sessions whose messages left the database"""
+        for session_id in session_ids:
+            self.session_cache.invalidate(session_id)
+            self.history_manager.forget(session_id)
+    
+    async def get_greeting(self, session_id: str) -> str:
         """Get greeting message for a session"""
-        session_history = self.get_or_create_session(session_id)
+        session_history = await self.get_or_create_session(session_id)
         # Return the first assistant message (greeting)
         for msg in session_history:
             if msg["role"] == "assistant":
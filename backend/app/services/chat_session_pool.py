@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import CHAT_SESSION_POOL_SIZE, CHAT_SESSION_IDLE_TTL
+
+
+def _fingerprint(messages: List[Dict[str, str]]) -> Tuple[int, Optional[Tuple[str, str]], Optional[Tuple[str, str]]]:
+    """Length, first and last message of a conversation, used to detect divergence"""
+    if not messages:
+        return (0, None, None)
+    first, last = messages[0], messages[-1]
+    # The first message changes when older turns leave a bounded history window
+    return (len(messages), (first["role"], first["content"]), (last["role"], last["content"]))
+
+
+class ChatSessionPool:
+    """
+    Live Gemini chat sessions keyed by session_id.
+
+    A pooled session is only reused when the caller's history is exactly the
+    conversation it already holds and it was started on the same model (one
+    per knowledge version), so follow-up turns skip rebuilding and converting
+    the history. Sessions are checked out exclusively while a turn
+    is in flight, expire after an idle timeout and are evicted LRU beyond the
+    size cap.
+    """
+
+    def __init__(self, max_sessions: int = CHAT_SESSION_POOL_SIZE, idle_ttl: float = CHAT_SESSION_IDLE_TTL):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def checkout(self, session_id: str, history: List[Dict[str, str]], model_key: Any = None) -> Optional[Any]:
+        """Take the live session for this conversation, or None if it must be rebuilt"""
+        with self._lock:
+            self._expire()
+            entry = self._sessions.pop(session_id, None)
+            if entry is None or entry["fingerprint"] != _fingerprint(history) or entry["model_key"] != model_key:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["session"]
+
+    def checkin(self,
+                session_id: str,
+                chat_session: Any,
+                history: List[Dict[str, str]],
+                model_key: Any = None) -> None:
+        """Return a session after a turn; history is the conversation it now holds"""
+        if self.max_sessions <= 0:
+            return
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = {
+                "session": chat_session,
+                "fingerprint": _fingerprint(history),
+                "model_key": model_key,
+                "last_used": time.monotonic(),
+            }
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.idle_ttl
+        # Entries are ordered by last use, so stop at the first fresh one
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if entry["last_used"] >= deadline:
+                break
+            self._sessions.pop(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
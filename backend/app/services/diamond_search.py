@@ -0,0 +1,177 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Logical search fields and the spreadsheet column names they may appear under
+NUMERIC_FIELDS = {
+    "carat": ["carat", "carats", "carat_weight", "weight"],
+    "price": ["price", "price_usd", "price_in_usd", "cost"],
+}
+CATEGORICAL_FIELDS = {
+    "cut": ["cut", "cut_grade"],
+    "color": ["color", "colour", "color_grade"],
+    "clarity": ["clarity", "clarity_grade"],
+    "shape": ["shape"],
+    "availability": ["availability", "stock_status", "in_stock", "status"],
+}
+
+
+def normalize_column_name(name: Any) -> str:
+    """'Price (USD)' -> 'price_usd'"""
+    return re.sub(r"[^a-z0-9]+", "_", str(name).strip().lower()).strip("_")
+
+
+def normalize_category(value: Any) -> str:
+    return str(value).strip().casefold()
+
+
+def _resolve_columns(columns: Iterable[Any], fields: Dict[str, List[str]]) -> Dict[str, Any]:
+    normalized = {normalize_column_name(col): col for col in columns}
+    resolved = {}
+    for field, aliases in fields.items():
+        for alias in aliases:
+            if alias in normalized:
+                resolved[field] = normalized[alias]
+                break
+    return resolved
+
+
+class NumericColumnIndex:
+    """Sorted permutation of a numeric column for range and ordered scans"""
+
+    def __init__(self, values: pd.Series):
+        self.values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+        # argsort places NaN last, so the valid values form a sorted prefix
+        self.order = np.argsort(self.values, kind="stable")
+        self.valid = int(np.count_nonzero(~np.isnan(self.values)))
+        self.sorted_values = self.values[self.order[:self.valid]]
+
+    def range_rows(self, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        """Row ids with low <= value <= high, found by binary search"""
+        start = 0 if low is None else int(np.searchsorted(self.sorted_values, low, side="left"))
+        end = self.valid if high is None else int(np.searchsorted(self.sorted_values, high, side="right"))
+        return self.order[start:end]
+
+    def ordered_rows(self, descending: bool = False) -> np.ndarray:
+        """All row ids sorted by value, missing values last"""
+        if not descending:
+            return self.order
+        return np.concatenate([self.order[:self.valid][::-1], self.order[self.valid:]])
+
+
+class CategoricalColumnIndex:
+    """Categorical codes plus a posting list of row ids per category"""
+
+    def __init__(self, values: pd.Series):
+        normalized = values.map(normalize_category, na_action="ignore")
+        categorical = pd.Categorical(normalized)
+        self.codes = categorical.codes
+        self.code_of = {category: code for code, category in enumerate(categorical.categories)}
+        self.postings = self._build_postings(self.codes, len(categorical.categories))
+
+    @staticmethod
+    def _build_postings(codes: np.ndarray, size: int) -> List[np.ndarray]:
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(size + 1), side="left")
+        return [order[bounds[i]:bounds[i + 1]] for i in range(size)]
+
+    def member_rows(self, wanted: Iterable[Any]) -> np.ndarray:
+        """Row ids whose value is any of the wanted categories (case-insensitive)"""
+        codes = {self.code_of[key] for key in map(normalize_category, wanted) if key in self.code_of}
+        if not codes:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([self.postings[code] for code in sorted(codes)])
+
+
+class DiamondIndex:
+    """Precomputed per-column indexes for structured inventory queries"""
+
+    def __init__(self, data: pd.DataFrame):
+        self.data = data
+        self.size = len(data)
+        self.columns = {
+            **_resolve_columns(data.columns, NUMERIC_FIELDS),
+            **_resolve_columns(data.columns, CATEGORICAL_FIELDS),
+        }
+        self.numeric = {
+            field: NumericColumnIndex(data[column])
+            for field, column in self.columns.items() if field in NUMERIC_FIELDS
+        }
+        self.categorical = {
+            field: CategoricalColumnIndex(data[column])
+            for field, column in self.columns.items() if field in CATEGORICAL_FIELDS
+        }
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.numeric) + list(self.categorical)
+
+    def field_for_column(self, column: Any) -> Optional[str]:
+        """Logical field indexed for a raw DataFrame column, if any"""
+        for field, indexed_column in self.columns.items():
+            if indexed_column == column:
+                return field
+        return None
+
+    def _rows_to_mask(self, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def match_mask(self,
+                   ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+                   members: Optional[Dict[str, Iterable[Any]]] = None) -> np.ndarray:
+        """Boolean mask of rows satisfying every range and membership filter"""
+        mask = np.ones(self.size, dtype=bool)
+        for field, (low, high) in (ranges or {}).items():
+            if low is None and high is None:
+                continue
+            if field not in self.numeric:
+                raise KeyError(f"Unknown numeric field: {field}")
+            mask &= self._rows_to_mask(self.numeric[field].range_rows(low, high))
+        for field, wanted in (members or {}).items():
+            if not wanted:
+                continue
+            if field not in self.categorical:
+                raise KeyError(f"Unknown categorical field: {field}")
+            mask &= self._rows_to_mask(self.categorical[field].member_rows(wanted))
+        return mask
+
+    def search(self,
+               ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+               members: Optional[Dict[str, Iterable[Any]]] = None,
+               sort_by: Optional[str] = None,
+               descending: bool = False,
+               limit: int = 20,
+               offset: int = 0) -> Dict[str, Any]:
+        """
+        Run a structured query over the inventory
+
+        Args:
+            ranges: {"carat": (1.0, 1.5), "price": (None, 5000)} inclusive bounds
+            members: {"cut": ["Ideal", "Excellent"], "color": ["D", "E", "F"]}
+            sort_by: numeric field to order results by (inventory order if omitted)
+            descending: sort from highest to lowest
+            limit: maximum rows returned
+            offset: rows skipped before the first returned row
+        """
+        mask = self.match_mask(ranges, members)
+        total = int(np.count_nonzero(mask))
+
+        if sort_by is None:
+            rows = np.flatnonzero(mask)
+        elif sort_by in self.numeric:
+            ordered = self.numeric[sort_by].ordered_rows(descending)
+            rows = ordered[mask[ordered]]
+        else:
+            raise KeyError(f"Cannot sort by field: {sort_by}")
+
+        page = rows[offset:offset + limit]
+        return {"total": total, "results": self.records(page)}
+
+    def records(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """Materialize only the requested rows, with missing values as None"""
+        subset = self.data.iloc[rows]
+        return subset.astype(object).where(subset.notna(), None).to_dict("records")
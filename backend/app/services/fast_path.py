@@ -0,0 +1,540 @@
+"""
+Deterministic answers to factual inventory questions.
+
+Questions such as "do you have a 2 carat emerald cut", "what's your cheapest
+oval" or "price range for DEF color" are answered straight from the
+DiamondIndex, without a model call, in the same short and casual voice the
+model is instructed to use. A message is answered here only when every word
+of it is accounted for: an intent phrase, a slot (carat, price, shape, color,
+clarity, cut) or a filler word, and each numeric slot is given at most once.
+Anything else (follow-ups, opinions, ring settings, two different asks in one
+message, small talk) goes to the model as before.
+
+When the inventory has an availability column, only diamonds marked in stock
+are counted; without one, replies don't claim stock, and questions about
+stock go to the model.
+"""
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import FAST_PATH_ENABLED, FAST_PATH_MAX_WORDS
+from app.services.diamond_search import DiamondIndex
+
+# Words that may surround a factual question without changing it
+FILLER_WORDS = {
+    "a", "an", "the", "do", "does", "you", "u", "have", "has", "got", "any", "is", "are", "what", "whats",
+    "what's", "which", "your", "in", "i", "im", "i'm", "am", "looking",
+    "for", "show", "me", "please", "pls", "with", "of", "diamond", "diamonds", "stone", "stones", "there",
+    "can", "could", "get", "see", "want", "need", "would", "like", "to", "hi", "hello", "hey", "and",
+    "currently", "right", "now", "options", "tell", "carry", "sell", "we", "our", "shape", "color", "colour",
+    "clarity", "cut", "s", "for", "at", "on", "range", "grade",
+}
+
+# Superlative phrase -> (field to sort by, descending)
+SUPERLATIVES = [
+    (r"cheapest|least expensive|lowest[- ]priced|lowest price|most affordable", ("price", False)),
+    (r"most expensive|priciest|highest[- ]priced|highest price", ("price", True)),
+    (r"biggest|largest|heaviest", ("carat", True)),
+    (r"smallest|lightest|tiniest", ("carat", False)),
+]
+PRICE_INTENT = r"price range|prices?|pricing|how much|costs?"
+COUNT_INTENT = r"how many"
+# Asking whether something can be bought now, not just whether it is listed
+STOCK_PHRASES = r"in[- ]stock|stock|available|availability|on hand|ready to ship"
+# Availability column values that mean a diamond can be bought now
+IN_STOCK_VALUES = {"in stock", "in-stock", "instock", "available", "yes", "y", "true", "1"}
+
+NUMBER = r"\d[\d,]*(?:\.\d+)?"
+UPPER_BOUND = {"under", "below", "less than", "up to", "at most", "max", "maximum", "within", "budget", "budget of", "budget is"}
+LOWER_BOUND = {"over", "above", "more than", "at least", "min", "minimum"}
+APPROXIMATE = {"around", "about", "approximately", "roughly", "near", "close to"}
+QUALIFIER = "|".join(sorted(UPPER_BOUND | LOWER_BOUND | APPROXIMATE, key=len, reverse=True))
+
+# "2 carat" means about 2 carats; "around 2 carats" allows a little more
+CARAT_TOLERANCE = 0.05
+APPROXIMATE_TOLERANCE = 0.10
+# Carat sizes never reach this, so a bare "under 5000" is a budget
+MIN_BARE_PRICE = 100
+
+COLORLESS = {"colorless": "def", "colourless": "def", "near colorless": "ghij", "near colourless": "ghij"}
+
+# Query results kept per knowledge version
+MEMO_SIZE = 1024
+
+
+def _number(text: str, thousands: str = "") -> float:
+    value = float(text.replace(",", ""))
+    return value * 1000 if thousands else value
+
+
+def _bounds(qualifier: Optional[str], value: float, tolerance: float) -> Tuple[Optional[float], Optional[float]]:
+    qualifier = (qualifier or "").strip()
+    if qualifier in UPPER_BOUND:
+        return None, value
+    if qualifier in LOWER_BOUND:
+        return value, None
+    if qualifier in APPROXIMATE:
+        tolerance = max(tolerance, APPROXIMATE_TOLERANCE)
+    return round(value * (1 - tolerance), 2), round(value * (1 + tolerance), 2)
+
+
+def _article(word: str) -> str:
+    # "an 8 carat", "an 18 carat", "an oval", "a 1 carat"
+    if re.match(r"(8|11|18)\b|8\d|[aeiou]", word.lower()):
+        return "an"
+    return "a"
+
+
+def _money(value: float) -> str:
+    return f"${value:,.0f}"
+
+
+def _carats(value: float) -> str:
+    return f"{value:g} carat"
+
+
+class ParsedQuestion:
+    """Intent and slots of a question the fast path can answer"""
+
+    def __init__(self, intent: str, ranges: Dict[str, Tuple[Optional[float], Optional[float]]],
+                 members: Dict[str, List[str]], sort: Optional[Tuple[str, bool]] = None,
+                 asks_stock: bool = False):
+        self.intent = intent
+        self.ranges = ranges
+        self.members = members
+        self.sort = sort
+        self.asks_stock = asks_stock
+
+    def key(self) -> Tuple[Any, ...]:
+        return (
+            self.intent, self.sort,
+            tuple(sorted(self.ranges.items())),
+            tuple(sorted((field, tuple(sorted(values))) for field, values in self.members.items())),
+        )
+
+
+class _Scanner:
+    """Matches patterns against a message, marking the characters each match accounts for"""
+
+    def __init__(self, message: str):
+        self.original = message
+        self.text = message.lower().replace("’", "'")
+        self._free = [True] * len(self.text)
+
+    def take(self, pattern: str, accept=None) -> List[re.Match]:
+        """Non-overlapping matches of pattern over unclaimed text; accept may veto a match"""
+        matches = []
+        for match in re.finditer(pattern, self.text):
+            start, end = match.span()
+            if start == end or not all(self._free[start:end]):
+                continue
+            if accept is not None and not accept(match):
+                continue
+            self._free[start:end] = [False] * (end - start)
+            matches.append(match)
+        return matches
+
+    def leftover_words(self) -> List[str]:
+        rest = "".join(c if free else " " for c, free in zip(self.text, self._free))
+        return re.findall(r"[a-z0-9']+", rest)
+
+
+class FastPathAnswerer:
+    """
+    Intent and slot extraction for common inventory questions, answered from the index.
+
+    Intents: availability ("do you have..."), superlative ("cheapest oval"),
+    price range ("how much is a 1 carat round") and count ("how many ...").
+    Query results are memoized per knowledge version, so repeated questions
+    cost a dictionary lookup and a string format.
+    """
+
+    def __init__(self, enabled: bool = FAST_PATH_ENABLED, max_words: int = FAST_PATH_MAX_WORDS):
+        self.enabled = enabled
+        self.max_words = max_words
+        self._memo: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+        self._memo_version = None
+        self._lock = threading.Lock()
+        self.answered: Dict[str, int] = {}
+        self.fallbacks = 0
+
+    # Parsing
+
+    def parse(self, message: str, index: DiamondIndex) -> Optional[ParsedQuestion]:
+        """Intent and slots of a message, or None if any part of it is not understood"""
+        if len(message.split()) > self.max_words:
+            return None
+        scanner = _Scanner(message)
+        ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        members: Dict[str, List[str]] = {}
+
+        # A second carat or price ("a 2 carat emerald and a 1 carat round") is a second question
+        if "carat" in index.numeric and not self._parse_carats(scanner, ranges):
+            return None
+        if "price" in index.numeric and not self._parse_prices(scanner, ranges):
+            return None
+        if "shape" in index.categorical:
+            self._parse_categories(scanner, index, "shape", r"(?:s|es)?(?:\s*-?\s*(?:cut|shaped?|brilliant)s?)?", members)
+        if "color" in index.categorical:
+            self._parse_colors(scanner, index, members)
+        if "clarity" in index.categorical:
+            self._parse_clarity(scanner, index, members)
+        if "cut" in index.categorical:
+            self._parse_categories(scanner, index, "cut", r"\s+cut", members)
+
+        sort = None
+        intent = None
+        for pattern, order in SUPERLATIVES:
+            if scanner.take(rf"\b(?:{pattern})\b"):
+                if order[0] not in index.numeric:
+                    return None
+                intent, sort = "superlative", order
+                break
+        if intent is None and scanner.take(rf"\b(?:{COUNT_INTENT})\b"):
+            intent = "count"
+        if intent is None and scanner.take(rf"\b(?:{PRICE_INTENT})\b"):
+            if "price" not in index.numeric:
+                return None
+            intent = "price_range"
+        asks_stock = bool(scanner.take(rf"\b(?:{STOCK_PHRASES})\b"))
+
+        if scanner.leftover_words() and not set(scanner.leftover_words()) <= FILLER_WORDS:
+            return None
+        # Without a slot, the question has to name what it is about ("how much?" may refer to an earlier item)
+        has_subject = ranges or members or re.search(r"\b(?:diamonds?|stones?)\b", scanner.text)
+        if not has_subject:
+            return None
+        return ParsedQuestion(intent or "availability", ranges, members, sort, asks_stock)
+
+    @staticmethod
+    def _parse_carats(scanner: _Scanner, ranges: Dict[str, Tuple[Optional[float], Optional[float]]]) -> bool:
+        """Fill in the carat range; False if the message gives more than one"""
+        unit = r"\s*-?\s*(?:ct|cts|carats?|karats?)\b"
+        found = []
+        for match in scanner.take(rf"\b(?:between\s+)?({NUMBER})\s*(?:-|to|and)\s*({NUMBER}){unit}"):
+            found.append((_number(match.group(1)), _number(match.group(2))))
+        for match in scanner.take(rf"\b(?:({QUALIFIER})\s+)?(?:a\s+)?({NUMBER}|half a|half){unit}"):
+            value = 0.5 if "half" in match.group(2) else _number(match.group(2))
+            found.append(_bounds(match.group(1), value, CARAT_TOLERANCE))
+        if found:
+            ranges["carat"] = found[0]
+        return len(found) <= 1
+
+    @staticmethod
+    def _parse_prices(scanner: _Scanner, ranges: Dict[str, Tuple[Optional[float], Optional[float]]]) -> bool:
+        """Fill in the price range; False if the message gives more than one"""
+        amount = rf"\$\s*({NUMBER})\s*(k)?|({NUMBER})\s*(k)\b|({NUMBER})\s*(?:dollars|usd|bucks)\b"
+
+        def value(match: re.Match, offset: int) -> float:
+            groups = match.groups()[offset:offset + 5]
+            if groups[0] is not None:
+                return _number(groups[0], groups[1])
+            if groups[2] is not None:
+                return _number(groups[2], groups[3])
+            return _number(groups[4])
+
+        found = []
+        for match in scanner.take(rf"\bbetween\s+(?:{amount})\s*(?:-|to|and)\s*(?:{amount})"):
+            found.append((value(match, 0), value(match, 5)))
+        for match in scanner.take(rf"(?:\b({QUALIFIER})\s+)?(?:{amount})"):
+            found.append(_bounds(match.group(1), value(match, 1), APPROXIMATE_TOLERANCE))
+        # A bare number after a budget word, too large to be a carat size
+        for match in scanner.take(
+            rf"\b({QUALIFIER})\s+({NUMBER})\b",
+            accept=lambda m: _number(m.group(2)) >= MIN_BARE_PRICE
+        ):
+            found.append(_bounds(match.group(1), _number(match.group(2)), APPROXIMATE_TOLERANCE))
+        if found:
+            ranges["price"] = found[0]
+        return len(found) <= 1
+
+    @staticmethod
+    def _parse_categories(scanner: _Scanner, index: DiamondIndex, field: str, suffix: str,
+                          members: Dict[str, List[str]]) -> None:
+        """Category names of a field as written in the inventory, e.g. "oval" or "emerald cut" for shape"""
+        known = sorted(index.categorical[field].code_of, key=len, reverse=True)
+        if not known:
+            return
+        names = "|".join(re.escape(name) for name in known)
+        # Cut grades such as "good" are everyday words, so they count only when followed by "cut"
+        optional = "" if field == "cut" else "?"
+        for match in scanner.take(rf"\b({names})(?:{suffix}){optional}\b"):
+            members.setdefault(field, []).append(match.group(1))
+        if field == "cut":
+            for match in scanner.take(rf"\bcut(?:\s+grade)?\s+(?:of\s+)?({names})\b"):
+                members.setdefault(field, []).append(match.group(1))
+
+    @staticmethod
+    def _parse_colors(scanner: _Scanner, index: DiamondIndex, members: Dict[str, List[str]]) -> None:
+        known = set(index.categorical["color"].code_of)
+        grades: List[str] = []
+
+        def letters(first: str, last: Optional[str] = None) -> List[str]:
+            return [chr(c) for c in range(ord(first), ord(last or first) + 1)]
+
+        def accept(candidates: List[str]) -> bool:
+            if candidates and set(candidates) <= known:
+                grades.extend(candidates)
+                return True
+            return False
+
+        colour = r"colou?r(?:ed|s|less)?"
+        scanner.take(r"\bnear[- ]colou?rless\b|\bcolou?rless\b", accept=lambda m: accept(list(
+            COLORLESS[m.group(0).replace("-", " ").replace("colour", "color")]
+        )))
+        scanner.take(rf"\b([d-z])\s*(?:-|to|through)\s*([d-z])\s*{colour}\b",
+                     accept=lambda m: accept(letters(m.group(1), m.group(2))))
+        scanner.take(rf"\b{colour}(?:\s+grade)?\s+([d-z])(?:\s*(?:-|to|through)\s*([d-z]))?\b",
+                     accept=lambda m: accept(letters(m.group(1), m.group(2))))
+        scanner.take(rf"\b([d-z]{{1,4}})\s*{colour}\b", accept=lambda m: accept(list(m.group(1))))
+        if grades:
+            members["color"] = sorted(set(grades))
+
+    @staticmethod
+    def _parse_clarity(scanner: _Scanner, index: DiamondIndex, members: Dict[str, List[str]]) -> None:
+        known = set(index.categorical["clarity"].code_of)
+        grades: List[str] = []
+
+        def accept(match: re.Match) -> bool:
+            grade = match.group(1)
+            # "if" and "fl" are grades only when written in capitals or followed by "clarity"
+            if grade in ("if", "fl") and not match.group(2):
+                if scanner.original[match.start(1):match.end(1)] != grade.upper():
+                    return False
+            candidates = [k for k in known if k == grade or (grade in ("vvs", "vs", "si") and re.fullmatch(rf"{grade}\d", k))]
+            if not candidates:
+                return False
+            grades.extend(candidates)
+            return True
+
+        scanner.take(r"\b(fl|if|vvs1|vvs2|vs1|vs2|si1|si2|si3|i1|i2|i3|vvs|vs|si)\b(\s+clarity)?", accept=accept)
+        if grades:
+            members["clarity"] = sorted(set(grades))
+
+    # Answering
+
+    def answer(self, message: str, snapshot: Any) -> Optional[str]:
+        """Reply to a factual inventory question, or None to let the model answer"""
+        index = snapshot.diamond_index
+        if not self.enabled or index is None or index.size == 0:
+            return None
+        question = self.parse(message, index)
+        in_stock = self._in_stock_values(index)
+        if question is None or (question.asks_stock and in_stock is None):
+            self.fallbacks += 1
+            return None
+
+        result = self._query(question, index, snapshot.version, in_stock)
+        reply = getattr(self, f"_reply_{question.intent}")(question, result, index, message)
+        self.answered[question.intent] = self.answered.get(question.intent, 0) + 1
+        return reply
+
+    @staticmethod
+    def _in_stock_values(index: DiamondIndex) -> Optional[List[str]]:
+        """Availability values meaning in stock, or None if the inventory doesn't say"""
+        column = index.categorical.get("availability")
+        if column is None:
+            return None
+        values = [value for value in column.code_of if value in IN_STOCK_VALUES]
+        # Values we can't read ("Reserved" only, or a vocabulary of its own) can't answer stock questions
+        return values or None
+
+    def _query(self, question: ParsedQuestion, index: DiamondIndex, version: int,
+               in_stock: Optional[List[str]] = None) -> Dict[str, Any]:
+        key = question.key() + (in_stock is not None,)
+        with self._lock:
+            if self._memo_version != version:
+                self._memo.clear()
+                self._memo_version = version
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+
+        members = dict(question.members)
+        if in_stock is not None:
+            members["availability"] = in_stock
+        mask = index.match_mask(question.ranges, members)
+        result: Dict[str, Any] = {"total": int(np.count_nonzero(mask)), "stock_known": in_stock is not None}
+        if result["total"]:
+            if "price" in index.numeric:
+                prices = index.numeric["price"].values[mask]
+                prices = prices[~np.isnan(prices)]
+                if len(prices):
+                    result["price_min"], result["price_max"] = float(prices.min()), float(prices.max())
+            sort_field, descending = question.sort or ("price" if "price" in index.numeric else "carat", False)
+            if sort_field in index.numeric:
+                ordered = index.numeric[sort_field].ordered_rows(descending)
+                result["example"] = index.records(ordered[mask[ordered]][:1])[0]
+            else:
+                result["example"] = index.records(np.flatnonzero(mask)[:1])[0]
+        elif "carat" in question.ranges and "carat" in index.numeric:
+            result["closest"] = self._closest_carat(question, index, members)
+
+        with self._lock:
+            self._memo[key] = result
+            if len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _closest_carat(question: ParsedQuestion, index: DiamondIndex,
+                       members: Dict[str, List[str]]) -> Optional[Dict[str, Any]]:
+        """Diamond matching everything but the carat size, nearest to the size asked for"""
+        low, high = question.ranges["carat"]
+        target = (low + high) / 2 if low is not None and high is not None else (low if low is not None else high)
+        ranges = {field: bounds for field, bounds in question.ranges.items() if field != "carat"}
+        rows = np.flatnonzero(index.match_mask(ranges, members))
+        carats = index.numeric["carat"].values[rows]
+        valid = ~np.isnan(carats)
+        if not valid.any():
+            return None
+        best = rows[valid][np.argmin(np.abs(carats[valid] - target))]
+        return index.records(np.array([best]))[0]
+
+    # Replies, in the brand voice: one or two short, casual sentences and a follow-up question.
+    # Only an inventory with an availability column lets them say what is in stock.
+
+    @staticmethod
+    def _where(result: Dict[str, Any]) -> str:
+        return "in stock right now" if result["stock_known"] else "in our inventory"
+
+    @staticmethod
+    def _pick(message: str, options: List[str]) -> str:
+        return options[zlib.crc32(message.encode("utf-8")) % len(options)]
+
+    @staticmethod
+    def _describe_ask(question: ParsedQuestion) -> str:
+        """What the customer asked for, e.g. "2 carat D-F color emerald diamonds under $5,000" """
+        parts = []
+        low, high = question.ranges.get("carat", (None, None))
+        if low is not None and high is not None:
+            parts.append(_carats(round((low + high) / 2, 2)) if high / max(low, 1e-9) < 1.3 else f"{low:g}-{high:g} carat")
+        elif low is not None:
+            parts.append(f"over {_carats(low)}")
+        elif high is not None:
+            parts.append(f"under {_carats(high)}")
+        colors = [grade.upper() for grade in question.members.get("color", [])]
+        if colors:
+            parts.append((colors[0] if len(colors) == 1 else f"{colors[0]}-{colors[-1]}") + " color")
+        clarity = [grade.upper() for grade in question.members.get("clarity", [])]
+        if clarity:
+            parts.append("/".join(clarity))
+        for cut in question.members.get("cut", []):
+            parts.append(f"{cut} cut")
+        shapes = question.members.get("shape", [])
+        if shapes:
+            parts.append(" or ".join(shapes))
+        parts.append("diamonds")
+        low, high = question.ranges.get("price", (None, None))
+        if low is not None and high is not None:
+            parts.append(f"between {_money(low)} and {_money(high)}")
+        elif low is not None:
+            parts.append(f"over {_money(low)}")
+        elif high is not None:
+            parts.append(f"under {_money(high)}")
+        return " ".join(parts)
+
+    @staticmethod
+    def _describe_diamond(record: Dict[str, Any], index: DiamondIndex) -> str:
+        """e.g. "1.02 carat E VS1 oval with an excellent cut for $4,800" """
+        def value(field: str) -> Any:
+            column = index.columns.get(field)
+            return record.get(column) if column is not None else None
+
+        parts = []
+        if value("carat") is not None:
+            parts.append(_carats(float(value("carat"))))
+        for field in ("color", "clarity"):
+            if value(field) is not None:
+                parts.append(str(value(field)))
+        parts.append(str(value("shape")).lower() if value("shape") is not None else "diamond")
+        text = " ".join(parts)
+        if value("cut") is not None:
+            cut = str(value("cut")).lower()
+            text += f" with {_article(cut)} {cut} cut"
+        if value("price") is not None:
+            text += f" for {_money(float(value('price')))}"
+        return f"{_article(text)} {text}"
+
+    def _reply_availability(self, question: ParsedQuestion, result: Dict[str, Any],
+                            index: DiamondIndex, message: str) -> str:
+        ask = self._describe_ask(question)
+        where = self._where(result)
+        if result["total"] == 0:
+            closest = result.get("closest")
+            if closest is not None:
+                return (f"We don't have any {ask} {where}, but the closest I've got is "
+                        f"{self._describe_diamond(closest, index)}. Want to hear more about it?")
+            return f"We don't have any {ask} {where}. Want me to check with the team for you?"
+        example = self._describe_diamond(result["example"], index)
+        if not result["stock_known"]:
+            if result["total"] == 1:
+                return f"Our inventory lists one: {example}. Want to hear more about it?"
+            return self._pick(message, [
+                f"Our inventory lists {result['total']:,} of those, starting with {example}. Want me to narrow it down?",
+                f"There are {result['total']:,} of them in our inventory. The most affordable is {example}. Any other preferences?",
+            ])
+        if result["total"] == 1:
+            return f"Yes, we have one in stock: {example}. Want to hear more about it?"
+        return self._pick(message, [
+            f"Yes! We have {result['total']:,} of those in stock, starting with {example}. Want me to narrow it down?",
+            f"We sure do, {result['total']:,} of them in stock. The most affordable is {example}. Any other preferences?",
+            f"Yes, we have {ask} in stock right now, like {example}. Want to see more options?",
+        ])
+
+    def _reply_superlative(self, question: ParsedQuestion, result: Dict[str, Any],
+                           index: DiamondIndex, message: str) -> str:
+        ask = self._describe_ask(question)
+        if result["total"] == 0:
+            return f"We don't have any {ask} {self._where(result)}. Want me to check with the team for you?"
+        word = {("price", False): "most affordable", ("price", True): "most premium",
+                ("carat", True): "biggest", ("carat", False): "smallest"}[question.sort]
+        ask = ask[:-len("diamonds")] + "diamond" if ask.endswith("diamonds") else ask
+        return self._pick(message, [
+            f"Our {word} {ask}{' right now' if result['stock_known'] else ''} is "
+            f"{self._describe_diamond(result['example'], index)}. Want to take a closer look?",
+            f"That would be {self._describe_diamond(result['example'], index)}. Should I tell you more about it?",
+        ])
+
+    def _reply_price_range(self, question: ParsedQuestion, result: Dict[str, Any],
+                           index: DiamondIndex, message: str) -> str:
+        ask = self._describe_ask(question)
+        if result["total"] == 0 or "price_min" not in result:
+            return self._reply_availability(question, result, index, message)
+        low, high = _money(result["price_min"]), _money(result["price_max"])
+        if result["total"] == 1 or low == high:
+            return (f"There's {self._describe_diamond(result['example'], index)} {self._where(result)}. "
+                    f"Want to hear more about it?")
+        return self._pick(message, [
+            f"Our {ask} run from {low} to {high}. Do you have a budget in mind?",
+            f"They go from {low} up to {high}, with {result['total']:,} to choose from. What budget are you thinking?",
+        ])
+
+    def _reply_count(self, question: ParsedQuestion, result: Dict[str, Any],
+                     index: DiamondIndex, message: str) -> str:
+        ask = self._describe_ask(question)
+        if result["total"] == 0:
+            return self._reply_availability(question, result, index, message)
+        if result["total"] == 1:
+            return f"Just one {self._where(result)}: {self._describe_diamond(result['example'], index)}. Want to hear more?"
+        return f"We have {result['total']:,} {ask} {self._where(result)}. Want me to help narrow it down?"
+
+    def stats(self) -> Dict[str, Any]:
+        answered = dict(self.answered)
+        total = sum(answered.values())
+        return {
+            "enabled": self.enabled,
+            "answered": total,
+            "by_intent": answered,
+            "fallbacks": self.fallbacks,
+            "answer_rate": total / (total + self.fallbacks) if total + self.fallbacks else 0.0,
+        }
+
+
+# Global instance
+fast_path = FastPathAnswerer()
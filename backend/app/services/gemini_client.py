@@ -1,27 +1,121 @@
-import google.generativeai as genai
-from typing import List, Dict, Any, Optional
-from app.config import GEMINI_API_KEY, GEMINI_MODEL
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from app.config import GEMINI_CONTEXT_CACHE_TTL, LLM_BACKEND
+from app.services.chat_session_pool import ChatSessionPool
+from app.services.image_preprocessing import image_preprocessor
+from app.services.llm_backends import LLMBackend, get_llm_backend
+from app.services.llm_dispatch import LLMDispatcher, LLMUnavailable
 from app.utils.logger import logger
 
-import PIL.Image
+# Reply shown to the user when the model call fails
+FALLBACK_RESPONSE = "I apologize, but I'm having trouble connecting to my knowledge base right now. Please try again later."
+
 
 class GeminiClient:
-    """Wrapper for Google Gemini API"""
+    """Wrapper for the chat model API (Google Gemini unless LLM_BACKEND selects another backend)"""
+    
+    # Models kept per system instruction: the current knowledge version and the
+    # previous one, which turns started before a reload may still be using
+    MAX_INSTRUCTION_MODELS = 2
+    
+    def __init__(self, backend: Optional[LLMBackend] = None):
+        self.backend = backend or get_llm_backend(LLM_BACKEND)
+        self._model = None
+        self._lock = threading.Lock()
+        self._instruction_models: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self._instruction_lock = threading.Lock()
+        self.session_pool = ChatSessionPool()
+        # Bounds concurrent model calls and turns callers away when overloaded
+        self.dispatcher = LLMDispatcher()
+    
+    @property
+    def model(self) -> Any:
+        """Model without a system instruction, built on first use"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model, _ = self.backend.create_model()
+        return self._model
     
-    def __init__(self):
-        self.configure()
-        self.model = genai.GenerativeModel(GEMINI_MODEL)
+    def warm_up(self) -> None:
+        """Import and configure the SDK in the background so the first request doesn't pay for it"""
+        threading.Thread(target=lambda: self.model, name="gemini-warm-up", daemon=True).start()
     
     def configure(self):
-        """Configure Gemini API with key"""
-        try:
-            genai.configure(api_key=GEMINI_API_KEY)
-            logger.info("Gemini API configured successfully")
-        except Exception as e:
-            logger.error(f"Failed to configure Gemini API: {str(e)}")
-            raise
+        """Configure the model backend (API key for Gemini)"""
+        self.backend.configure()
 
-    def create_chat_session(self, history: List[Dict[str, str]] = None) -> Any:
+    def _create_instruction_model(self, system_instruction: str) -> Tuple[Any, Any]:
+        """Model carrying a system instruction, backed by a context cache when the backend supports it"""
+        return self.backend.create_model(system_instruction)
+    
+    def _ready_instruction_model(self, instruction_key: Any) -> Optional[Dict[str, Any]]:
+        entry = self._instruction_models.get(instruction_key)
+        if entry is None or entry["expires_at"] < time.monotonic():
+            return None
+        return entry
+    
+    def model_for(self, system_instruction: Optional[str], instruction_key: Any = None) -> Tuple[Any, Any]:
+        """
+        Model for a system instruction and the key pooled chat sessions are matched on
+        
+        The model is built once per instruction_key (the knowledge version), so
+        the instruction is not rebuilt or re-sent as part of every user turn.
+        """
+        if system_instruction is None:
+            return self.model, None
+        if instruction_key is None:
+            instruction_key = hash(system_instruction)
+        
+        entry = self._ready_instruction_model(instruction_key)
+        if entry is None:
+            with self._instruction_lock:
+                entry = self._ready_instruction_model(instruction_key)
+                if entry is None:
+                    model, cached_content = self._create_instruction_model(system_instruction)
+                    # Rebuild shortly before the server-side cache would expire
+                    lifetime = GEMINI_CONTEXT_CACHE_TTL * 0.9 if cached_content is not None else float("inf")
+                    entry = {
+                        "model": model,
+                        "cached_content": cached_content,
+                        "model_key": (instruction_key, time.monotonic()),
+                        "expires_at": time.monotonic() + lifetime,
+                    }
+                    self._instruction_models.pop(instruction_key, None)
+                    self._instruction_models[instruction_key] = entry
+                    while len(self._instruction_models) > self.MAX_INSTRUCTION_MODELS:
+                        _, evicted = self._instruction_models.popitem(last=False)
+                        self._release_context_cache(evicted["cached_content"])
+        return entry["model"], entry["model_key"]
+    
+    async def model_for_async(self, system_instruction: Optional[str], instruction_key: Any = None) -> Tuple[Any, Any]:
+        """model_for, building a new model (a network call with context caching) off the event loop"""
+        if system_instruction is None:
+            return self.model, None
+        if instruction_key is None:
+            instruction_key = hash(system_instruction)
+        if self._ready_instruction_model(instruction_key) is None:
+            return await asyncio.to_thread(self.model_for, system_instruction, instruction_key)
+        return self.model_for(system_instruction, instruction_key)
+    
+    def _release_context_cache(self, cached_content: Any) -> None:
+        """Delete a context cache that is no longer used instead of paying for it until it expires"""
+        if cached_content is None:
+            return
+        
+        def delete():
+            try:
+                cached_content.delete()
+            except Exception as e:
+                logger.warning(f"Could not delete Gemini context cache: {str(e)}")
+        
+        threading.Thread(target=delete, name="gemini-cache-delete", daemon=True).start()
+    
+    def create_chat_session(self, history: List[Dict[str, str]] = None, model: Any = None) -> Any:
         """Create a new chat session with history"""
         gemini_history = []
         if history:
@@ -32,42 +126,188 @@ class GeminiClient:
                     "parts": [message["content"]]
                 })
         
-        return self.model.start_chat(history=gemini_history)
+        return (model or self.model).start_chat(history=gemini_history)
+
+    def _start_turn(self,
+                    messages: List[Dict[str, str]],
+                    system_prompt: str,
+                    session_id: Optional[str],
+                    model: Any = None,
+                    model_key: Any = None) -> Tuple[Any, str]:
+        """Get a chat session holding messages[:-1] and the prompt for the new message"""
+        # Prepare history (excluding the last new message)
+        history_messages = messages[:-1]
+        chat_session = None
+        if session_id:
+            chat_session = self.session_pool.checkout(session_id, history_messages, model_key)
+        if chat_session is None:
+            chat_session = self.create_chat_session(history_messages, model)
+        return chat_session, self._build_prompt(messages[-1]["content"], system_prompt)
+
+    def _finish_turn(self,
+                     session_id: Optional[str],
+                     chat_session: Any,
+                     messages: List[Dict[str, str]],
+                     reply: str,
+                     model_key: Any = None) -> None:
+        """Return the session to the pool for the next turn of this conversation"""
+        if not session_id:
+            return
+        # Per-turn context is sent with every turn, so keep only the user's own
+        # words in the live history rather than one context copy per turn
+        chat_session.history[-2].parts[0].text = messages[-1]["content"]
+        self.session_pool.checkin(
+            session_id, chat_session, messages + [{"role": "assistant", "content": reply}], model_key
+        )
 
     def generate_response(self, 
                          messages: List[Dict[str, str]], 
-                         system_prompt: str = "") -> str:
+                         system_prompt: str = "",
+                         session_id: Optional[str] = None,
+                         system_instruction: Optional[str] = None,
+                         instruction_key: Any = None) -> str:
         """
         Generate response using Gemini
         
         Args:
             messages: List of message dictionaries {"role": "user/assistant", "content": "..."}
-            system_prompt: Context/System instructions
+            system_prompt: Context for this turn only, sent with the user message
+            session_id: Reuse the live chat session of this conversation when possible
+            system_instruction: Static instructions and knowledge, sent as the model's system instruction
+            instruction_key: Identifies the system instruction (the knowledge version)
         """
         try:
-            # Prepare history (excluding the last new message)
-            history_messages = messages[:-1]
-            last_message_content = messages[-1]["content"]
-            
-            # Create chat session with history
-            chat_session = self.create_chat_session(history_messages)
-            
-            # Construct the final prompt with system instructions if needed
-            # Since system instructions are often better placed in the first message or context
-            # We will prepend it to the current message if it's the start, or just send it with the message
-            
-            final_prompt = last_message_content
-            if system_prompt:
-                 # simple approach: prepend system prompt to the user message for context
-                 # for more complex flows, we might want to maintain it in history or use new system_instruction param in beta
-                 final_prompt = f"Context: {system_prompt}\n\nUser Question: {last_message_content}"
+            model, model_key = self.model_for(system_instruction, instruction_key)
+            chat_session, final_prompt = self._start_turn(messages, system_prompt, session_id, model, model_key)
 
             response = chat_session.send_message(final_prompt)
+            self._finish_turn(session_id, chat_session, messages, response.text, model_key)
             return response.text
             
         except Exception as e:
             logger.error(f"Error generating Gemini response: {str(e)}")
-            return "I apologize, but I'm having trouble connecting to my knowledge base right now. Please try again later."
+            return FALLBACK_RESPONSE
+
+    async def generate_response_async(self,
+                                      messages: List[Dict[str, str]],
+                                      system_prompt: str = "",
+                                      session_id: Optional[str] = None,
+                                      system_instruction: Optional[str] = None,
+                                      instruction_key: Any = None,
+                                      stage: str = "chat",
+                                      coalesce_key: Any = None,
+                                      deadline: Optional[float] = None,
+                                      hedge: bool = False) -> str:
+        """
+        Generate response using Gemini without blocking the event loop
+
+        Args:
+            messages: List of message dictionaries {"role": "user/assistant", "content": "..."}
+            system_prompt: Context for this turn only, sent with the user message
+            session_id: Reuse the live chat session of this conversation when possible
+            system_instruction: Static instructions and knowledge, sent as the model's system instruction
+            instruction_key: Identifies the system instruction (the knowledge version)
+            stage: Kind of call, for the dispatcher's queue metrics
+            coalesce_key: Concurrent calls with the same key share one model request
+            deadline: time.monotonic() instant after which the call is cancelled
+            hedge: Send a second request if this one runs long (when the dispatcher hedges)
+
+        Raises:
+            LLMUnavailable: The dispatcher queue is full or the provider is rate limiting
+            DeadlineExceeded: The deadline passed before the model answered
+        """
+        try:
+            model, model_key = await self.model_for_async(system_instruction, instruction_key)
+            chat_session, final_prompt = self._start_turn(messages, system_prompt, session_id, model, model_key)
+            own_sessions = [chat_session]
+
+            async def send(session: Any = chat_session) -> Tuple[str, Any]:
+                response = await session.send_message_async(final_prompt)
+                return response.text, session
+
+            async def send_hedge() -> Tuple[str, Any]:
+                # A fresh session, since the first one is still waiting on its own turn
+                session = self.create_chat_session(messages[:-1], model)
+                own_sessions.append(session)
+                return await send(session)
+
+            reply, answered = await self.dispatcher.run(
+                stage, send, coalesce_key, deadline, send_hedge if hedge else None
+            )
+            # A coalesced call never sent its own turn, so its session isn't pooled
+            if any(answered is session for session in own_sessions):
+                self._finish_turn(session_id, answered, messages, reply, model_key)
+            return reply
+
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"Error generating Gemini response: {str(e)}")
+            return FALLBACK_RESPONSE
+
+    async def stream_response(self,
+                              messages: List[Dict[str, str]],
+                              system_prompt: str = "",
+                              session_id: Optional[str] = None,
+                              system_instruction: Optional[str] = None,
+                              instruction_key: Any = None,
+                              stage: str = "chat",
+                              deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Stream response text chunks from Gemini as they are generated
+
+        Args:
+            messages: List of message dictionaries {"role": "user/assistant", "content": "..."}
+            system_prompt: Context for this turn only, sent with the user message
+            session_id: Reuse the live chat session of this conversation when possible
+            system_instruction: Static instructions and knowledge, sent as the model's system instruction
+            instruction_key: Identifies the system instruction (the knowledge version)
+            stage: Kind of call, for the dispatcher's queue metrics
+            deadline: time.monotonic() instant after which the stream is cancelled
+
+        Raises:
+            LLMUnavailable: The dispatcher queue is full or the provider is rate limiting
+            DeadlineExceeded: The deadline passed before the reply finished streaming
+            Exception: The model failed after part of the reply was yielded (before that,
+                FALLBACK_RESPONSE is yielded instead)
+        """
+        chunks: List[str] = []
+        try:
+            model, model_key = await self.model_for_async(system_instruction, instruction_key)
+            chat_session, final_prompt = self._start_turn(messages, system_prompt, session_id, model, model_key)
+
+            # The slot is held until the whole reply has streamed
+            async with self.dispatcher.slot(stage, deadline):
+                response = await self.dispatcher.within(
+                    deadline, chat_session.send_message_async(final_prompt, stream=True), stage
+                )
+                stream = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await self.dispatcher.within(deadline, stream.__anext__(), stage)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        chunks.append(chunk.text)
+                        yield chunk.text
+            self._finish_turn(session_id, chat_session, messages, "".join(chunks), model_key)
+
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming Gemini response: {str(e)}")
+            if chunks:
+                # Part of the reply already went out; an apology tacked onto it would read as one answer
+                raise
+            yield FALLBACK_RESPONSE
+
+    def _build_prompt(self, message: str, system_prompt: str = "") -> str:
+        """Prepend the per-turn context to the user message"""
+        if system_prompt:
+            # Static instructions travel as the model's system_instruction; only
+            # context that changes from turn to turn is sent with the message
+            return f"Context: {system_prompt}\n\nUser Question: {message}"
+        return message
 
     def generate_content(self, prompt: str) -> str:
         """Simple generation for single prompt"""
@@ -78,11 +318,12 @@ class GeminiClient:
             logger.error(f"Error generating content: {str(e)}")
             raise
 
-    def analyze_image(self, image_path: str, prompt: str) -> str:
+    def analyze_image(self, image_path: str, prompt: str, digest: Optional[str] = None) -> str:
         """Analyze an image and return extracted text/data"""
         try:
-            img = PIL.Image.open(image_path)
-            response = self.model.generate_content([prompt, img])
+            # Upload a downsampled, re-encoded copy rather than the full-size photo
+            image = image_preprocessor.prepare(Path(image_path), digest)
+            response = self.model.generate_content([prompt, {"mime_type": image["mime_type"], "data": image["data"]}])
             return response.text
         except Exception as e:
             logger.error(f"Error analyzing image {image_path}: {str(e)}")
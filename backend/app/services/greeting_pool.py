@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app.config import GREETING_POOL_SIZE, GREETING_POOL_CONCURRENCY, GREETING_POOL_RETRY_DELAY
+from app.utils.logger import logger
+
+
+class GreetingPool:
+    """
+    Pre-generated greetings for new sessions.
+
+    New sessions take a greeting instantly instead of waiting for a model call;
+    each take schedules a background refill up to the target size. Greetings
+    belong to the knowledge version they were generated for, and the pool is
+    emptied when the version changes. A failed generation pauses refilling for
+    retry_delay seconds.
+    """
+
+    def __init__(self,
+                 generate: Callable[[], Awaitable[Tuple[int, Optional[str]]]],
+                 target_size: int = GREETING_POOL_SIZE,
+                 concurrency: int = GREETING_POOL_CONCURRENCY,
+                 retry_delay: float = GREETING_POOL_RETRY_DELAY):
+        # generate returns (knowledge version, greeting or None on failure)
+        self.generate = generate
+        self.target_size = target_size
+        self.concurrency = max(1, concurrency)
+        self.retry_delay = retry_delay
+        self._greetings: Deque[str] = deque()
+        self._version = None
+        self._refill_task: Optional[asyncio.Task] = None
+        self._retry_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_size > 0
+
+    def take(self, version: int) -> Optional[str]:
+        """A greeting for this knowledge version, or None if the pool is empty"""
+        if not self.enabled:
+            return None
+        self._check_version(version)
+        greeting = self._greetings.popleft() if self._greetings else None
+        if greeting is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.refill()
+        return greeting
+
+    def refill(self) -> None:
+        """Top the pool up in the background unless a refill is already running"""
+        if not self.enabled or len(self._greetings) >= self.target_size:
+            return
+        if self._refill_task is not None and not self._refill_task.done():
+            return
+        if time.monotonic() < self._retry_at:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Refilling needs an event loop; the next take from a request will start it
+            return
+        self._refill_task = loop.create_task(self._refill())
+
+    async def stop(self) -> None:
+        """Cancel a running refill"""
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+        self._refill_task = None
+
+    def _check_version(self, version: int) -> None:
+        if version != self._version:
+            self._greetings.clear()
+            self._version = version
+
+    async def _refill(self) -> None:
+        while len(self._greetings) < self.target_size:
+            batch = min(self.concurrency, self.target_size - len(self._greetings))
+            results = await asyncio.gather(*[self.generate() for _ in range(batch)], return_exceptions=True)
+
+            failed = False
+            for result in results:
+                if isinstance(result, BaseException) or result[1] is None:
+                    failed = True
+                    continue
+                version, greeting = result
+                # Versions only grow: a newer one means the inventory reloaded,
+                # an older one that the greeting was generated for a replaced snapshot
+                if self._version is None or version > self._version:
+                    self._check_version(version)
+                if version == self._version:
+                    self._greetings.append(greeting)
+                    self.generated += 1
+
+            if failed:
+                self.failures += 1
+                self._retry_at = time.monotonic() + self.retry_delay
+                logger.warning(f"Greeting generation failed, pausing refill for {self.retry_delay:.0f}s")
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        takes = self.hits + self.misses
+        return {
+            "size": len(self._greetings),
+            "target_size": self.target_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / takes if takes else 0.0,
+            "generated": self.generated,
+            "failures": self.failures,
+            "knowledge_version": self._version,
+        }
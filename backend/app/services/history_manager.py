@@ -0,0 +1,185 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from app.config import (
+    HISTORY_TOKEN_BUDGET, HISTORY_RECENT_MESSAGES, HISTORY_SUMMARY_MAX_TOKENS, SESSION_CACHE_MAX_SESSIONS
+)
+from app.database import get_session_summary_async, save_session_summary_async
+from app.prompts import HISTORY_SUMMARY_PROMPT
+from app.services.gemini_client import gemini_client, FALLBACK_RESPONSE
+from app.utils.logger import logger
+from app.utils.tokens import estimate_tokens
+
+
+class HistoryManager:
+    """
+    Token-budgeted view of a conversation for the model.
+
+    The most recent messages are sent verbatim and older ones are folded into a
+    rolling summary per session, stored in SQLite. Together they stay within
+    token_budget, so requests stop growing with the length of the conversation.
+    Folding runs in the background and takes more messages than a turn drops,
+    so the window grows back over the next turns instead of sliding (and
+    rebuilding the live chat session) on every turn.
+    """
+
+    # Role marker and separators of a message in the request
+    MESSAGE_OVERHEAD_TOKENS = 4
+    # Characters kept per message when the summary is built without the model
+    EXTRACT_CHARS = 160
+
+    def __init__(self,
+                 token_budget: int = HISTORY_TOKEN_BUDGET,
+                 recent_messages: int = HISTORY_RECENT_MESSAGES,
+                 summary_max_tokens: int = HISTORY_SUMMARY_MAX_TOKENS,
+                 max_sessions: int = SESSION_CACHE_MAX_SESSIONS):
+        self.token_budget = token_budget
+        self.recent_messages = max(1, recent_messages)
+        self.summary_max_tokens = summary_max_tokens
+        self.max_sessions = max_sessions
+        # session_id -> {"summary", "covered"}; covered counts the session's oldest messages
+        self._summaries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._folds: Dict[str, asyncio.Task] = {}
+        self.folded = 0
+        self.fallbacks = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.token_budget > 0
+
+    async def build_window(self,
+                           session_id: str,
+                           history: List[Dict[str, str]],
+                           offset: int = 0) -> Tuple[List[Dict[str, str]], str]:
+        """
+        Messages to send verbatim and the summary of the turns before them
+
+        Args:
+            history: Recent messages of the session, ending with the new user message
+            offset: Number of older messages of the session not included in history
+        """
+        if not self.enabled or not history:
+            return history, ""
+
+        state = await self._get_summary(session_id)
+        summary = state["summary"]
+        # Messages that aren't in the summary yet; the newest one is always sent
+        start = min(max(0, state["covered"] - offset), len(history) - 1)
+        pending = history[start:]
+
+        budget = self.token_budget - estimate_tokens(summary)
+        count = used = 0
+        for message in reversed(pending):
+            cost = estimate_tokens(message["content"]) + self.MESSAGE_OVERHEAD_TOKENS
+            if count and (count >= self.recent_messages or used + cost > budget):
+                break
+            count += 1
+            used += cost
+        window = pending[len(pending) - count:]
+
+        if count < len(pending):
+            fold = len(pending) - max(1, count // 2)
+            self._schedule_fold(session_id, summary, pending[:fold], offset + start + fold)
+        return window, summary
+
+    async def _get_summary(self, session_id: str) -> Dict[str, Any]:
+        state = self._summaries.get(session_id)
+        if state is None:
+            stored = await get_session_summary_async(session_id)
+            # A fold may have finished while the database was read
+            state = self._summaries.get(session_id) or stored or {"summary": "", "covered": 0}
+        self._remember(session_id, state)
+        return state
+
+    def forget(self, session_id: str) -> None:
+        """Drop a session's summary, e.g. once its messages have been archived"""
+        self._summaries.pop(session_id, None)
+
+    def _remember(self, session_id: str, state: Dict[str, Any]) -> None:
+        self._summaries[session_id] = state
+        self._summaries.move_to_end(session_id)
+        while len(self._summaries) > self.max_sessions:
+            self._summaries.popitem(last=False)
+
+    def _schedule_fold(self, session_id: str, summary: str, messages: List[Dict[str, str]], covered: int) -> None:
+        """Fold messages into the summary in the background unless a fold is already running"""
+        if session_id in self._folds:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._fold(session_id, summary, messages, covered))
+        self._folds[session_id] = task
+        task.add_done_callback(lambda _: self._folds.pop(session_id, None))
+
+    async def _fold(self, session_id: str, summary: str, messages: List[Dict[str, str]], covered: int) -> None:
+        start = time.perf_counter()
+        try:
+            updated = await self._summarize(summary, messages)
+            self._remember(session_id, {"summary": updated, "covered": covered})
+            await save_session_summary_async(session_id, updated, covered)
+            self.folded += len(messages)
+            logger.info(
+                f"Folded {len(messages)} messages into the summary of session {session_id} "
+                f"in {time.perf_counter() - start:.3f}s"
+            )
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Error summarizing history for session {session_id}: {str(e)}")
+
+    async def _summarize(self, summary: str, messages: List[Dict[str, str]]) -> str:
+        """Summary updated with messages, falling back to an excerpt of each if the model call fails"""
+        transcript = "\n".join(
+            f"{'Customer' if message['role'] == 'user' else 'Assistant'}: {message['content']}"
+            for message in messages
+        )
+        prompt = HISTORY_SUMMARY_PROMPT.format(
+            max_words=self.summary_max_tokens * 3 // 4,
+            summary=summary or "(none yet)",
+            messages=transcript
+        )
+        updated = await gemini_client.generate_response_async(
+            messages=[{"role": "user", "content": prompt}], stage="summary"
+        )
+        if updated == FALLBACK_RESPONSE or not updated.strip():
+            self.fallbacks += 1
+            excerpts = [
+                f"{'Customer' if message['role'] == 'user' else 'Assistant'}: "
+                f"{message['content'][:self.EXTRACT_CHARS]}"
+                for message in messages
+            ]
+            updated = "\n".join([summary] + excerpts if summary else excerpts)
+        return self._clip(updated.strip())
+
+    def _clip(self, summary: str) -> str:
+        """Keep the most recent part of a summary that is over its token limit"""
+        max_chars = self.summary_max_tokens * 4
+        if len(summary) <= max_chars:
+            return summary
+        clipped = summary[-max_chars:]
+        # Start at a word boundary
+        space = clipped.find(" ")
+        return clipped[space + 1:] if 0 <= space < 40 else clipped
+
+    async def stop(self) -> None:
+        """Cancel running folds; their messages are folded again on the next turn"""
+        tasks = list(self._folds.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._folds.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "token_budget": self.token_budget,
+            "sessions": len(self._summaries),
+            "folding": len(self._folds),
+            "folded_messages": self.folded,
+            "fallbacks": self.fallbacks,
+            "failures": self.failures,
+        }
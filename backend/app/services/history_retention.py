@@ -0,0 +1,227 @@
+"""
+Chat history retention.
+
+Sessions idle for longer than the retention period are moved out of the
+messages table into append-only archives: gzip JSONL files named after the
+day of the session's last message (CHAT_ARCHIVE_DIR/2026-01-31.jsonl.gz).
+Each batch of sessions is written as one gzip member and fsynced before the
+batch is deleted from the database in one short transaction, so a crash in
+between leaves at most an unreferenced member, never lost messages. After a
+run that deleted anything, planner statistics are refreshed and the file is
+vacuumed once enough of it is free.
+
+export() streams a session's full conversation from both tiers: archived
+members first (each read by its byte range, decompressed a block at a time),
+then whatever is still in the database.
+"""
+import asyncio
+import gzip
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-worker lock
+    fcntl = None
+
+from app.config import (
+    CHAT_RETENTION_DAYS, CHAT_RETENTION_INTERVAL, CHAT_RETENTION_BATCH_SESSIONS,
+    CHAT_ARCHIVE_DIR, CHAT_VACUUM_FREE_RATIO
+)
+from app.database import (
+    find_idle_sessions, iter_session_messages, archive_sessions, get_archived_segments,
+    iter_messages, count_messages, optimize_db
+)
+from app.utils.logger import logger
+
+ARCHIVE_SUFFIX = ".jsonl.gz"
+READ_BLOCK = 16 * 1024
+# Largest piece decompressed at once while exporting, however well the text compressed
+DECOMPRESS_CHUNK = 256 * 1024
+# Idle sessions looked up per scan of the messages index, then archived in batches
+SCAN_BATCHES = 100
+# Pause between batches so queued message writes get the database in between
+BATCH_PAUSE = 0.05
+
+
+class HistoryRetention:
+    """Archives and deletes idle chat sessions in the background, and exports full histories"""
+
+    def __init__(self,
+                 ttl_days: float = CHAT_RETENTION_DAYS,
+                 interval: float = CHAT_RETENTION_INTERVAL,
+                 archive_dir: str = CHAT_ARCHIVE_DIR,
+                 batch_sessions: int = CHAT_RETENTION_BATCH_SESSIONS,
+                 vacuum_free_ratio: float = CHAT_VACUUM_FREE_RATIO):
+        self.ttl_days = ttl_days
+        self.interval = interval
+        self.archive_dir = Path(archive_dir)
+        self.batch_sessions = max(1, batch_sessions)
+        self.vacuum_free_ratio = vacuum_free_ratio
+        # Called with the ids of each archived batch, so in-memory session state can be dropped
+        self.on_archived: Optional[Callable[[List[str]], None]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "runs": 0, "sessions_archived": 0, "messages_archived": 0, "bytes_archived": 0,
+            "vacuums": 0, "skipped_runs": 0,
+        }
+        self._last_run: Optional[Dict[str, Any]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_days > 0
+
+    def start(self) -> None:
+        if not self.enabled or self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Archiving chat sessions idle for {self.ttl_days:g} days every {self.interval:g}s")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error archiving chat history: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Archive every session idle past the retention period, one batch at a time"""
+        start = time.perf_counter()
+        before = (datetime.now(timezone.utc) - timedelta(days=self.ttl_days)).strftime("%Y-%m-%d %H:%M:%S")
+        result = {"sessions": 0, "messages": 0, "bytes": 0, "vacuumed": False}
+        lock = await asyncio.to_thread(self._lock)
+        if lock is False:
+            # Another worker is already archiving
+            self._stats["skipped_runs"] += 1
+            return result
+        try:
+            scan_limit = self.batch_sessions * SCAN_BATCHES
+            while True:
+                idle = await asyncio.to_thread(find_idle_sessions, before, scan_limit)
+                for i in range(0, len(idle), self.batch_sessions):
+                    sessions = idle[i:i + self.batch_sessions]
+                    archived, deleted = await asyncio.to_thread(self._archive_batch, sessions)
+                    result["sessions"] += len(sessions)
+                    result["messages"] += deleted
+                    result["bytes"] += archived
+                    if self.on_archived is not None:
+                        self.on_archived([session["session_id"] for session in sessions])
+                    await asyncio.sleep(BATCH_PAUSE)
+                if len(idle) < scan_limit:
+                    break
+            if result["messages"]:
+                maintenance = await asyncio.to_thread(optimize_db, self.vacuum_free_ratio)
+                result["vacuumed"] = maintenance["vacuumed"]
+        finally:
+            if lock is not None:
+                lock.close()
+
+        result["seconds"] = time.perf_counter() - start
+        result["finished_at"] = time.time()
+        self._stats["runs"] += 1
+        self._stats["sessions_archived"] += result["sessions"]
+        self._stats["messages_archived"] += result["messages"]
+        self._stats["bytes_archived"] += result["bytes"]
+        self._stats["vacuums"] += int(result["vacuumed"])
+        self._last_run = result
+        if result["sessions"]:
+            logger.info(
+                f"Archived {result['sessions']} idle sessions ({result['messages']} messages, "
+                f"{result['bytes'] / 1e6:.1f} MB) in {result['seconds']:.2f}s"
+            )
+        return result
+
+    def _lock(self) -> Any:
+        """Exclusive lock on the archive directory: a file handle, None without fcntl, False if held elsewhere"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            return None
+        handle = open(self.archive_dir / ".lock", "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        return handle
+
+    def _archive_batch(self, sessions: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Write a batch of sessions to the archives, then delete it; returns (bytes written, messages deleted)"""
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        for session in sessions:
+            by_day.setdefault(str(session["last_message_at"])[:10], []).append(session)
+
+        segments = []
+        written = 0
+        for day, group in by_day.items():
+            name = f"{day}{ARCHIVE_SUFFIX}"
+            with open(self.archive_dir / name, "ab") as raw:
+                offset = raw.tell()
+                with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+                    for message in iter_session_messages(group):
+                        archive.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+                length = raw.tell() - offset
+            written += length
+            for session in group:
+                segments.append({**session, "archive": name, "member_offset": offset, "member_length": length})
+        return written, archive_sessions(segments)
+
+    def has_history(self, session_id: str) -> bool:
+        return count_messages(session_id) > 0 or bool(get_archived_segments(session_id))
+
+    def export(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        """Every message of a session as {"role", "content", "timestamp"}, oldest first"""
+        for segment in get_archived_segments(session_id):
+            yield from self._read_segment(segment, session_id)
+        yield from iter_messages(session_id)
+
+    def _read_segment(self, segment: Dict[str, Any], session_id: str) -> Iterator[Dict[str, Any]]:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        pending = b""
+        with open(self.archive_dir / segment["archive"], "rb") as f:
+            f.seek(segment["member_offset"])
+            remaining = segment["member_length"]
+            while remaining > 0:
+                block = f.read(min(READ_BLOCK, remaining))
+                if not block:
+                    logger.warning(f"Archive {segment['archive']} is shorter than recorded")
+                    break
+                remaining -= len(block)
+                while block:
+                    *lines, pending = (pending + decompressor.decompress(block, DECOMPRESS_CHUNK)).split(b"\n")
+                    block = decompressor.unconsumed_tail
+                    for line in lines:
+                        message = json.loads(line)
+                        if message.pop("session_id") == session_id:
+                            yield message
+
+    def stats(self) -> Dict[str, Any]:
+        archives = list(self.archive_dir.glob(f"*{ARCHIVE_SUFFIX}")) if self.archive_dir.is_dir() else []
+        return {
+            "enabled": self.enabled,
+            "ttl_days": self.ttl_days,
+            **self._stats,
+            "archive_files": len(archives),
+            "archive_bytes": sum(path.stat().st_size for path in archives),
+            "last_run": self._last_run,
+        }
+
+
+# Global instance
+history_retention = HistoryRetention()
@@ -0,0 +1,345 @@
+"""
+Image analysis ingestion pipeline.
+
+Analyzes product photos with bounded concurrency, retries failed calls with
+exponential backoff, and appends each result to a content-addressed JSON-lines
+cache as soon as it completes. Photos that are near-identical to an analyzed
+one (by perceptual hash) reuse its analysis instead of making another call.
+Runs in the background from the API or as a standalone batch job:
+
+    python -m app.services.image_ingestion --workers 8
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import (
+    IMAGE_DATA_DIR, DATA_CACHE_FILE, IMAGE_CACHE_FILE,
+    IMAGE_INGEST_WORKERS, IMAGE_INGEST_MAX_RETRIES, IMAGE_INGEST_BACKOFF,
+    IMAGE_DEDUPE, IMAGE_DEDUPE_DISTANCE
+)
+from app.services.image_preprocessing import hamming, image_preprocessor
+from app.utils.logger import logger
+
+IMAGE_PATTERNS = ("*.jpeg", "*.jpg", "*.png")
+
+
+def find_images(image_dir: str = IMAGE_DATA_DIR) -> List[Path]:
+    """All product images in the image directory"""
+    directory = Path(image_dir)
+    return [path for pattern in IMAGE_PATTERNS for path in directory.glob(pattern)]
+
+
+def hash_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of the file contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_analysis(response_text: str) -> Optional[Dict[str, Any]]:
+    """Extract the JSON object from a model response, or None if there is none"""
+    start = response_text.find('{')
+    end = response_text.rfind('}') + 1
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(response_text[start:end])
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class ImageAnalysisCache:
+    """
+    Content-addressed cache of image analysis results.
+
+    Results are keyed by the SHA-256 of the image bytes, so a replaced image is
+    re-analyzed even if it keeps its filename. Entries are appended to a
+    JSON-lines journal one at a time; the last entry for a hash wins.
+    """
+
+    def __init__(self, path: str = IMAGE_CACHE_FILE, legacy_path: str = DATA_CACHE_FILE):
+        self.path = Path(path)
+        self.legacy_path = Path(legacy_path)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._known_filenames = set()
+        self._legacy: Dict[str, Dict[str, Any]] = {}
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._dhashes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._loaded_signature = None
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        if not self.path.exists():
+            return None
+        stat = self.path.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self) -> None:
+        """(Re)read the journal and legacy cache if they changed on disk"""
+        with self._lock:
+            signature = self._signature()
+            if signature == self._loaded_signature and self._loaded_signature is not None:
+                return
+
+            entries, filenames, dhashes = {}, set(), {}
+            if self.path.exists():
+                with open(self.path, "r") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A crash mid-append leaves at most one partial line
+                            continue
+                        entries[record["sha256"]] = record["data"]
+                        filenames.add(record.get("filename"))
+                        if "dhash" in record:
+                            dhashes[record["sha256"]] = int(record["dhash"], 16)
+            self._entries, self._known_filenames, self._dhashes = entries, filenames, dhashes
+            self._loaded_signature = signature
+
+            if self.legacy_path.exists() and not self._legacy:
+                try:
+                    with open(self.legacy_path, "r") as f:
+                        self._legacy = json.load(f)
+                except Exception as e:
+                    logger.error(f"Error loading legacy image cache: {e}")
+
+    def hash(self, path: Path) -> str:
+        """Content hash of an image, memoized by path, mtime and size"""
+        stat = path.stat()
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(key)
+        if digest is None:
+            digest = hash_file(path)
+            self._hashes[key] = digest
+        return digest
+
+    def get(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Cached analysis for an image, adopting filename-keyed legacy entries once"""
+        digest = self.hash(path)
+        data = self._entries.get(digest)
+        if data is None and path.name in self._legacy and path.name not in self._known_filenames:
+            # Entries from the old filename-keyed cache are trusted for the file
+            # currently on disk, then pinned to its hash
+            data = self._legacy[path.name]
+            self.put(path, data, digest)
+        return data
+
+    def dhash(self, path: Path) -> int:
+        """Perceptual hash of an image, from the journal when it was stored with the analysis"""
+        digest = self.hash(path)
+        value = self._dhashes.get(digest)
+        if value is None:
+            value = image_preprocessor.dhash(path, digest)
+        return value
+
+    def put(self, path: Path, data: Dict[str, Any], digest: Optional[str] = None,
+            dhash: Optional[int] = None, duplicate_of: Optional[str] = None) -> None:
+        """Append one result to the journal"""
+        digest = digest or self.hash(path)
+        record = {"sha256": digest, "filename": path.name, "data": data, "analyzed_at": time.time()}
+        if dhash is not None:
+            record["dhash"] = f"{dhash:016x}"
+        if duplicate_of is not None:
+            # Analysis reused from a near-identical photo
+            record["duplicate_of"] = duplicate_of
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            self._entries[digest] = data
+            if dhash is not None:
+                self._dhashes[digest] = dhash
+            self._known_filenames.add(path.name)
+            self._loaded_signature = self._signature()
+
+
+class ImageIngestionPipeline:
+    """Bounded-concurrency image analysis with per-call retry and backoff"""
+
+    def __init__(self,
+                 cache: ImageAnalysisCache,
+                 workers: int = IMAGE_INGEST_WORKERS,
+                 max_retries: int = IMAGE_INGEST_MAX_RETRIES,
+                 backoff: float = IMAGE_INGEST_BACKOFF,
+                 dedupe: bool = IMAGE_DEDUPE,
+                 dedupe_distance: int = IMAGE_DEDUPE_DISTANCE):
+        self.cache = cache
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.dedupe = dedupe
+        self.dedupe_distance = dedupe_distance
+        self._failed = set()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def pending(self, image_files: Iterable[Path]) -> List[Path]:
+        """Images with no cached analysis that have not already failed in this process"""
+        self.cache.load()
+        return [
+            path for path in image_files
+            if self.cache.get(path) is None and self.cache.hash(path) not in self._failed
+        ]
+
+    def analyze(self, path: Path) -> Dict[str, Any]:
+        """Analyze one image, retrying with exponential backoff and jitter"""
+        from app.prompts import IMAGE_ANALYSIS_PROMPT
+        from app.services.gemini_client import gemini_client
+
+        response_text = ""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self.backoff * (2 ** (attempt - 1))
+                time.sleep(delay + random.uniform(0, delay))
+            response_text = gemini_client.analyze_image(str(path), IMAGE_ANALYSIS_PROMPT, self.cache.hash(path))
+            data = parse_analysis(response_text)
+            if data is not None:
+                return data
+            logger.warning(f"Attempt {attempt + 1} to analyze {path.name} returned no JSON")
+
+        if not response_text:
+            raise RuntimeError(f"Image analysis failed after {self.max_retries + 1} attempts")
+        logger.warning(f"Could not parse JSON from image analysis for {path.name}")
+        return {"description": response_text}
+
+    def _safe_dhash(self, path: Path) -> Optional[int]:
+        try:
+            return self.cache.dhash(path)
+        except Exception as e:
+            logger.warning(f"Could not hash {path.name} for duplicate detection: {e}")
+            return None
+
+    def _group_duplicates(self, image_files: List[Path],
+                          pending: List[Path]) -> Tuple[Dict[Path, List[Path]], Dict[Path, Path]]:
+        """
+        Split pending images into ones to analyze, each with the near-identical
+        pending images that will share its result, and ones matching an image
+        that already has a cached analysis
+        """
+        groups: Dict[Path, List[Path]] = {path: [] for path in pending}
+        matches: Dict[Path, Path] = {}
+        if not self.dedupe or not pending:
+            return groups, matches
+
+        pending_set = set(pending)
+        # Failed images are not pending either, but have no analysis to share
+        known = [
+            (path, self._safe_dhash(path)) for path in image_files
+            if path not in pending_set and self.cache.get(path) is not None
+        ]
+        known = [(path, value) for path, value in known if value is not None]
+        groups = {}
+        representatives: List[Tuple[Path, int]] = []
+        for path in pending:
+            value = self._safe_dhash(path)
+            if value is None:
+                groups[path] = []
+                continue
+            match = next((p for p, v in known if hamming(value, v) <= self.dedupe_distance), None)
+            if match is not None:
+                matches[path] = match
+                continue
+            leader = next((p for p, v in representatives if hamming(value, v) <= self.dedupe_distance), None)
+            if leader is not None:
+                groups[leader].append(path)
+                continue
+            representatives.append((path, value))
+            groups[path] = []
+        return groups, matches
+
+    def _put(self, path: Path, data: Dict[str, Any], duplicate_of: Optional[Path] = None) -> None:
+        self.cache.put(
+            path, data,
+            dhash=self._safe_dhash(path) if self.dedupe else None,
+            duplicate_of=self.cache.hash(duplicate_of) if duplicate_of is not None else None
+        )
+
+    def run(self, image_files: Iterable[Path]) -> Dict[str, int]:
+        """Analyze every uncached image and persist each result as it completes"""
+        image_files = list(image_files)
+        pending = self.pending(image_files)
+        stats = {
+            "total": len(image_files), "cached": len(image_files) - len(pending),
+            "analyzed": 0, "duplicates": 0, "failed": 0
+        }
+        if not pending:
+            return stats
+
+        groups, matches = self._group_duplicates(image_files, pending)
+        for path, match in matches.items():
+            self._put(path, self.cache.get(match), duplicate_of=match)
+            stats["duplicates"] += 1
+
+        if groups:
+            logger.info(f"Analyzing {len(groups)} images with {self.workers} workers")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-ingest") as pool:
+            futures = {pool.submit(self.analyze, path): path for path in groups}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    data = future.result()
+                    self._put(path, data)
+                    stats["analyzed"] += 1
+                    for duplicate in groups[path]:
+                        self._put(duplicate, data, duplicate_of=path)
+                        stats["duplicates"] += 1
+                except Exception as e:
+                    logger.error(f"Error analyzing image {path.name}: {e}")
+                    for failed in [path] + groups[path]:
+                        self._failed.add(self.cache.hash(failed))
+                        stats["failed"] += 1
+
+        logger.info(f"Image ingestion finished in {time.perf_counter() - start:.1f}s: {stats}")
+        return stats
+
+    def start_background(self, image_files: List[Path], on_complete: Callable[[], Any] = None) -> bool:
+        """Run ingestion in a daemon thread unless one is already running"""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+
+            def worker():
+                try:
+                    stats = self.run(image_files)
+                    if (stats["analyzed"] or stats["duplicates"]) and on_complete is not None:
+                        on_complete()
+                except Exception as e:
+                    logger.error(f"Error in background image ingestion: {e}")
+
+            self._thread = threading.Thread(target=worker, name="image-ingestion", daemon=True)
+            self._thread.start()
+            return True
+
+
+# Global instances
+image_cache = ImageAnalysisCache()
+image_ingestion = ImageIngestionPipeline(image_cache)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyze new product images and update the image cache")
+    parser.add_argument("--dir", default=IMAGE_DATA_DIR, help="image directory")
+    parser.add_argument("--workers", type=int, default=IMAGE_INGEST_WORKERS)
+    parser.add_argument("--retries", type=int, default=IMAGE_INGEST_MAX_RETRIES)
+    args = parser.parse_args()
+
+    image_ingestion.workers = args.workers
+    image_ingestion.max_retries = args.retries
+    stats = image_ingestion.run(find_images(args.dir))
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
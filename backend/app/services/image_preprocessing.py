@@ -0,0 +1,170 @@
+"""
+Preprocessing of product photos before vision analysis.
+
+Phone photos are several megabytes at full resolution, far more than the model
+needs to read a product. Each photo is turned upright from its EXIF
+orientation, downsampled so its longest edge is at most IMAGE_MAX_EDGE and
+re-encoded as JPEG or WebP at IMAGE_QUALITY. Derived files are cached on disk
+by the SHA-256 of the source bytes and the settings, so a photo is only
+re-encoded when it or the settings change.
+
+A 64-bit difference hash (dHash) of each photo lets the ingestion pipeline
+spot near-identical shots (resaved, recompressed or resized copies) and
+analyze them once.
+"""
+import hashlib
+import threading
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import IMAGE_MAX_EDGE, IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_DERIVED_DIR
+from app.utils.logger import logger
+
+# format name -> (PIL format, MIME type, file extension)
+IMAGE_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+}
+SOURCE_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+EXIF_ORIENTATION = 0x0112
+
+# dHash compares neighbouring pixels of a (DHASH_SIZE + 1) x DHASH_SIZE grayscale thumbnail
+DHASH_SIZE = 8
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+class ImagePreprocessor:
+    """Upright, downsampled and re-encoded copies of product photos, cached by content hash"""
+
+    def __init__(self,
+                 max_edge: int = IMAGE_MAX_EDGE,
+                 image_format: str = IMAGE_FORMAT,
+                 quality: int = IMAGE_QUALITY,
+                 derived_dir: str = IMAGE_DERIVED_DIR):
+        if image_format not in IMAGE_FORMATS:
+            logger.warning(f"Unknown image format '{image_format}', using jpeg")
+            image_format = "jpeg"
+        self.max_edge = max_edge
+        self.image_format = image_format
+        self.quality = quality
+        self.derived_dir = Path(derived_dir) if derived_dir else None
+        self._dhashes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"prepared": 0, "derived_cache_hits": 0, "source_bytes": 0, "sent_bytes": 0}
+
+    def _derived_path(self, digest: str) -> Optional[Path]:
+        if self.derived_dir is None:
+            return None
+        _, _, extension = IMAGE_FORMATS[self.image_format]
+        return self.derived_dir / f"{digest}-{self.max_edge}-q{self.quality}{extension}"
+
+    def _count(self, source_bytes: int, sent_bytes: int, cache_hit: bool) -> None:
+        with self._lock:
+            self._stats["prepared"] += 1
+            self._stats["derived_cache_hits"] += cache_hit
+            self._stats["source_bytes"] += source_bytes
+            self._stats["sent_bytes"] += sent_bytes
+
+    def _encode(self, source: bytes) -> Dict[str, Any]:
+        """Upright, downsampled and re-encoded image, or the source if that is already smaller"""
+        from PIL import Image, ImageOps
+
+        img = Image.open(BytesIO(source))
+        source_format = img.format
+        if self.max_edge > 0:
+            # JPEG decoders can scale down by powers of two while decoding, which is much cheaper
+            img.draft("RGB", (self.max_edge, self.max_edge))
+        rotated = img.getexif().get(EXIF_ORIENTATION, 1) != 1
+        img = ImageOps.exif_transpose(img)
+
+        resized = self.max_edge > 0 and max(img.size) > self.max_edge
+        if resized:
+            img.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+
+        if img.mode not in ("RGB", "L"):
+            # Flatten transparency onto white rather than black
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+
+        pil_format, mime_type, _ = IMAGE_FORMATS[self.image_format]
+        buffer = BytesIO()
+        img.save(buffer, pil_format, quality=self.quality, optimize=True)
+        data = buffer.getvalue()
+
+        if not resized and not rotated and source_format in SOURCE_MIME_TYPES and len(source) <= len(data):
+            return {"data": source, "mime_type": SOURCE_MIME_TYPES[source_format]}
+        return {"data": data, "mime_type": mime_type}
+
+    def prepare(self, path: Path, digest: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Image to send for analysis: {"data", "mime_type", "sha256"}
+
+        Pass the source's SHA-256 if already known; a cached derived file is then
+        returned without reading the source.
+        """
+        source = None
+        if digest is None:
+            source = path.read_bytes()
+            digest = hashlib.sha256(source).hexdigest()
+
+        derived_path = self._derived_path(digest)
+        if derived_path is not None and derived_path.exists():
+            data = derived_path.read_bytes()
+            self._count(path.stat().st_size, len(data), cache_hit=True)
+            return {"data": data, "mime_type": IMAGE_FORMATS[self.image_format][1], "sha256": digest}
+
+        if source is None:
+            source = path.read_bytes()
+        image = self._encode(source)
+        image["sha256"] = digest
+        self._count(len(source), len(image["data"]), cache_hit=False)
+
+        if derived_path is not None and image["mime_type"] == IMAGE_FORMATS[self.image_format][1]:
+            try:
+                derived_path.parent.mkdir(parents=True, exist_ok=True)
+                # Written under a temporary name so a concurrent reader never sees a partial file
+                temp_path = derived_path.with_name(f"{derived_path.name}.{threading.get_ident()}.tmp")
+                temp_path.write_bytes(image["data"])
+                temp_path.replace(derived_path)
+            except OSError as e:
+                logger.warning(f"Could not cache preprocessed image for {path.name}: {e}")
+        return image
+
+    def dhash(self, path: Path, digest: Optional[str] = None) -> int:
+        """64-bit difference hash of the upright photo, memoized by content hash"""
+        if digest is not None and digest in self._dhashes:
+            return self._dhashes[digest]
+
+        from PIL import Image, ImageOps
+
+        img = Image.open(path)
+        img.draft("L", (64, 64))
+        img = ImageOps.exif_transpose(img).convert("L").resize((DHASH_SIZE + 1, DHASH_SIZE), Image.LANCZOS)
+        pixels = list(img.getdata())
+        value = 0
+        for row in range(DHASH_SIZE):
+            offset = row * (DHASH_SIZE + 1)
+            for col in range(DHASH_SIZE):
+                value = value << 1 | (pixels[offset + col] > pixels[offset + col + 1])
+        if digest is not None:
+            self._dhashes[digest] = value
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_edge"] = self.max_edge
+        stats["format"] = self.image_format
+        stats["quality"] = self.quality
+        return stats
+
+
+# Global instance
+image_preprocessor = ImagePreprocessor()
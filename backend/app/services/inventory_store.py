@@ -0,0 +1,288 @@
+"""
+Columnar on-disk snapshot of the inventory.
+
+The Excel sheet and the image analysis cache are compiled into a directory of
+NumPy arrays that later processes memory-map instead of re-parsing the
+sources, so several workers share one copy through the page cache:
+
+    data/knowledge_snapshot/
+        manifest.json             build id, source checksums, column layout
+        <build>/columns/<n>.npy   numeric values, or integer codes for text columns
+        <build>/images.json       rendered image documents
+        <build>/retrieval/        BM25 posting arrays (and embeddings, if any)
+
+The manifest is replaced atomically, so readers see either the previous build
+or the new one. Compile it ahead of time (e.g. as a deploy step) with:
+
+    python -m app.services.knowledge_base
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import (
+    EXCEL_FILE_PATH, IMAGE_DATA_DIR, IMAGE_CACHE_FILE, DATA_CACHE_FILE, KNOWLEDGE_SNAPSHOT_DIR,
+    KNOWLEDGE_TEXT_FORMAT, RETRIEVAL_ENABLED, RETRIEVAL_EMBEDDING_BACKEND
+)
+from app.services.image_ingestion import find_images, hash_file, image_cache
+from app.utils.logger import logger
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from app.services.retrieval import Retriever
+
+# Bump when the on-disk layout changes; snapshots in an older format are rebuilt
+STORE_FORMAT = 1
+
+# Recorded in place of a checksum when the stored data doesn't match the file on
+# disk (e.g. the Excel file failed to parse), so the next load rebuilds
+STALE_CHECKSUM = "stale"
+
+
+def stat_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, or None if it doesn't exist"""
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def fingerprint(path: Path,
+                previous: Optional[Dict[str, Any]] = None,
+                digest: Callable[[Path], str] = hash_file) -> Optional[Dict[str, Any]]:
+    """Size, mtime and SHA-256 of a file; the hash is reused while size and mtime are unchanged"""
+    signature = stat_signature(path)
+    if signature is None:
+        return None
+    mtime_ns, size = signature
+    if (previous and previous.get("mtime_ns") == mtime_ns and previous.get("size") == size
+            and previous.get("sha256") != STALE_CHECKSUM):
+        return previous
+    return {"mtime_ns": mtime_ns, "size": size, "sha256": digest(path)}
+
+
+def _checksums(sources: Dict[str, Any]) -> Tuple:
+    """The parts of a source listing that decide whether a snapshot is current"""
+    def sha(entry: Optional[Dict[str, Any]]) -> Optional[str]:
+        return entry["sha256"] if entry else None
+
+    images = sources.get("images")
+    return (
+        sha(sources.get("excel")),
+        sha(sources.get("image_cache")),
+        sha(sources.get("legacy_image_cache")),
+        None if images is None else {name: sha(entry) for name, entry in images.items()},
+    )
+
+
+def _codes_dtype(size: int) -> "np.dtype":
+    """Smallest code type pandas uses for this many categories, so from_codes needn't copy"""
+    import numpy as np
+
+    for dtype in (np.int8, np.int16, np.int32):
+        if size < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class InventoryStore:
+    """Writes and memory-maps columnar inventory snapshots"""
+
+    def __init__(self, path: str = KNOWLEDGE_SNAPSHOT_DIR):
+        self.path = Path(path)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.path / "manifest.json"
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def sources(self, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fingerprints of every file the inventory is built from"""
+        previous = previous or {}
+        images = None
+        if Path(IMAGE_DATA_DIR).exists():
+            known = previous.get("images") or {}
+            images = {
+                path.name: fingerprint(path, known.get(path.name), image_cache.hash)
+                for path in find_images(IMAGE_DATA_DIR)
+            }
+        return {
+            "excel": fingerprint(Path(EXCEL_FILE_PATH), previous.get("excel")),
+            "image_cache": fingerprint(Path(IMAGE_CACHE_FILE), previous.get("image_cache")),
+            "legacy_image_cache": fingerprint(Path(DATA_CACHE_FILE), previous.get("legacy_image_cache")),
+            "images": images,
+        }
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Memory-map the stored inventory if it was compiled from the current sources
+
+        Returns {"data", "image_documents", "retriever", "manifest"}, or None when
+        there is no snapshot or a source changed since it was written.
+        """
+        manifest = self.read_manifest()
+        if manifest is None:
+            return None
+        if manifest.get("format") != STORE_FORMAT:
+            logger.info("Stored knowledge snapshot has an old format, rebuilding")
+            return None
+        if _checksums(self.sources(manifest["sources"])) != _checksums(manifest["sources"]):
+            logger.info("Stored knowledge snapshot is stale, rebuilding")
+            return None
+
+        build = self.path / manifest["build"]
+        data = None
+        if manifest["rows"] is not None:
+            data = self._load_columns(build / "columns", manifest["columns"])
+        with open(build / "images.json", "r") as f:
+            image_documents = json.load(f)
+        return {
+            "data": data,
+            "image_documents": image_documents,
+            "retriever": self._load_retriever(build / "retrieval", manifest.get("retrieval")),
+            "manifest": manifest,
+        }
+
+    def save(self, snapshot: Any, excel_current: bool = True) -> Path:
+        """
+        Write a snapshot as a new build and point the manifest at it
+
+        Args:
+            snapshot: KnowledgeSnapshot to store
+            excel_current: False if snapshot.data is older than the Excel file on disk
+        """
+        previous = self.read_manifest()
+        sources = self.sources(previous["sources"] if previous else None)
+        if not excel_current and sources["excel"] is not None:
+            sources["excel"] = {**sources["excel"], "sha256": STALE_CHECKSUM}
+
+        build_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        build = self.path / build_id
+        try:
+            (build / "columns").mkdir(parents=True)
+            data = snapshot.data
+            columns = self._write_columns(build / "columns", data) if data is not None else []
+            with open(build / "images.json", "w") as f:
+                json.dump(snapshot.image_documents, f)
+            retrieval = None
+            if snapshot.retriever is not None:
+                retrieval = self._write_retriever(build / "retrieval", snapshot.retriever, snapshot.text_format)
+
+            manifest = {
+                "format": STORE_FORMAT,
+                "build": build_id,
+                "created_at": time.time(),
+                "sources": sources,
+                "rows": len(data) if data is not None else None,
+                "columns": columns,
+                "retrieval": retrieval,
+            }
+            tmp_path = self.path / f"manifest.json.{build_id}.tmp"
+            with open(tmp_path, "w") as f:
+                # default=str covers values JSON can't represent, such as timestamps in text columns
+                json.dump(manifest, f, default=str)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception:
+            shutil.rmtree(build, ignore_errors=True)
+            raise
+
+        # Processes still mapping the old build keep their pages after the files are unlinked
+        if previous and previous.get("build") != build_id:
+            shutil.rmtree(self.path / previous["build"], ignore_errors=True)
+        return build
+
+    @staticmethod
+    def _write_columns(directory: Path, data: "pd.DataFrame") -> List[Dict[str, Any]]:
+        import numpy as np
+        import pandas as pd
+
+        layout = []
+        for i, name in enumerate(data.columns):
+            series = data[name]
+            entry = {"name": str(name), "file": f"{i}.npy"}
+            values = series.to_numpy() if not isinstance(series.dtype, pd.CategoricalDtype) else None
+            if values is not None and values.dtype.kind in "biuf":
+                entry.update(kind="numeric", dtype=str(values.dtype))
+            elif values is not None and values.dtype.kind == "M":
+                entry.update(kind="datetime", dtype=str(values.dtype))
+                values = values.view(np.int64)
+            else:
+                # Text and mixed columns: integer codes (-1 = missing) plus the distinct values
+                codes, uniques = pd.factorize(series, use_na_sentinel=True)
+                values = codes.astype(_codes_dtype(len(uniques)))
+                entry.update(kind="category", categories=uniques.tolist())
+            np.save(directory / entry["file"], np.ascontiguousarray(values))
+            layout.append(entry)
+        return layout
+
+    @staticmethod
+    def _load_columns(directory: Path, layout: List[Dict[str, Any]]) -> "pd.DataFrame":
+        import numpy as np
+        import pandas as pd
+
+        columns = {}
+        for entry in layout:
+            values = np.load(directory / entry["file"], mmap_mode="r")
+            if entry["kind"] == "category":
+                categories = pd.Index(entry["categories"], dtype=object)
+                values = pd.Categorical.from_codes(values, categories=categories, validate=False)
+            elif entry["kind"] == "datetime":
+                values = values.view(entry["dtype"])
+            columns[entry["name"]] = values
+        # copy=False keeps numeric columns as views of the mapped files
+        return pd.DataFrame(columns, copy=False)
+
+    @staticmethod
+    def _write_retriever(directory: Path, retriever: "Retriever", text_format: str) -> Dict[str, Any]:
+        import numpy as np
+
+        directory.mkdir()
+        terms, arrays = retriever.bm25.to_arrays()
+        for name, values in arrays.items():
+            np.save(directory / f"{name}.npy", values)
+        with open(directory / "terms.json", "w") as f:
+            json.dump(terms, f)
+        if retriever.embeddings is not None:
+            np.save(directory / "embeddings.npy", np.ascontiguousarray(retriever.embeddings))
+        return {
+            "text_format": text_format,
+            "embedding_backend": RETRIEVAL_EMBEDDING_BACKEND,
+            "embeddings": retriever.embeddings is not None,
+            "k1": retriever.bm25.k1,
+            "b": retriever.bm25.b,
+        }
+
+    @staticmethod
+    def _load_retriever(directory: Path, meta: Optional[Dict[str, Any]]) -> Optional["Retriever"]:
+        """The stored retrieval index, unless retrieval settings changed since it was built"""
+        if (not RETRIEVAL_ENABLED or meta is None
+                or meta["text_format"] != KNOWLEDGE_TEXT_FORMAT
+                or meta["embedding_backend"] != RETRIEVAL_EMBEDDING_BACKEND):
+            return None
+        import numpy as np
+        from app.services.retrieval import BM25Index, Retriever, get_embedding_backend
+
+        with open(directory / "terms.json", "r") as f:
+            terms = json.load(f)
+        arrays = {
+            name: np.load(directory / f"{name}.npy", mmap_mode="r")
+            for name in ("offsets", "doc_ids", "tfs", "idf", "norm")
+        }
+        bm25 = BM25Index.from_arrays(terms, arrays, k1=meta["k1"], b=meta["b"])
+        embeddings = np.load(directory / "embeddings.npy", mmap_mode="r") if meta["embeddings"] else None
+        return Retriever([], get_embedding_backend(RETRIEVAL_EMBEDDING_BACKEND), bm25=bm25, embeddings=embeddings)
+
+
+# Global instance
+inventory_store = InventoryStore()
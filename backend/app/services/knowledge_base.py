@@ -1,154 +1,242 @@
-import pandas as pd
+import argparse
 from pathlib import Path
-from typing import Dict, List, Any
-import json
-import os
-import glob
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
+import threading
+import time
 from app.utils.logger import logger
-from app.config import EXCEL_FILE_PATH, IMAGE_DATA_DIR, DATA_CACHE_FILE
-from app.services.gemini_client import gemini_client
+from app.config import (
+    EXCEL_FILE_PATH, IMAGE_DATA_DIR, DATA_CACHE_FILE, IMAGE_CACHE_FILE,
+    RETRIEVAL_ENABLED, RETRIEVAL_TOP_K, RETRIEVAL_EMBEDDING_BACKEND,
+    KNOWLEDGE_RELOAD_INTERVAL, KNOWLEDGE_TEXT_FORMAT
+)
+from app.services.image_ingestion import find_images, image_cache, image_ingestion
+from app.services.inventory_store import inventory_store, stat_signature
 
+# pandas/numpy are imported where they are used so importing the app stays fast
+if TYPE_CHECKING:
+    import pandas as pd
+    from app.services.retrieval import Retriever
+    from app.services.diamond_search import DiamondIndex
 
-class KnowledgeBase:
-    """Manages diamond knowledge base from Excel file"""
-    
-    def __init__(self):
-        self.data: pd.DataFrame = None
-        self.knowledge_text: str = ""
-        self.load_data()
-        self.load_image_data()
+
+# Shown in place of empty spreadsheet cells
+MISSING_VALUE = "Not specified"
+
+KNOWLEDGE_TEXT_FORMATS = ("blocks", "table")
+
+
+def _render_column(values: "pd.Series", prefix: str = "", suffix: str = "", table: bool = False) -> List[str]:
+    """Format a column's distinct values once and broadcast them to every row"""
+    import numpy as np
+    import pandas as pd
     
-    def load_data(self) -> None:
-        """Load and parse Excel data"""
-        try:
-            excel_path = Path(EXCEL_FILE_PATH)
-            
-            if not excel_path.exists():
-                logger.error(f"Excel file not found: {excel_path}")
-                raise FileNotFoundError(f"Excel file not found: {excel_path}")
-            
-            # Read Excel file
-            self.data = pd.read_excel(excel_path)
-            logger.info(f"Loaded {len(self.data)} records from {excel_path}")
-            
-            # Convert to structured knowledge text
-            self.knowledge_text = self._create_knowledge_text()
-            logger.info("Knowledge base initialized successfully with Excel data")
-            
-        except Exception as e:
-            logger.error(f"Error loading Excel data: {str(e)}")
-            # Don't raise here, allow continuing with just image data if excel fails
-            # raise 
+    # Missing values get code -1, which indexes the MISSING_VALUE entry appended last
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    texts = [str(value) for value in uniques.tolist()] + [MISSING_VALUE]
+    if table:
+        texts = [text.replace("|", "/").replace("\n", " ") for text in texts]
+    rendered = np.array([f"{prefix}{text}{suffix}" for text in texts], dtype=object)
+    return rendered[codes].tolist()
 
-    def load_image_data(self) -> None:
-        """Load and process image data"""
-        try:
-            image_dir = Path(IMAGE_DATA_DIR)
-            cache_file = Path(DATA_CACHE_FILE)
-            
-            if not image_dir.exists():
-                logger.warning(f"Image directory not found: {image_dir}")
-                return
 
-            # Load cache
-            cache = {}
-            if cache_file.exists():
-                try:
-                    with open(cache_file, "r") as f:
-                        cache = json.load(f)
-                except Exception as e:
-                    logger.error(f"Error loading cache: {e}")
+def create_diamond_documents(data: Optional["pd.DataFrame"], text_format: str = KNOWLEDGE_TEXT_FORMAT) -> List[str]:
+    """
+    Render each diamond row as a standalone text document
+    
+    "blocks" lists every field with its column name; "table" renders one
+    pipe-separated line per row to go under the header from
+    create_diamond_header, which takes far fewer tokens.
+    """
+    if text_format not in KNOWLEDGE_TEXT_FORMATS:
+        raise ValueError(f"Unknown knowledge text format: {text_format}")
+    if data is None or data.empty:
+        return []
+    
+    numbers = (data.index + 1).tolist()
+    if text_format == "table":
+        last = len(data.columns) - 1
+        columns = [
+            _render_column(data[col], suffix="\n" if i == last else "", table=True)
+            for i, col in enumerate(data.columns)
+        ]
+        return list(map(" | ".join, zip([f"#{n}" for n in numbers], *columns)))
+    
+    columns = [_render_column(data[col], prefix=f"  - {col}: ", suffix="\n") for col in data.columns]
+    return list(map("".join, zip([f"\nDiamond #{n}:\n" for n in numbers], *columns)))
 
-            # Process images
-            image_files = list(image_dir.glob("*.jpeg")) + list(image_dir.glob("*.jpg")) + list(image_dir.glob("*.png"))
-            updates_made = False
-            
-            new_data_text = "\n\nIMAGE INVENTORY:\n"
-            
-            for img_path in image_files:
-                filename = img_path.name
-                if filename in cache:
-                    logger.info(f"Using cached data for {filename}")
-                    data = cache[filename]
-                else:
-                    logger.info(f"Analyzing image: {filename}")
-                    from app.prompts import IMAGE_ANALYSIS_PROMPT
-                    response_text = gemini_client.analyze_image(str(img_path), IMAGE_ANALYSIS_PROMPT)
-                    
-                    # Clean up response to get JSON
-                    try:
-                        # Find JSON part
-                        start = response_text.find('{')
-                        end = response_text.rfind('}') + 1
-                        if start != -1 and end != -1:
-                            json_str = response_text[start:end]
-                            data = json.loads(json_str)
-                            cache[filename] = data
-                            updates_made = True
-                        else:
-                            logger.warning(f"Could not parse JSON from image analysis for {filename}")
-                            data = {"description": response_text}
-                    except Exception as e:
-                         logger.error(f"Error parsing image analysis for {filename}: {e}")
-                         data = {"description": response_text}
 
-                # Format for context
-                # Use a generic identifier to prevent the LLM from citing filenames unless necessary
-                new_data_text += f"\nInventory Item (Source: {filename}):\n"
-                for k, v in data.items():
-                    new_data_text += f"  - {k}: {v}\n"
+def create_diamond_header(data: Optional["pd.DataFrame"], text_format: str = KNOWLEDGE_TEXT_FORMAT) -> str:
+    """Column header printed once above table-format documents"""
+    if text_format != "table" or data is None or data.empty:
+        return ""
+    return " | ".join(["#"] + [str(col).replace("|", "/") for col in data.columns]) + "\n"
 
-            # Update cache if needed
-            if updates_made:
-                cache_file.parent.mkdir(exist_ok=True)
-                with open(cache_file, "w") as f:
-                    json.dump(cache, f, indent=2)
 
-            # Append to knowledge text
-            self.knowledge_text += new_data_text
-            logger.info(f"Processed {len(image_files)} images")
+class KnowledgeSnapshot:
+    """
+    Immutable view of the inventory at one point in time.
 
-        except Exception as e:
-            logger.error(f"Error loading image data: {str(e)}")
+    Reloads build a new snapshot and swap it in, so a request that grabbed
+    the previous snapshot keeps a consistent view until it finishes.
+    """
     
-    def _create_knowledge_text(self) -> str:
-        """Convert DataFrame to structured text for LLM context"""
-        if self.data is None or self.data.empty:
-            return "No diamond data available."
+    def __init__(self,
+                 version: int,
+                 data: Optional["pd.DataFrame"],
+                 image_documents: List[str],
+                 diamond_documents: Optional[List[str]] = None,
+                 diamond_index: Optional["DiamondIndex"] = None,
+                 retriever: Optional["Retriever"] = None,
+                 excel_signature: Any = None,
+                 image_signature: Any = None,
+                 text_format: str = KNOWLEDGE_TEXT_FORMAT):
+        self.version = version
+        self.loaded_at = time.time()
+        self.data = data
+        self.excel_signature = excel_signature
+        self.image_signature = image_signature
         
-        knowledge_parts = ["DIAMOND INVENTORY:\n"]
+        # One rendered text per diamond row / image item, used for retrieval
+        self.text_format = text_format
+        self.diamond_header = create_diamond_header(data, text_format)
+        if diamond_documents is None:
+            diamond_documents = create_diamond_documents(data, text_format)
+        self.diamond_documents = diamond_documents
+        self.image_documents = image_documents
         
-        for idx, row in self.data.iterrows():
-            diamond_info = f"\nDiamond #{idx + 1}:\n"
-            for col in self.data.columns:
-                value = row[col]
-                # Handle NaN values
-                if pd.isna(value):
-                    value = "Not specified"
-                diamond_info += f"  - {col}: {value}\n"
-            knowledge_parts.append(diamond_info)
+        # Precompute per-column indexes for structured queries
+        if diamond_index is None and data is not None:
+            from app.services.diamond_search import DiamondIndex
+            diamond_index = DiamondIndex(data)
+        self.diamond_index = diamond_index
         
-        return "".join(knowledge_parts)
+        self.knowledge_text = self._create_knowledge_text()
+        self.retriever = retriever if retriever is not None else self._build_retrieval_index()
+        # Built on first use
+        self._system_instruction: Optional[str] = None
+        self._summary_stats: Optional[Dict[str, Any]] = None
+    
+    def _create_knowledge_text(self) -> str:
+        """Convert inventory documents to structured text for LLM context"""
+        if self.data is None:
+            # Excel failed to load; only image data is available
+            text = ""
+        elif self.data.empty:
+            text = "No diamond data available."
+        else:
+            text = "DIAMOND INVENTORY:\n" + self.diamond_header + "".join(self.diamond_documents)
+        
+        if self.image_signature is not None:
+            text += "\n\nIMAGE INVENTORY:\n" + "".join(self.image_documents)
+        return text
+    
+    def _build_retrieval_index(self) -> Optional["Retriever"]:
+        """Index diamond and image documents for per-message retrieval"""
+        if not RETRIEVAL_ENABLED:
+            return None
+        try:
+            from app.services.retrieval import Retriever, get_embedding_backend
+
+            documents = self.diamond_documents + self.image_documents
+            retriever = Retriever(documents, get_embedding_backend(RETRIEVAL_EMBEDDING_BACKEND))
+            logger.info(f"Built retrieval index over {len(documents)} inventory documents")
+            return retriever
+        except Exception as e:
+            logger.error(f"Error building retrieval index: {str(e)}")
+            return None
     
     def get_knowledge_context(self) -> str:
         """Get formatted knowledge for LLM context"""
         return self.knowledge_text
     
+    @property
+    def system_instruction(self) -> str:
+        """Chat instructions plus the static knowledge block, built once per snapshot"""
+        if self._system_instruction is None:
+            from app.prompts import format_chat_system_prompt
+            self._system_instruction = format_chat_system_prompt(self.get_static_context())
+        return self._system_instruction
+    
+    def get_static_context(self) -> str:
+        """Knowledge that is the same for every turn: the whole inventory, or an overview when retrieval is on"""
+        if self.retriever is None:
+            return self.knowledge_text
+        return (
+            f"INVENTORY OVERVIEW: {len(self.diamond_documents)} diamonds and "
+            f"{len(self.image_documents)} catalog items in stock. "
+            "Only the items most relevant to the conversation are listed with each question.\n"
+        )
+    
+    def get_turn_context(self, query: str, top_k: int = RETRIEVAL_TOP_K) -> str:
+        """Inventory items relevant to one turn (empty when the whole inventory is static context)"""
+        if self.retriever is None:
+            return ""
+        
+        diamonds, images = [], []
+        for doc_id in self.retriever.search(query, top_k):
+            if doc_id < len(self.diamond_documents):
+                diamonds.append(self.diamond_documents[doc_id])
+            else:
+                images.append(self.image_documents[doc_id - len(self.diamond_documents)])
+        
+        parts = []
+        if diamonds:
+            parts.append("RELEVANT DIAMONDS:\n" + self.diamond_header + "".join(diamonds))
+        if images:
+            parts.append("RELEVANT CATALOG ITEMS:\n" + "".join(images))
+        return "\n".join(parts)
+    
+    def get_relevant_context(self, query: str, top_k: int = RETRIEVAL_TOP_K) -> str:
+        """Get only the inventory items most relevant to the query for LLM context"""
+        turn_context = self.get_turn_context(query, top_k)
+        if not turn_context:
+            return self.get_static_context()
+        return f"{self.get_static_context()}\n{turn_context}"
+    
     def search_diamonds(self, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Search diamonds based on criteria (for future enhancements)"""
-        if self.data is None:
+        """Search diamonds by exact column values (indexed columns use the query engine)"""
+        if self.data is None or self.diamond_index is None:
             return []
         
-        filtered_data = self.data.copy()
-        
+        index = self.diamond_index
+        ranges, members = {}, {}
+        mask = None
         for key, value in criteria.items():
-            if key in filtered_data.columns:
-                filtered_data = filtered_data[filtered_data[key] == value]
+            if key not in self.data.columns:
+                continue
+            field = index.field_for_column(key)
+            if field in index.numeric and isinstance(value, (int, float)):
+                ranges[field] = (value, value)
+            elif field in index.categorical:
+                members[field] = [value]
+            else:
+                column_mask = (self.data[key] == value).to_numpy()
+                mask = column_mask if mask is None else mask & column_mask
         
-        return filtered_data.to_dict('records')
+        matched = index.match_mask(ranges, members)
+        if mask is not None:
+            matched &= mask
+        return index.records(matched.nonzero()[0])
+    
+    def query_diamonds(self,
+                       ranges: Dict[str, Any] = None,
+                       members: Dict[str, List[Any]] = None,
+                       sort_by: str = None,
+                       descending: bool = False,
+                       limit: int = 20,
+                       offset: int = 0) -> Dict[str, Any]:
+        """Range, set-membership and sorted top-N queries over the inventory"""
+        if self.diamond_index is None:
+            return {"total": 0, "results": []}
+        return self.diamond_index.search(ranges, members, sort_by, descending, limit, offset)
     
     def get_summary_stats(self) -> Dict[str, Any]:
-        """Get summary statistics of diamond inventory"""
+        """Get summary statistics of diamond inventory (computed once per snapshot)"""
+        if self._summary_stats is None:
+            self._summary_stats = self._compute_summary_stats()
+        return dict(self._summary_stats)
+    
+    def _compute_summary_stats(self) -> Dict[str, Any]:
         if self.data is None or self.data.empty:
             return {}
         
@@ -169,5 +257,281 @@ class KnowledgeBase:
         return stats
 
 
-# Global instance
+class KnowledgeBase:
+    """Manages diamond knowledge base from Excel file and product images"""
+    
+    def __init__(self):
+        self._snapshot: KnowledgeSnapshot = None
+        # Serializes loads and reloads; readers never take it
+        self._reload_lock = threading.RLock()
+    
+    @property
+    def snapshot(self) -> KnowledgeSnapshot:
+        """Current inventory snapshot; hold on to it for the duration of a request"""
+        if self._snapshot is None:
+            self.load()
+        return self._snapshot
+    
+    def load(self) -> None:
+        """Load the compiled snapshot if its sources are unchanged, otherwise build one"""
+        with self._reload_lock:
+            if self._snapshot is not None:
+                return
+            snapshot = self._load_saved_snapshot()
+            if snapshot is None:
+                self.reload(force=True)
+                return
+            self._snapshot = snapshot
+            # The saved snapshot skips load_image_data, so look for new photos separately
+            threading.Thread(target=self._queue_pending_images, name="image-scan", daemon=True).start()
+    
+    def _load_saved_snapshot(self) -> Optional[KnowledgeSnapshot]:
+        try:
+            start = time.perf_counter()
+            # Taken before the checksums are verified, so a change in between is still noticed
+            excel_signature, image_signature = self._excel_signature(), self._image_signature()
+            stored = inventory_store.load()
+            if stored is None:
+                return None
+            snapshot = KnowledgeSnapshot(
+                version=1,
+                data=stored["data"],
+                image_documents=stored["image_documents"],
+                retriever=stored["retriever"],
+                excel_signature=excel_signature,
+                image_signature=image_signature,
+            )
+            logger.info(
+                f"Loaded knowledge snapshot {stored['manifest']['build']} from {inventory_store.path} "
+                f"in {time.perf_counter() - start:.3f}s"
+            )
+            return snapshot
+        except Exception as e:
+            logger.error(f"Error loading saved knowledge snapshot: {e}")
+            return None
+    
+    def _save_snapshot(self, snapshot: KnowledgeSnapshot) -> None:
+        try:
+            inventory_store.save(snapshot, excel_current=snapshot.excel_signature == self._excel_signature())
+        except Exception as e:
+            logger.error(f"Error saving knowledge snapshot: {e}")
+    
+    def _queue_pending_images(self) -> None:
+        try:
+            pending = image_ingestion.pending(self._image_files())
+            if pending and image_ingestion.start_background(pending, on_complete=self.reload):
+                logger.info(f"Queued {len(pending)} uncached images for background analysis")
+        except Exception as e:
+            logger.error(f"Error scanning for new images: {e}")
+    
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+    
+    @staticmethod
+    def _excel_signature() -> Optional[Tuple[int, int]]:
+        return stat_signature(Path(EXCEL_FILE_PATH))
+    
+    @staticmethod
+    def _image_files() -> List[Path]:
+        return find_images(IMAGE_DATA_DIR)
+    
+    @classmethod
+    def _image_signature(cls) -> Optional[Tuple]:
+        if not Path(IMAGE_DATA_DIR).exists():
+            return None
+        entries = []
+        for path in [*cls._image_files(), Path(IMAGE_CACHE_FILE), Path(DATA_CACHE_FILE)]:
+            if path.exists():
+                stat = path.stat()
+                entries.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(entries))
+    
+    def reload(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Rebuild the parts of the inventory whose sources changed and swap in a new snapshot
+        
+        Args:
+            force: Rebuild everything even if no source file changed
+        """
+        with self._reload_lock:
+            current = self._snapshot
+            excel_signature = self._excel_signature()
+            image_signature = self._image_signature()
+            
+            excel_changed = force or current is None or excel_signature != current.excel_signature
+            images_changed = force or current is None or image_signature != current.image_signature
+            if not (excel_changed or images_changed):
+                return {"reloaded": False, "version": current.version, "excel": False, "images": False}
+            
+            data, diamond_documents, diamond_index = None, None, None
+            if current is not None:
+                data, diamond_documents, diamond_index = current.data, current.diamond_documents, current.diamond_index
+            if excel_changed:
+                try:
+                    data = self.load_data()
+                    diamond_documents, diamond_index = None, None
+                except Exception as e:
+                    logger.error(f"Error loading Excel data: {str(e)}")
+                    # Keep serving the previous inventory; retry on the next change
+                    excel_signature = current.excel_signature if current is not None else None
+            
+            image_documents = current.image_documents if current is not None else []
+            if images_changed:
+                image_documents = self.load_image_data()
+                # Analysis may have rewritten the cache file
+                image_signature = self._image_signature()
+            
+            snapshot = KnowledgeSnapshot(
+                version=current.version + 1 if current is not None else 1,
+                data=data,
+                image_documents=image_documents,
+                diamond_documents=diamond_documents,
+                diamond_index=diamond_index,
+                excel_signature=excel_signature,
+                image_signature=image_signature,
+            )
+            # Atomic reference swap: in-flight requests keep the snapshot they already hold
+            self._snapshot = snapshot
+            self._save_snapshot(snapshot)
+            logger.info(
+                f"Knowledge base version {snapshot.version} loaded "
+                f"(excel rebuilt: {excel_changed}, images rebuilt: {images_changed})"
+            )
+            return {"reloaded": True, "version": snapshot.version, "excel": excel_changed, "images": images_changed}
+    
+    def load_data(self) -> "pd.DataFrame":
+        """Load and parse Excel data"""
+        import pandas as pd
+        
+        excel_path = Path(EXCEL_FILE_PATH)
+        
+        if not excel_path.exists():
+            logger.error(f"Excel file not found: {excel_path}")
+            raise FileNotFoundError(f"Excel file not found: {excel_path}")
+        
+        # Read Excel file
+        data = pd.read_excel(excel_path)
+        logger.info(f"Loaded {len(data)} records from {excel_path}")
+        return data
+
+    def load_image_data(self) -> List[str]:
+        """
+        Build one context document per analyzed image
+        
+        Only cached analysis results are used here; uncached images are handed
+        to the background ingestion pipeline, which triggers a reload when done.
+        """
+        image_documents = []
+        try:
+            image_dir = Path(IMAGE_DATA_DIR)
+            
+            if not image_dir.exists():
+                logger.warning(f"Image directory not found: {image_dir}")
+                return image_documents
+
+            image_cache.load()
+            image_files = self._image_files()
+            
+            for img_path in image_files:
+                filename = img_path.name
+                data = image_cache.get(img_path)
+                if data is None:
+                    continue
+
+                # Format for context
+                # Use a generic identifier to prevent the LLM from citing filenames unless necessary
+                item_text = f"\nInventory Item (Source: {filename}):\n"
+                for k, v in data.items():
+                    item_text += f"  - {k}: {v}\n"
+                image_documents.append(item_text)
+
+            self._queue_pending_images()
+
+            logger.info(f"Loaded {len(image_documents)} of {len(image_files)} images from cache")
+
+        except Exception as e:
+            logger.error(f"Error loading image data: {str(e)}")
+        return image_documents
+    
+    def get_knowledge_context(self) -> str:
+        """Get formatted knowledge for LLM context"""
+        return self.snapshot.get_knowledge_context()
+    
+    def get_relevant_context(self, query: str, top_k: int = RETRIEVAL_TOP_K) -> str:
+        """Get only the inventory items most relevant to the query for LLM context"""
+        return self.snapshot.get_relevant_context(query, top_k)
+    
+    def search_diamonds(self, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Search diamonds by exact column values"""
+        return self.snapshot.search_diamonds(criteria)
+    
+    def query_diamonds(self, *args, **kwargs) -> Dict[str, Any]:
+        """Range, set-membership and sorted top-N queries over the inventory"""
+        return self.snapshot.query_diamonds(*args, **kwargs)
+    
+    def get_summary_stats(self) -> Dict[str, Any]:
+        """Get summary statistics of diamond inventory"""
+        return self.snapshot.get_summary_stats()
+
+
+class KnowledgeWatcher:
+    """Polls the inventory sources and hot-reloads the knowledge base when they change"""
+    
+    def __init__(self, knowledge_base: KnowledgeBase, interval: float):
+        self.knowledge_base = knowledge_base
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="knowledge-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching inventory sources every {self.interval}s")
+    
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.knowledge_base.reload()
+            except Exception as e:
+                logger.error(f"Error reloading knowledge base: {str(e)}")
+
+
+# Global instance (loaded lazily, or from the app lifespan)
 knowledge_base = KnowledgeBase()
+knowledge_watcher = KnowledgeWatcher(knowledge_base, KNOWLEDGE_RELOAD_INTERVAL)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile the inventory sources into the columnar knowledge snapshot")
+    parser.add_argument("--force", action="store_true", help="rebuild even if no source changed")
+    args = parser.parse_args()
+    
+    if args.force:
+        result = knowledge_base.reload(force=True)
+        print(f"Built knowledge snapshot version {result['version']} in {inventory_store.path}")
+        return
+    previous = inventory_store.read_manifest()
+    start = time.perf_counter()
+    knowledge_base.load()
+    manifest = inventory_store.read_manifest()
+    if manifest is None:
+        print("Knowledge snapshot could not be written, see the log for details")
+    elif previous is not None and previous["build"] == manifest["build"]:
+        print(f"Knowledge snapshot {manifest['build']} in {inventory_store.path} is up to date")
+    else:
+        print(f"Compiled knowledge snapshot {manifest['build']} in {inventory_store.path} "
+              f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Chat model backends for GeminiClient.
+
+A backend builds model objects with the google.generativeai interface the
+client relies on:
+
+    model.start_chat(history=[{"role": "user" | "model", "parts": [text]}]) -> session
+    session.history                          contents with .role and .parts[0].text
+    session.send_message(prompt)             response with .text
+    await session.send_message_async(prompt, stream=False)
+                                             response with .text, or an async
+                                             iterable of chunks when streaming
+    model.generate_content(prompt or [prompt, image])
+
+Select one with LLM_BACKEND: "gemini" (default) or "stub", a local model with
+deterministic replies and configurable latency and throughput for load tests
+and benchmarks, which needs no API key or network.
+"""
+import asyncio
+import datetime
+import json
+import random
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from app.config import (
+    GEMINI_API_KEY, GEMINI_MODEL,
+    GEMINI_CONTEXT_CACHE, GEMINI_CONTEXT_CACHE_TTL, GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+    LLM_STUB_LATENCY, LLM_STUB_TOKENS_PER_SECOND, LLM_STUB_REPLY_TOKENS, LLM_STUB_CONCURRENCY,
+    LLM_STUB_SLOW_RATE, LLM_STUB_SLOW_LATENCY
+)
+from app.utils.logger import logger
+from app.utils.tokens import estimate_tokens
+
+
+class LLMBackend:
+    """Interface for chat model backends"""
+
+    name = ""
+
+    def configure(self) -> None:
+        """Prepare the backend (credentials, SDK setup); called before the first model is built"""
+
+    def create_model(self, system_instruction: Optional[str] = None) -> Tuple[Any, Any]:
+        """
+        Model carrying a system instruction, and the server-side cache backing it
+
+        The cache (or None) is released with .delete() once the model is replaced.
+        """
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through google.generativeai"""
+
+    name = "gemini"
+
+    def __init__(self):
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def configure(self) -> None:
+        """Configure Gemini API with key"""
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=GEMINI_API_KEY)
+            logger.info("Gemini API configured successfully")
+        except Exception as e:
+            logger.error(f"Failed to configure Gemini API: {str(e)}")
+            raise
+
+    def _ensure_configured(self) -> None:
+        if not self._configured:
+            with self._lock:
+                if not self._configured:
+                    self.configure()
+                    self._configured = True
+
+    def create_model(self, system_instruction: Optional[str] = None) -> Tuple[Any, Any]:
+        """Model carrying a system instruction, backed by a context cache when enabled"""
+        # google.generativeai is slow to import, so the SDK is loaded on first use
+        import google.generativeai as genai
+        self._ensure_configured()
+
+        if system_instruction is None:
+            return genai.GenerativeModel(GEMINI_MODEL), None
+
+        if GEMINI_CONTEXT_CACHE and estimate_tokens(system_instruction) >= GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+            try:
+                from google.generativeai import caching
+                cached_content = caching.CachedContent.create(
+                    model=GEMINI_MODEL,
+                    display_name="diamond-chatbot-knowledge",
+                    system_instruction=system_instruction,
+                    ttl=datetime.timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL),
+                )
+                logger.info(f"Created Gemini context cache {cached_content.name}")
+                return genai.GenerativeModel.from_cached_content(cached_content=cached_content), cached_content
+            except Exception as e:
+                logger.error(f"Error creating Gemini context cache, sending instruction inline: {str(e)}")
+
+        return genai.GenerativeModel(GEMINI_MODEL, system_instruction=system_instruction), None
+
+
+class StubOverloaded(Exception):
+    """Raised like a provider 429 when the stub is at its concurrency limit"""
+
+    code = 429
+
+
+STUB_REPLIES = [
+    "We have a lovely {carat} carat {shape} in {color} color, ideal cut, at about ${price}. Want to see it?",
+    "Great choice! Our {shape} diamonds around {carat} carats start near ${price}. Any color preference?",
+    "I can check that for you. A {color} color {shape} at {carat} carats is about ${price} right now.",
+    "Sure thing. Is this for an engagement ring? Our {carat} carat {shape} in {color} is popular at ${price}.",
+]
+STUB_SHAPES = ["round", "oval", "cushion", "emerald cut", "princess"]
+STUB_COLORS = ["D", "E", "F", "G", "H"]
+STUB_FILLER = "It has excellent polish and symmetry and comes with a GIA certificate."
+
+
+class StubChatSession:
+    """Chat session of a StubModel; replies are a function of the prompt alone"""
+
+    def __init__(self, model: "StubModel", history: List[Dict[str, Any]]):
+        self.model = model
+        self.history = [self.model.content(m["role"], m["parts"][0]) for m in history]
+
+    def _record(self, prompt: str, reply: str) -> None:
+        self.history += [self.model.content("user", prompt), self.model.content("model", reply)]
+
+    def send_message(self, prompt: str) -> Any:
+        reply = self.model.reply(prompt)
+        with self.model.backend.call():
+            time.sleep(self.model.backend.duration(reply))
+        self._record(prompt, reply)
+        return SimpleNamespace(text=reply)
+
+    async def send_message_async(self, prompt: str, stream: bool = False) -> Any:
+        reply = self.model.reply(prompt)
+        if stream:
+            return self._stream(prompt, reply)
+        with self.model.backend.call():
+            await asyncio.sleep(self.model.backend.duration(reply))
+        self._record(prompt, reply)
+        return SimpleNamespace(text=reply)
+
+    async def _stream(self, prompt: str, reply: str) -> AsyncIterator[Any]:
+        backend = self.model.backend
+        with backend.call():
+            await asyncio.sleep(backend.first_token_latency())
+            words = reply.split(" ")
+            chunk_words = 8
+            for start in range(0, len(words), chunk_words):
+                chunk = " ".join(words[start:start + chunk_words])
+                if start + chunk_words < len(words):
+                    chunk += " "
+                if backend.tokens_per_second > 0:
+                    await asyncio.sleep(estimate_tokens(chunk) / backend.tokens_per_second)
+                yield SimpleNamespace(text=chunk)
+        self._record(prompt, reply)
+
+
+class StubModel:
+    def __init__(self, backend: "StubBackend", system_instruction: Optional[str]):
+        self.backend = backend
+        self.system_instruction = system_instruction
+
+    @staticmethod
+    def content(role: str, text: str) -> Any:
+        return SimpleNamespace(role=role, parts=[SimpleNamespace(text=text)])
+
+    def reply(self, prompt: str) -> str:
+        """Deterministic reply of about reply_tokens tokens"""
+        seed = zlib.crc32(prompt.encode("utf-8"))
+        reply = STUB_REPLIES[seed % len(STUB_REPLIES)].format(
+            carat=(seed % 30 + 5) / 10,
+            shape=STUB_SHAPES[seed // 7 % len(STUB_SHAPES)],
+            color=STUB_COLORS[seed // 11 % len(STUB_COLORS)],
+            price=(seed % 90 + 10) * 100,
+        )
+        while estimate_tokens(reply) + estimate_tokens(STUB_FILLER) < self.backend.reply_tokens:
+            reply += " " + STUB_FILLER
+        return reply
+
+    def start_chat(self, history: Optional[List[Dict[str, Any]]] = None) -> StubChatSession:
+        return StubChatSession(self, history or [])
+
+    def generate_content(self, prompt: Any) -> Any:
+        text = prompt if isinstance(prompt, str) else str(prompt[0])
+        if not isinstance(prompt, str):
+            # Image analysis: a fixed product description
+            seed = zlib.crc32(text.encode("utf-8"))
+            reply = json.dumps({
+                "type": "Ring", "gemstone": "Diamond", "carat": (seed % 30 + 5) / 10, "cut": "Ideal",
+                "color": STUB_COLORS[seed % len(STUB_COLORS)], "clarity": "VS1", "metal": "Platinum",
+                "price": (seed % 90 + 10) * 100, "description": "Solitaire engagement ring",
+            })
+        else:
+            reply = self.reply(text)
+        with self.backend.call():
+            time.sleep(self.backend.duration(reply))
+        return SimpleNamespace(text=reply)
+
+
+class StubBackend(LLMBackend):
+    """
+    Local stand-in for the model API.
+
+    Each call waits latency seconds (time to first token) plus the reply's
+    tokens at tokens_per_second (0 = instant), and fails with a 429-coded
+    error while max_concurrency calls are already in flight (0 = unlimited).
+    A slow_rate share of calls, picked at random, waits slow_latency seconds
+    longer, like the occasional slow upstream response.
+    """
+
+    name = "stub"
+
+    def __init__(self,
+                 latency: float = LLM_STUB_LATENCY,
+                 tokens_per_second: float = LLM_STUB_TOKENS_PER_SECOND,
+                 reply_tokens: int = LLM_STUB_REPLY_TOKENS,
+                 max_concurrency: int = LLM_STUB_CONCURRENCY,
+                 slow_rate: float = LLM_STUB_SLOW_RATE,
+                 slow_latency: float = LLM_STUB_SLOW_LATENCY):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.max_concurrency = max_concurrency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.slow_calls = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def first_token_latency(self) -> float:
+        """Time to the first token, with the injected slow responses"""
+        if self.slow_rate > 0 and random.random() < self.slow_rate:
+            self.slow_calls += 1
+            return self.latency + self.slow_latency
+        return self.latency
+
+    def duration(self, reply: str) -> float:
+        generation = estimate_tokens(reply) / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return self.first_token_latency() + generation
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        """Count a call in flight, refusing it past the concurrency limit"""
+        with self._lock:
+            self.calls += 1
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                raise StubOverloaded("429 Stub model is at its concurrency limit")
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def create_model(self, system_instruction: Optional[str] = None) -> Tuple[Any, Any]:
+        return StubModel(self, system_instruction), None
+
+
+LLM_BACKENDS = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+
+def get_llm_backend(name: str) -> LLMBackend:
+    """Resolve a chat model backend by config name"""
+    if name not in LLM_BACKENDS:
+        logger.warning(f"Unknown LLM backend '{name}', using gemini")
+        name = "gemini"
+    return LLM_BACKENDS[name]()
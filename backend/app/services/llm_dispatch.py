@@ -0,0 +1,412 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+from app.config import (
+    LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_RATE_LIMIT, LLM_RATE_BURST, LLM_PROVIDER_BACKOFF,
+    LLM_HEDGE_ENABLED, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_DELAY, LLM_HEDGE_BUDGET
+)
+from app.utils.logger import logger
+from app.utils.metrics import llm_generation_seconds, llm_queue_wait_seconds
+
+# HTTP statuses with which the provider asks callers to back off
+PROVIDER_BUSY_CODES = (429, 503)
+# Call times needed before hedging starts, so the percentile means something
+HEDGE_MIN_SAMPLES = 20
+
+
+class LLMUnavailable(Exception):
+    """
+    A model call was turned away instead of queued.
+
+    status_code is 429 when the local queue is full and 503 while the provider
+    is rate limiting or unavailable; retry_after is a hint in seconds for the
+    Retry-After header.
+    """
+
+    def __init__(self, status_code: int, retry_after: float, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class DeadlineExceeded(LLMUnavailable):
+    """
+    The request's deadline passed before the model answered; the call was cancelled.
+
+    phase is where the time ran out: "queue" (waiting for a slot),
+    "generation" (the model call itself) or "coalesced" (waiting on an
+    identical call made by another request).
+    """
+
+    def __init__(self, stage: str, phase: str):
+        super().__init__(504, 1, f"The model did not answer in time (deadline passed during {stage} {phase})")
+        self.stage = stage
+        self.phase = phase
+
+
+def deadline_after(seconds: float) -> Optional[float]:
+    """time.monotonic() deadline this many seconds from now, or None for 0 (no deadline)"""
+    return time.monotonic() + seconds if seconds > 0 else None
+
+
+def is_provider_busy(error: Exception) -> bool:
+    """Whether an SDK error is a rate limit or overload response (google.api_core sets code to the HTTP status)"""
+    return getattr(error, "code", None) in PROVIDER_BUSY_CODES
+
+
+class TokenBucket:
+    """Requests per second limit with bursts of up to capacity requests"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if not self.enabled:
+            return
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class StageStats:
+    """Queue wait and outcome counters for one kind of model call"""
+
+    # Recent queue waits kept for percentiles
+    SAMPLES = 1024
+
+    def __init__(self):
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.provider_busy = 0
+        self.errors = 0
+        self.deadline_exceeded = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.service_total = 0.0
+        self._waits: Deque[float] = deque(maxlen=self.SAMPLES)
+        # How long first attempts took to finish (or the whole deadline if it ran out), for the hedging threshold
+        self.attempts: Deque[float] = deque(maxlen=self.SAMPLES)
+
+    @property
+    def dispatched(self) -> int:
+        """Calls that got (or are waiting for) a slot: requests neither turned away nor coalesced"""
+        return self.requests - self.coalesced - self.rejected
+
+    def record_wait(self, seconds: float) -> None:
+        self.queue_wait_total += seconds
+        self.queue_wait_max = max(self.queue_wait_max, seconds)
+        self._waits.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        dispatched = self.dispatched
+
+        def percentile(q: float) -> float:
+            return waits[int(q * (len(waits) - 1))] if waits else 0.0
+
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "provider_busy": self.provider_busy,
+            "errors": self.errors,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "queue_wait_avg": self.queue_wait_total / dispatched if dispatched > 0 else 0.0,
+            "queue_wait_p50": percentile(0.50),
+            "queue_wait_p95": percentile(0.95),
+            "queue_wait_max": self.queue_wait_max,
+            "service_time_avg": self.service_total / dispatched if dispatched > 0 else 0.0,
+        }
+
+
+class LLMDispatcher:
+    """
+    Admission control for model calls.
+
+    At most max_concurrency calls run at once, started no faster than the
+    token bucket allows. Up to max_queue more wait for a slot; beyond that,
+    and while the provider is rate limiting us, calls fail fast with
+    LLMUnavailable instead of piling up. Calls sharing a coalesce key while
+    one is in flight wait for that call's result instead of making their own.
+    Queue waits are recorded per stage (chat, greeting, summary...).
+
+    Calls may carry a deadline (a time.monotonic() instant): a call still
+    queued or running then is cancelled and fails with DeadlineExceeded.
+    Calls may also be hedged: once the first attempt has run longer than
+    hedge_percentile of recent attempts, a second one starts if a slot is
+    free and the hedge budget allows, and whichever answers first wins.
+    """
+
+    def __init__(self,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_queue: int = LLM_MAX_QUEUE,
+                 rate: float = LLM_RATE_LIMIT,
+                 burst: int = LLM_RATE_BURST,
+                 provider_backoff: float = LLM_PROVIDER_BACKOFF,
+                 hedge_enabled: bool = LLM_HEDGE_ENABLED,
+                 hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+                 hedge_min_delay: float = LLM_HEDGE_MIN_DELAY,
+                 hedge_budget: float = LLM_HEDGE_BUDGET):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.provider_backoff = provider_backoff
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_budget = hedge_budget
+        self.bucket = TokenBucket(rate, burst)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self._stages: Dict[str, StageStats] = {}
+        self._waiting = 0
+        self._active = 0
+        self._busy_until = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop; rebuild if a new loop is running
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            self._inflight.clear()
+        return self._semaphore
+
+    def _stage(self, stage: str) -> StageStats:
+        stats = self._stages.get(stage)
+        if stats is None:
+            stats = self._stages[stage] = StageStats()
+        return stats
+
+    def _retry_after(self) -> float:
+        """Rough time until a new call would get a slot"""
+        calls = sum(s.dispatched for s in self._stages.values())
+        service_time = sum(s.service_total for s in self._stages.values()) / calls if calls else 1.0
+        return service_time * (self._waiting + 1) / self.max_concurrency
+
+    def check(self, stage: str = "chat") -> None:
+        """Raise LLMUnavailable if a call made now would be turned away"""
+        remaining = self._busy_until - time.monotonic()
+        if remaining > 0:
+            self._reject(stage)
+            raise LLMUnavailable(503, remaining, "The model provider is rate limiting requests")
+        if self._active >= self.max_concurrency and self._waiting >= self.max_queue:
+            self._reject(stage)
+            raise LLMUnavailable(429, self._retry_after(), "Too many model requests are queued")
+
+    def _reject(self, stage: str) -> None:
+        # A call turned away is still a request, so requests - coalesced - rejected stays the dispatched calls
+        stats = self._stage(stage)
+        stats.requests += 1
+        stats.rejected += 1
+
+    def provider_busy(self, stage: str, error: Exception) -> LLMUnavailable:
+        """Record a rate limit or overload response and pause new calls for the backoff period"""
+        self._stage(stage).provider_busy += 1
+        self._busy_until = max(self._busy_until, time.monotonic() + self.provider_backoff)
+        logger.warning(f"Model provider busy during {stage} call, pausing for {self.provider_backoff:.0f}s: {error}")
+        return LLMUnavailable(503, self.provider_backoff, "The model provider is rate limiting requests")
+
+    def _expired(self, stage: str, phase: str) -> DeadlineExceeded:
+        self._stage(stage).deadline_exceeded += 1
+        logger.warning(f"Deadline passed during {stage} {phase}, cancelled the model call")
+        return DeadlineExceeded(stage, phase)
+
+    async def within(self, deadline: Optional[float], awaitable: Awaitable[Any], stage: str = "chat",
+                     phase: str = "generation") -> Any:
+        """Await something before the deadline, cancelling it and raising DeadlineExceeded after"""
+        if deadline is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            raise self._expired(stage, phase) from None
+
+    @asynccontextmanager
+    async def slot(self, stage: str = "chat", deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold one of the concurrent call slots, e.g. for the length of a streamed reply"""
+        semaphore = self._get_semaphore()
+        stats = self._stage(stage)
+        self.check(stage)
+        stats.requests += 1
+        start = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self.within(deadline, semaphore.acquire(), stage, "queue")
+        finally:
+            self._waiting -= 1
+        try:
+            await self.within(deadline, self.bucket.acquire(), stage, "queue")
+            wait = time.perf_counter() - start
+            stats.record_wait(wait)
+            llm_queue_wait_seconds.observe(wait, stage)
+            self._active += 1
+            started = time.perf_counter()
+            try:
+                yield
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                if is_provider_busy(e):
+                    raise self.provider_busy(stage, e) from e
+                stats.errors += 1
+                raise
+            finally:
+                self._active -= 1
+                service_time = time.perf_counter() - started
+                stats.service_total += service_time
+                llm_generation_seconds.observe(service_time, stage)
+        finally:
+            semaphore.release()
+
+    def hedge_delay(self, stage: str) -> Optional[float]:
+        """Seconds after which a call of this stage is hedged, or None while it shouldn't be"""
+        stats = self._stage(stage)
+        if not self.hedge_enabled or len(stats.attempts) < HEDGE_MIN_SAMPLES:
+            return None
+        attempts = sorted(stats.attempts)
+        return max(self.hedge_min_delay, attempts[int(self.hedge_percentile * (len(attempts) - 1))])
+
+    def _may_hedge(self, stage: str) -> bool:
+        """A second attempt must neither queue nor push hedges past their share of calls"""
+        stats = self._stage(stage)
+        return (not self._get_semaphore().locked() and self._waiting == 0
+                and stats.hedged < self.hedge_budget * stats.dispatched)
+
+    async def _hedge(self, stage: str, hedge: Callable[[], Awaitable[Any]]) -> Any:
+        """Second attempt in a slot taken by the caller (without waiting, since one was free)"""
+        semaphore = self._get_semaphore()
+        self._active += 1
+        try:
+            return await hedge()
+        finally:
+            self._active -= 1
+            semaphore.release()
+
+    async def _attempt(self,
+                       stage: str,
+                       call: Callable[[], Awaitable[Any]],
+                       deadline: Optional[float],
+                       hedge: Optional[Callable[[], Awaitable[Any]]]) -> Any:
+        """Run call in a slot until it answers or the deadline passes, hedging it if it runs long"""
+        async with self.slot(stage, deadline):
+            stats = self._stage(stage)
+            started = time.perf_counter()
+            primary = asyncio.ensure_future(call())
+            # Only calls that ran to completion say how long calls take: a primary cut short by a
+            # winning hedge or a caller that went away would pull the hedge threshold down
+            primary.add_done_callback(
+                lambda done: None if done.cancelled() or done.exception() is not None
+                else stats.attempts.append(time.perf_counter() - started)
+            )
+            attempts = [primary]
+            try:
+                delay = self.hedge_delay(stage) if hedge is not None else None
+                if delay is not None:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    await asyncio.wait(attempts, timeout=delay if remaining is None else min(delay, remaining))
+                    if not primary.done() and self._may_hedge(stage):
+                        await self._get_semaphore().acquire()
+                        stats.hedged += 1
+                        attempts.append(asyncio.ensure_future(self._hedge(stage, hedge)))
+
+                pending = set(attempts)
+                error: Optional[BaseException] = None
+                while pending:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        if not primary.done():
+                            # Took at least the whole deadline
+                            stats.attempts.append(time.perf_counter() - started)
+                        raise self._expired(stage, "generation")
+                    for attempt in done:
+                        if attempt.exception() is None:
+                            if attempt is not primary:
+                                stats.hedge_wins += 1
+                            return attempt.result()
+                        error = error or attempt.exception()
+                raise error
+            finally:
+                # Cancel the attempt that lost, or both when the deadline passed or the caller went away
+                for attempt in attempts:
+                    if not attempt.done():
+                        attempt.cancel()
+
+    async def run(self,
+                  stage: str,
+                  call: Callable[[], Awaitable[Any]],
+                  coalesce_key: Any = None,
+                  deadline: Optional[float] = None,
+                  hedge: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        """
+        Run call in a slot, or share the result of an in-flight call with the same coalesce_key
+
+        deadline is a time.monotonic() instant after which the call is cancelled and
+        DeadlineExceeded raised; hedge makes a second attempt when the call runs long.
+        """
+        if coalesce_key is None:
+            return await self._attempt(stage, call, deadline, hedge)
+
+        self._get_semaphore()
+        leader = self._inflight.get(coalesce_key)
+        if leader is not None:
+            stats = self._stage(stage)
+            stats.requests += 1
+            stats.coalesced += 1
+            return await self.within(deadline, asyncio.shield(leader), stage, "coalesced")
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on a failed call, so don't warn about an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[coalesce_key] = future
+        try:
+            result = await self._attempt(stage, call, deadline, hedge)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.set_exception(LLMUnavailable(503, 1, "The coalesced model request was cancelled"))
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if self._inflight.get(coalesce_key) is future:
+                del self._inflight[coalesce_key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "waiting": self._waiting,
+            "coalescing": len(self._inflight),
+            "hedging": self.hedge_enabled,
+            "hedge_delay": {stage: self.hedge_delay(stage) for stage in self._stages},
+            "provider_paused_for": max(0.0, self._busy_until - time.monotonic()),
+            "stages": {stage: stats.snapshot() for stage, stats in self._stages.items()},
+        }
@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.config import (
+    RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_SIMILARITY, RESPONSE_CACHE_MIN_WORDS
+)
+from app.services.retrieval import tokenize
+
+# Messages leaning on earlier turns ("how much is that one?") can't be answered from cache
+CONTEXT_DEPENDENT_WORDS = {"it", "its", "that", "this", "those", "these", "them", "they", "one", "ones", "same", "else"}
+
+# Words that may differ between two phrasings of the same question
+FILLER_WORDS = {
+    "a", "an", "the", "of", "for", "is", "are", "s", "what", "whats", "how", "do", "does", "you",
+    "your", "have", "any", "can", "could", "i", "me", "please", "tell", "about", "got", "there",
+}
+
+
+def normalize_message(message: str) -> str:
+    """Case, punctuation and number-format insensitive form of a message"""
+    return " ".join(tokenize(message))
+
+
+def _content_words(text: str) -> Set[str]:
+    return set(text.split()) - FILLER_WORDS
+
+
+def _ngrams(text: str, n: int = 3) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class ResponseCache:
+    """
+    Cache of model replies to standalone customer questions.
+
+    The cache is shared by all sessions, so ChatService only uses it for a
+    session's first question; the wording checks below can't tell whether a
+    later one ("the second diamond", "something cheaper") builds on earlier turns.
+
+    Entries are keyed by the normalized message and the knowledge snapshot
+    version, so an inventory reload invalidates everything. Near-identical
+    wording can also hit through a character-trigram Jaccard match, but only
+    when both questions share the same content words (so "1 carat" never
+    matches "2 carat" and "D color" never matches "E color").
+    """
+
+    def __init__(self,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 ttl: float = RESPONSE_CACHE_TTL,
+                 similarity: float = RESPONSE_CACHE_SIMILARITY,
+                 min_words: int = RESPONSE_CACHE_MIN_WORDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity = similarity
+        self.min_words = min_words
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._ngram_index: Dict[str, Set[str]] = defaultdict(set)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def is_cacheable(self, message: str) -> bool:
+        """Only standalone questions with enough words to be unambiguous are cached"""
+        words = normalize_message(message).split()
+        return len(words) >= self.min_words and not CONTEXT_DEPENDENT_WORDS.intersection(words)
+
+    def key(self, message: str, version: int) -> Optional[Tuple[int, str]]:
+        """Identity of a cacheable question, shared by rewordings that normalize alike; None if not cached"""
+        if self.max_entries <= 0 or not self.is_cacheable(message):
+            return None
+        return (version, normalize_message(message))
+
+    def get(self, message: str, version: int) -> Optional[str]:
+        if self.max_entries <= 0 or not self.is_cacheable(message):
+            return None
+        key = normalize_message(message)
+        with self._lock:
+            self._check_version(version)
+            entry = self._lookup(key)
+            if entry is not None:
+                self.exact_hits += 1
+            elif self.similarity < 1:
+                key, entry = self._lookup_similar(key)
+                if entry is not None:
+                    self.similar_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry["response"]
+
+    def put(self, message: str, version: int, response: str) -> None:
+        if self.max_entries <= 0 or not self.is_cacheable(message):
+            return
+        key = normalize_message(message)
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._remove(key)
+            ngrams = _ngrams(key)
+            size = len(key) + len(response)
+            self._entries[key] = {
+                "response": response,
+                "ngrams": ngrams,
+                "content_words": _content_words(key),
+                "bytes": size,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            for gram in ngrams:
+                self._ngram_index[gram].add(key)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def _check_version(self, version: int) -> None:
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._ngram_index.clear()
+            self._bytes = 0
+            self._version = version
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry["expires_at"] < time.monotonic():
+            self._remove(key)
+            return None
+        return entry
+
+    def _lookup_similar(self, key: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        ngrams = _ngrams(key)
+        content_words = _content_words(key)
+        overlaps: Dict[str, int] = defaultdict(int)
+        for gram in ngrams:
+            for candidate in self._ngram_index.get(gram, ()):
+                overlaps[candidate] += 1
+
+        best_key, best_score = None, self.similarity
+        for candidate, overlap in overlaps.items():
+            if self._entries[candidate]["content_words"] != content_words:
+                continue
+            union = len(ngrams) + len(self._entries[candidate]["ngrams"]) - overlap
+            score = overlap / union
+            if score >= best_score:
+                best_key, best_score = candidate, score
+        if best_key is None:
+            return key, None
+        return best_key, self._lookup(best_key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry["bytes"]
+        for gram in entry["ngrams"]:
+            keys = self._ngram_index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._ngram_index[gram]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "knowledge_version": self._version,
+            }
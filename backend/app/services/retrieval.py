@@ -0,0 +1,186 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.logger import logger
+
+TOKEN_PATTERN = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word/number tokens; numbers are normalized so '1.0' matches '1'"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token[0].isdigit():
+            token = f"{float(token):g}"
+        tokens.append(token)
+    return tokens
+
+
+class EmbeddingBackend:
+    """Interface for optional dense retrieval backends"""
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return one embedding row per input text"""
+        raise NotImplementedError
+
+
+class GeminiEmbeddingBackend(EmbeddingBackend):
+    """Embeds documents with the Gemini embedding API"""
+
+    def __init__(self, model: str = "models/text-embedding-004", batch_size: int = 100):
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        import google.generativeai as genai
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            result = genai.embed_content(model=self.model, content=batch)
+            vectors.extend(result["embedding"])
+        return np.asarray(vectors, dtype=np.float32)
+
+
+EMBEDDING_BACKENDS = {
+    "gemini": GeminiEmbeddingBackend,
+}
+
+
+def get_embedding_backend(name: str) -> Optional[EmbeddingBackend]:
+    """Resolve an embedding backend by config name (empty means lexical only)"""
+    if not name:
+        return None
+    if name not in EMBEDDING_BACKENDS:
+        logger.warning(f"Unknown embedding backend '{name}', using lexical retrieval only")
+        return None
+    return EMBEDDING_BACKENDS[name]()
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over a list of texts"""
+
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings[term].append((doc_id, tf))
+
+        avg_length = float(lengths.mean()) if self.size else 0.0
+        # Per-document length normalization is query independent, so precompute it once
+        self._norm = self.k1 * (1 - self.b + self.b * lengths / (avg_length or 1.0))
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, entries in postings.items():
+            doc_ids = np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            df = len(entries)
+            idf = math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+            self._postings[term] = (doc_ids, tfs, idf)
+
+    def to_arrays(self) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """Terms and flat posting arrays (CSR layout) for storing the index on disk"""
+        terms = list(self._postings)
+        lengths = [len(self._postings[term][0]) for term in terms]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+        arrays = {
+            "offsets": offsets,
+            "doc_ids": np.concatenate([self._postings[term][0] for term in terms] or [empty[0]]),
+            "tfs": np.concatenate([self._postings[term][1] for term in terms] or [empty[1]]),
+            "idf": np.array([self._postings[term][2] for term in terms], dtype=np.float64),
+            "norm": np.asarray(self._norm, dtype=np.float32),
+        }
+        return terms, arrays
+
+    @classmethod
+    def from_arrays(cls, terms: List[str], arrays: Dict[str, np.ndarray], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """Rebuild an index from to_arrays output; posting lists are views, so memory-mapped arrays are not copied"""
+        index = cls.__new__(cls)
+        index.k1 = k1
+        index.b = b
+        index.size = len(arrays["norm"])
+        # Plain ndarray views slice much faster than np.memmap instances
+        index._norm = np.asarray(arrays["norm"])
+        doc_ids, tfs = np.asarray(arrays["doc_ids"]), np.asarray(arrays["tfs"])
+        offsets, idf = arrays["offsets"].tolist(), arrays["idf"].tolist()
+        index._postings = {
+            term: (doc_ids[offsets[i]:offsets[i + 1]], tfs[offsets[i]:offsets[i + 1]], idf[i])
+            for i, term in enumerate(terms)
+        }
+        return index
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, tfs, idf = posting
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[doc_ids])
+        return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> List[int]:
+    """Indices of the k highest positive scores, best first"""
+    if k <= 0 or scores.size == 0:
+        return []
+    k = min(k, scores.size)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    ranked = candidates[np.argsort(-scores[candidates])]
+    return [int(i) for i in ranked if scores[i] > 0]
+
+
+class Retriever:
+    """Lexical (BM25) retrieval with optional embedding re-ranking via rank fusion"""
+
+    def __init__(self,
+                 texts: List[str],
+                 embedding_backend: Optional[EmbeddingBackend] = None,
+                 bm25: Optional[BM25Index] = None,
+                 embeddings: Optional[np.ndarray] = None):
+        # A prebuilt index and embeddings (e.g. loaded from disk) skip indexing the texts
+        self.bm25 = bm25 if bm25 is not None else BM25Index(texts)
+        self.embedding_backend = embedding_backend
+        self.embeddings: Optional[np.ndarray] = embeddings
+
+        if embeddings is None and embedding_backend is not None and texts:
+            try:
+                vectors = embedding_backend.embed(texts)
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                self.embeddings = vectors / np.maximum(norms, 1e-12)
+            except Exception as e:
+                logger.error(f"Error building embedding index, using lexical retrieval only: {e}")
+
+    def search(self, query: str, k: int) -> List[int]:
+        """Return the ids of the k most relevant documents"""
+        lexical = top_k(self.bm25.scores(query), k * 4 if self.embeddings is not None else k)
+        if self.embeddings is None:
+            return lexical[:k]
+
+        try:
+            query_vector = self.embedding_backend.embed([query])[0]
+            query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+            dense = top_k(self.embeddings @ query_vector + 1.0, k * 4)
+        except Exception as e:
+            logger.error(f"Error embedding query, using lexical results: {e}")
+            return lexical[:k]
+
+        # Reciprocal rank fusion of the lexical and dense rankings
+        fused: Dict[int, float] = defaultdict(float)
+        for ranking in (lexical, dense):
+            for rank, doc_id in enumerate(ranking):
+                fused[doc_id] += 1.0 / (60 + rank)
+        return sorted(fused, key=fused.get, reverse=True)[:k]
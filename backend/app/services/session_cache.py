@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import (
+    SESSION_CACHE_MAX_SESSIONS, SESSION_CACHE_TTL, SESSION_CACHE_MAX_BYTES, SESSION_CACHE_VALIDATE
+)
+
+
+def _message_size(message: Dict[str, str]) -> int:
+    return len(message["content"]) + len(message["role"]) + 64
+
+
+class SessionCache:
+    """
+    Bounded LRU/TTL cache of recent conversation turns per session.
+
+    Reads are served from memory; writers append to a cached session after
+    persisting to the database (write-through). Sessions are evicted least
+    recently used first when the session count or total size limit is hit.
+    With validate set, callers check a hit against the database's message
+    count before using it and drop entries that another worker has outdated.
+    """
+
+    def __init__(self,
+                 max_sessions: int = SESSION_CACHE_MAX_SESSIONS,
+                 ttl: float = SESSION_CACHE_TTL,
+                 max_bytes: int = SESSION_CACHE_MAX_BYTES,
+                 max_messages: int = 50,
+                 validate: bool = SESSION_CACHE_VALIDATE):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.validate = validate
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+
+    def get(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """Cached history for a session, or None on a miss"""
+        cached = self.get_with_offset(session_id)
+        return cached[0] if cached is not None else None
+
+    def get_with_offset(self, session_id: str) -> Optional[Tuple[List[Dict[str, str]], int]]:
+        """Cached history and the position of its first message in the session, or None on a miss"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry["expires_at"] < time.monotonic():
+                self._remove(session_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._sessions.move_to_end(session_id)
+            entry["expires_at"] = time.monotonic() + self.ttl
+            return list(entry["messages"]), entry["offset"]
+
+    def set(self, session_id: str, messages: List[Dict[str, str]], offset: int = 0) -> None:
+        """
+        Cache a session's history as loaded from the database
+
+        Args:
+            offset: Number of older messages of the session that are not included
+        """
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+            offset += max(0, len(messages) - self.max_messages)
+            messages = list(messages[-self.max_messages:])
+            size = sum(_message_size(m) for m in messages)
+            self._sessions[session_id] = {
+                "messages": messages,
+                "offset": offset,
+                "bytes": size,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            self._bytes += size
+            self._evict()
+
+    def append(self, session_id: str, message: Dict[str, str]) -> None:
+        """Add a persisted message to a cached session (no-op if not cached)"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            entry["messages"].append(message)
+            size = _message_size(message)
+            entry["bytes"] += size
+            self._bytes += size
+            if len(entry["messages"]) > self.max_messages:
+                dropped = entry["messages"].pop(0)
+                entry["offset"] += 1
+                entry["bytes"] -= _message_size(dropped)
+                self._bytes -= _message_size(dropped)
+            self._sessions.move_to_end(session_id)
+            self._evict()
+
+    def invalidate(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+
+    def discard_stale(self, session_id: str) -> None:
+        """Drop an entry found out of date, counting the lookup as a miss"""
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+            self.stale += 1
+            self.hits -= 1
+            self.misses += 1
+
+    def _remove(self, session_id: str) -> None:
+        entry = self._sessions.pop(session_id)
+        self._bytes -= entry["bytes"]
+
+    def _evict(self) -> None:
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            session_id = next(iter(self._sessions))
+            self._remove(session_id)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "stale": self.stale,
+            }
@@ -1,15 +1,75 @@
+import atexit
 import logging
+import os
+import queue
 import sys
+import zlib
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation isn't coordinated between workers
+    fcntl = None
+
+from app.config import LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT
 
 # Create logs directory if it doesn't exist
-log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
+log_file = Path(LOG_FILE)
+log_dir = log_file.parent
+log_dir.mkdir(parents=True, exist_ok=True)
 
 # Configure logging format
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# Bytes read per step when scanning the log file
+READ_BLOCK = 8192
+# Leading bytes of the file a log cursor is checked against
+CURSOR_CHECK_BYTES = 256
+
+
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+    """
+    Size-rotated log file that several worker processes append to
+
+    Rotation is serialized with a lock file, and is skipped if another worker
+    already rotated while this one waited. Before each record the handler
+    reopens the path if it now names a different file, so no worker keeps
+    writing into a rotated backup.
+    """
+
+    def _reopen_if_moved(self) -> bool:
+        if self.stream is None:
+            return False
+        try:
+            on_disk = os.stat(self.baseFilename)
+            current = os.fstat(self.stream.fileno())
+            moved = (on_disk.st_dev, on_disk.st_ino) != (current.st_dev, current.st_ino)
+        except FileNotFoundError:
+            moved = True
+        if moved:
+            self.stream.close()
+            self.stream = self._open()
+        return moved
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        self._reopen_if_moved()
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        if fcntl is None:
+            super().doRollover()
+            return
+        with open(f"{self.baseFilename}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another worker may have rotated while this one waited for the lock
+            if not self._reopen_if_moved():
+                super().doRollover()
+
+
 # Create logger
 logger = logging.getLogger("diamond_chatbot")
 logger.setLevel(logging.INFO)
@@ -20,25 +80,118 @@ console_handler.setLevel(logging.INFO)
 console_formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
 console_handler.setFormatter(console_formatter)
 
-# File handler
-file_handler = logging.FileHandler(log_dir / "app.log")
+# File handler, rotated by size; safe to share between workers
+file_handler = SharedRotatingFileHandler(
+    log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+)
 file_handler.setLevel(logging.INFO)
 file_formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
 file_handler.setFormatter(file_formatter)
 
+# Callers only put records on a queue; a listener thread does the console and file I/O
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+log_listener.start()
+# Drain the queue before the process exits
+atexit.register(log_listener.stop)
+
 # Add handlers
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
-
-def get_logs(lines: int = 100) -> list[str]:
-    """Read slightly more logs from file"""
-    log_file = log_dir / "app.log"
-    if not log_file.exists():
-        return []
-    
+logger.addHandler(QueueHandler(log_queue))
+
+
+def _decode(lines: List[bytes]) -> List[str]:
+    return [line.decode("utf-8", errors="replace").rstrip("\r") for line in lines]
+
+
+def _fingerprint(f: Any, offset: int) -> int:
+    # The log is append-only until it rotates, so the bytes before a cursor never change;
+    # after rotation they belong to another file (inodes are reused, so they can't tell)
+    f.seek(0)
+    return zlib.crc32(f.read(min(offset, CURSOR_CHECK_BYTES)))
+
+
+def _make_cursor(f: Any, offset: int) -> str:
+    return f"{offset}-{_fingerprint(f, offset):08x}"
+
+
+def _resolve_cursor(f: Any, cursor: Optional[str], size: int) -> Optional[int]:
+    """Offset a cursor points at, or None if it is missing, malformed or from another file"""
+    try:
+        offset, fingerprint = cursor.split("-")
+        offset = int(offset)
+        fingerprint = int(fingerprint, 16)
+    except (AttributeError, ValueError):
+        return None
+    if offset < 0 or offset > size or _fingerprint(f, offset) != fingerprint:
+        return None
+    return offset
+
+
+def _tail(f: Any, size: int, lines: int) -> Tuple[List[bytes], int]:
+    """Last complete lines before size, reading backwards, and the offset just after them"""
+    position = size
+    data = b""
+    # One more newline than lines is needed to know the oldest line is complete
+    while position > 0 and data.count(b"\n") <= lines:
+        step = min(READ_BLOCK, position)
+        position -= step
+        f.seek(position)
+        data = f.read(step) + data
+    end = size
+    if not data.endswith(b"\n"):
+        # The writer may be part way through the last line
+        cut = data.rfind(b"\n") + 1
+        end = position + cut
+        data = data[:cut]
+    return (data.splitlines()[-lines:] if lines > 0 else []), end
+
+
+def get_logs(lines: int = 100) -> List[str]:
+    """Last lines of the log file, read from the end so the cost follows lines, not the file size"""
+    return read_logs(lines=lines)["logs"]
+
+
+def read_logs(cursor: Optional[str] = None, lines: int = 100) -> Dict[str, Any]:
+    """
+    Log lines written after cursor, or the last lines when there is no cursor
+
+    Returns the lines (at most lines of them, oldest first), the cursor to pass
+    next time, whether more lines are already waiting after it, and whether the
+    cursor was discarded because the file was rotated or truncated since.
+    """
+    result: Dict[str, Any] = {"logs": [], "cursor": None, "more": False, "reset": cursor is not None}
     try:
-        with open(log_file, "r") as f:
-            return f.readlines()[-lines:]
+        with open(log_file, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = _resolve_cursor(f, cursor, size)
+            if offset is None:
+                tail, end = _tail(f, size, lines)
+                result["logs"] = _decode(tail)
+                result["cursor"] = _make_cursor(f, end)
+                return result
+
+            result["reset"] = False
+            f.seek(offset)
+            collected: List[bytes] = []
+            pending = b""
+            while len(collected) < lines:
+                block = f.read(READ_BLOCK)
+                if not block:
+                    break
+                parts = (pending + block).split(b"\n")
+                pending = parts.pop()
+                for line in parts:
+                    if len(collected) == lines:
+                        result["more"] = True
+                        break
+                    collected.append(line)
+                    offset += len(line) + 1
+            if not result["more"] and len(collected) == lines:
+                result["more"] = offset < size
+            result["logs"] = _decode(collected)
+            result["cursor"] = _make_cursor(f, offset)
+    except FileNotFoundError:
+        pass
     except Exception as e:
         logger.error(f"Error reading logs: {e}")
-        return []
+    return result
@@ -0,0 +1,137 @@
+"""
+In-process metrics: fixed-bucket latency histograms and Prometheus text output.
+
+Observing a value is a bisect and three additions under a lock, so timers can
+sit on the request hot path. Histograms are per process; with several
+workers each one reports its own.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+# Seconds; spans sub-millisecond cache and DB work up to slow model calls
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+PREFIX = "diamond_chatbot"
+
+
+class Histogram:
+    """Latency histogram with one label (e.g. stage), in the Prometheus cumulative-bucket model"""
+
+    def __init__(self, name: str, help: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label value -> [per-bucket counts (last is +Inf), sum, count, min, max]
+        self._series: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label_value: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0, value, value]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+            if value < series[3]:
+                series[3] = value
+            elif value > series[4]:
+                series[4] = value
+
+    @contextmanager
+    def time(self, label_value: str) -> Iterator[None]:
+        """Observe the duration of the block, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, label_value)
+
+    def _copy(self) -> Dict[str, List[Any]]:
+        with self._lock:
+            return {key: [list(value[0])] + value[1:] for key, value in sorted(self._series.items())}
+
+    def _quantile(self, counts: List[int], total: int, low: float, high: float, q: float) -> float:
+        """Estimate by linear interpolation within the bucket holding the q-th observation"""
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = max(self.buckets[i - 1] if i > 0 else 0.0, low)
+                upper = min(self.buckets[i] if i < len(self.buckets) else high, high)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return high
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {
+            key: {
+                "count": total,
+                "avg": seconds / total,
+                "p50": self._quantile(counts, total, low, high, 0.50),
+                "p95": self._quantile(counts, total, low, high, 0.95),
+                "p99": self._quantile(counts, total, low, high, 0.99),
+                "max": high,
+            }
+            for key, (counts, seconds, total, low, high) in self._copy().items()
+        }
+
+    def render(self) -> List[str]:
+        name = f"{PREFIX}_{self.name}"
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} histogram"]
+        for key, (counts, seconds, total, _, _) in self._copy().items():
+            label = f'{self.label}="{_escape(key)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{label},le="+Inf"}} {total}')
+            lines.append(f"{name}_sum{{{label}}} {seconds:.6f}")
+            lines.append(f"{name}_count{{{label}}} {total}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _flatten(stats: Dict[str, Any], path: Tuple[str, ...] = ()) -> Iterator[Tuple[str, float]]:
+    """Numeric leaves of nested stats dicts as (metric name, value)"""
+    for key, value in stats.items():
+        name = path + (str(key),)
+        if isinstance(value, dict):
+            yield from _flatten(value, name)
+        elif isinstance(value, (bool, int, float)) and not (isinstance(value, float) and math.isnan(value)):
+            yield "_".join(name), float(value)
+
+
+def render_prometheus(histograms: Sequence[Histogram], gauges: Dict[str, Any]) -> str:
+    """Prometheus text exposition of histograms plus the numeric values of nested stats dicts"""
+    lines: List[str] = []
+    for histogram in histograms:
+        lines.extend(histogram.render())
+    for key, value in _flatten(gauges):
+        name = f"{PREFIX}_{''.join(c if c.isalnum() else '_' for c in key)}"
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value!r}")
+    return "\n".join(lines) + "\n"
+
+
+# Global instances
+chat_stage_seconds = Histogram(
+    "chat_stage_seconds", "Time spent in each stage of handling a chat message", "stage"
+)
+llm_queue_wait_seconds = Histogram(
+    "llm_queue_wait_seconds", "Time model calls waited for a dispatcher slot", "call"
+)
+llm_generation_seconds = Histogram(
+    "llm_generation_seconds", "Time model calls took once dispatched", "call"
+)
+HISTOGRAMS = (chat_stage_seconds, llm_queue_wait_seconds, llm_generation_seconds)
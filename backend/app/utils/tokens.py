@@ -0,0 +1,5 @@
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
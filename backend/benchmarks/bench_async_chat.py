@@ -0,0 +1,71 @@
+"""
+Load benchmark for the async chat pipeline.
+
+Drives ChatService.process_message for many concurrent sessions against a stub
+LLM with a fixed latency. The "blocking" run sleeps inside the event loop the way
+the old synchronous send_message did; the "async" run awaits the stub instead.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_async_chat --sessions 200 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app import database
+from app.services.chat_service import chat_service
+from app.services.gemini_client import gemini_client
+
+
+def install_stub(latency: float, blocking: bool) -> None:
+    """Replace the Gemini call with a fixed-latency stub"""
+    async def blocking_stub(messages, **kwargs):
+        time.sleep(latency)
+        return "stub reply"
+
+    async def async_stub(messages, **kwargs):
+        await asyncio.sleep(latency)
+        return "stub reply"
+
+    gemini_client.generate_response_async = blocking_stub if blocking else async_stub
+
+
+async def run(sessions: int, prefix: str) -> float:
+    """Send one message from each session concurrently, return wall time"""
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        chat_service.process_message(f"{prefix}-{i}", "Do you have oval diamonds?")
+        for i in range(sessions)
+    ])
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+
+        results = {}
+        for label, blocking in (("blocking", True), ("async", False)):
+            install_stub(args.latency, blocking)
+            results[label] = asyncio.run(run(args.sessions, label))
+
+    # Each new session makes two LLM calls: the greeting and the reply
+    ideal = 2 * args.latency
+    print(f"sessions={args.sessions} llm_latency={args.latency:.3f}s ideal_per_session={ideal:.3f}s")
+    for label, elapsed in results.items():
+        print(f"{label:>9}: {elapsed:8.2f}s wall  {args.sessions / elapsed:8.1f} sessions/s")
+    print(f"speedup: {results['blocking'] / results['async']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
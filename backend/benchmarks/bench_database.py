@@ -0,0 +1,130 @@
+"""
+Chat history persistence benchmark with millions of stored messages.
+
+Seeds two databases with the same messages: one with the original layout
+(rollback journal, no session index, history sorted by timestamp, a new
+connection per call) and one with the current layer (pooled WAL connections,
+(session_id, id) index, optional write-behind batching). Then measures insert
+and history-read throughput against each.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_database --messages 1000000 --sessions 50000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app import database
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+LEGACY_HISTORY = '''
+    SELECT role, content, timestamp FROM (
+        SELECT role, content, timestamp FROM messages
+        WHERE session_id = ? ORDER BY timestamp DESC LIMIT ?
+    ) ORDER BY timestamp ASC
+'''
+
+
+def seed(conn: sqlite3.Connection, messages: int, sessions: int) -> None:
+    rng = random.Random(7)
+    batch = []
+    for i in range(messages):
+        batch.append((f"session-{rng.randrange(sessions)}", "user" if i % 2 else "assistant",
+                      f"Seed message {i} about a 1.2 carat oval diamond"))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)", batch)
+            batch.clear()
+    conn.executemany("INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)", batch)
+    conn.commit()
+
+
+def legacy_insert(path: str, session_id: str) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                 (session_id, "user", "benchmark message"))
+    conn.commit()
+    conn.close()
+
+
+def legacy_history(path: str, session_id: str) -> list:
+    conn = sqlite3.connect(path)
+    rows = conn.execute(LEGACY_HISTORY, (session_id, 50)).fetchall()
+    conn.close()
+    return rows
+
+
+def run_threads(fn, total: int, threads: int) -> float:
+    """Run fn(i) for i in range(total) across threads, return operations per second"""
+    def worker(offset):
+        for i in range(offset, total, threads):
+            fn(i)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return total / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=50_000)
+    parser.add_argument("--inserts", type=int, default=5_000)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        conn.execute(LEGACY_SCHEMA)
+        start = time.perf_counter()
+        seed(conn, args.messages, args.sessions)
+        conn.close()
+        print(f"seeded {args.messages} messages in {time.perf_counter() - start:.1f}s")
+
+        database.DB_FILE = os.path.join(tmp, "current.db")
+        database.init_db(write_behind=False)
+        with database.get_pool().connection() as conn:
+            seed(conn, args.messages, args.sessions)
+
+        def session(i):
+            return f"session-{i % args.sessions}"
+
+        results = {}
+        results["legacy insert"] = run_threads(lambda i: legacy_insert(legacy_path, session(i)), args.inserts, args.threads)
+        results["pooled insert"] = run_threads(lambda i: database.save_message(session(i), "user", "benchmark message"), args.inserts, args.threads)
+
+        database.init_db(write_behind=True)
+        start = time.perf_counter()
+        for i in range(args.inserts):
+            database.save_message(session(i), "user", "benchmark message")
+        database.close_db()
+        results["write-behind insert"] = args.inserts / (time.perf_counter() - start)
+
+        database.init_db(write_behind=False)
+        results["legacy history read"] = run_threads(lambda i: legacy_history(legacy_path, session(i * 7919)), args.reads, args.threads)
+        results["indexed history read"] = run_threads(lambda i: database.get_chat_history(session(i * 7919)), args.reads, args.threads)
+        database.close_db()
+
+    for name, ops in results.items():
+        print(f"{name:<22} {ops:>10.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
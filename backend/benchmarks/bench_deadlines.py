@@ -0,0 +1,130 @@
+"""
+Tail latency benchmark for chat deadlines and hedged model calls.
+
+Sends --requests chat messages at --rps (open loop, one new session each)
+through ChatService to the stub model backend, where --slow-rate of the
+calls, picked at random, take --slow-latency seconds longer than the usual
+--latency. Three runs:
+
+- baseline: no deadline, no hedging (slow calls set the tail)
+- deadline: requests still waiting on the model after --slo seconds are
+  cancelled and fail with DeadlineExceeded (504 over HTTP)
+- hedged: the same deadline, plus a second request once a call has run
+  longer than --hedge-percentile of recent calls; the first answer wins
+
+Reports latency percentiles over all requests (timed-out ones count at the
+time they failed), timeouts, model calls, and hedges sent and won.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_deadlines --requests 1000 --rps 50 --slow-rate 0.05 --slo 1.5
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from app import database
+from app.services.chat_service import FALLBACK_GREETING, chat_service
+from app.services.fast_path import fast_path
+from app.services.gemini_client import gemini_client
+from app.services.knowledge_base import KnowledgeSnapshot, knowledge_base
+from app.services.llm_backends import StubBackend
+from app.services.llm_dispatch import DeadlineExceeded, LLMDispatcher
+from app.services.response_cache import ResponseCache
+from benchmarks.bench_load import QUESTIONS, percentile
+from benchmarks.synthetic import make_inventory
+
+
+async def drive(label: str, args: argparse.Namespace, slo: Optional[float]) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    latencies: List[float] = []
+    timeouts = 0
+
+    async def one(i: int) -> None:
+        nonlocal timeouts
+        session_id = f"{label}-{i}"
+        await chat_service.add_message(session_id, "assistant", FALLBACK_GREETING)
+        message = rng.choice(QUESTIONS).format(carat=rng.randint(30, 300) / 100) + f" ({i})"
+        start = time.monotonic()
+        try:
+            await chat_service.process_message(session_id, message, deadline=start + slo if slo else None)
+        except DeadlineExceeded:
+            timeouts += 1
+        latencies.append(time.monotonic() - start)
+
+    tasks = []
+    start = time.monotonic()
+    for i in range(args.requests):
+        # Open loop: requests arrive on schedule however slowly earlier ones are answered
+        await asyncio.sleep(max(0.0, start + i / args.rps - time.monotonic()))
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    return {"latencies": latencies, "timeouts": timeouts}
+
+
+def run(label: str, args: argparse.Namespace, slo: Optional[float], hedge: bool) -> None:
+    backend = StubBackend(latency=args.latency, tokens_per_second=0, slow_rate=args.slow_rate,
+                          slow_latency=args.slow_latency)
+    gemini_client.backend = backend
+    gemini_client._model = None
+    gemini_client._instruction_models.clear()
+    gemini_client.dispatcher = LLMDispatcher(
+        max_concurrency=args.concurrency, max_queue=10 ** 6, hedge_enabled=hedge,
+        hedge_percentile=args.hedge_percentile, hedge_min_delay=args.hedge_min_delay,
+        hedge_budget=args.hedge_budget
+    )
+    chat_service.response_cache = ResponseCache(max_entries=0)
+
+    result = asyncio.run(drive(label, args, slo))
+    latencies = result["latencies"]
+    chat = gemini_client.dispatcher.stats()["stages"].get("chat", {})
+    print(
+        f"{label:>9} {percentile(latencies, 0.5):>8.0f} {percentile(latencies, 0.95):>8.0f} "
+        f"{percentile(latencies, 0.99):>8.0f} {max(latencies) * 1000:>8.0f} {result['timeouts']:>9} "
+        f"{backend.calls:>7} {backend.slow_calls:>5} {chat.get('hedged', 0):>7} {chat.get('hedge_wins', 0):>5}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rps", type=float, default=50, help="arrival rate")
+    parser.add_argument("--latency", type=float, default=0.3, help="usual stub model seconds per call")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="share of calls that are slow")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="extra seconds of a slow call")
+    parser.add_argument("--slo", type=float, default=1.5, help="deadline in seconds")
+    parser.add_argument("--concurrency", type=int, default=64, help="dispatcher slots")
+    parser.add_argument("--hedge-percentile", type=float, default=0.95)
+    parser.add_argument("--hedge-min-delay", type=float, default=0.5)
+    parser.add_argument("--hedge-budget", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    knowledge_base._snapshot = KnowledgeSnapshot(version=1, data=make_inventory(100), image_documents=[])
+    chat_service.history_manager.token_budget = 0
+    # Measure model calls only, not questions answered from the index
+    fast_path.enabled = False
+
+    print(
+        f"requests={args.requests} rps={args.rps} stub {args.latency}s, {args.slow_rate:.0%} of calls "
+        f"+{args.slow_latency}s, slo={args.slo}s, hedge after p{args.hedge_percentile * 100:g} "
+        f"(min {args.hedge_min_delay}s, budget {args.hedge_budget:.0%})"
+    )
+    print(f"{'run':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'timeouts':>9} "
+          f"{'calls':>7} {'slow':>5} {'hedged':>7} {'won':>5}")
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+        run("baseline", args, None, False)
+        run("deadline", args, args.slo, False)
+        run("hedged", args, args.slo, True)
+
+
+if __name__ == "__main__":
+    main()
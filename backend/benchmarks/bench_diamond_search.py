@@ -0,0 +1,69 @@
+"""
+Diamond search benchmark: indexed query engine vs. copy-and-mask filtering.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_diamond_search --rows 100000
+"""
+import argparse
+import time
+
+from app.services.diamond_search import DiamondIndex
+from benchmarks.synthetic import make_inventory
+
+QUERIES = {
+    "carat 1.0-1.5": dict(ranges={"carat": (1.0, 1.5)}),
+    "price < 5000, D/E/F": dict(ranges={"price": (None, 5000)}, members={"color": ["D", "E", "F"]}),
+    "oval ideal, cheapest 10": dict(members={"shape": ["Oval"], "cut": ["Ideal"]}, sort_by="price", limit=10),
+    "largest 10 overall": dict(sort_by="carat", descending=True, limit=10),
+}
+
+COLUMNS = {"carat": "carat", "price": "price_usd", "color": "color", "cut": "cut", "shape": "shape"}
+
+
+def baseline(df, ranges=None, members=None, sort_by=None, descending=False, limit=20):
+    """The previous approach: copy the frame and apply one boolean mask per criterion"""
+    filtered = df.copy()
+    for field, (low, high) in (ranges or {}).items():
+        column = filtered[COLUMNS[field]]
+        if low is not None:
+            filtered = filtered[column >= low]
+            column = filtered[COLUMNS[field]]
+        if high is not None:
+            filtered = filtered[column <= high]
+    for field, values in (members or {}).items():
+        filtered = filtered[filtered[COLUMNS[field]].isin(values)]
+    if sort_by:
+        filtered = filtered.sort_values(COLUMNS[sort_by], ascending=not descending)
+    return {"total": len(filtered), "results": filtered.head(limit).to_dict("records")}
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    df = make_inventory(args.rows)
+    start = time.perf_counter()
+    index = DiamondIndex(df)
+    print(f"rows={args.rows} index_build={(time.perf_counter() - start) * 1000:.1f}ms")
+
+    print(f"{'query':<26} {'total':>7} {'baseline_ms':>12} {'indexed_ms':>11}")
+    for name, query in QUERIES.items():
+        indexed = index.search(**query)
+        expected = baseline(df, **query)
+        assert indexed["total"] == expected["total"], name
+        base_ms = timed(lambda: baseline(df, **query), args.repeat)
+        index_ms = timed(lambda: index.search(**query), args.repeat)
+        print(f"{name:<26} {indexed['total']:>7} {base_ms:>12.2f} {index_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Fast-path benchmark for factual inventory questions.
+
+Builds a synthetic --rows inventory and a message mix in which --factual of
+the messages are structured questions (availability, cheapest/biggest, price
+range, counts over carat, price, shape, color, clarity and cut) and the rest
+are free-form or follow-up messages that need the model. Reports:
+
+- answerer: how many of each kind the fast path answered, and its latency
+  per answered question, first with an empty memo and then warm
+- end to end: --messages messages through ChatService against the stub model
+  backend (LLM_STUB_LATENCY, LLM_STUB_TOKENS_PER_SECOND), with the fast path
+  off and on; model calls and reply latency. The response cache is disabled
+  in both runs so it does not hide model calls.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_fast_path --rows 10000 --messages 400 --factual 0.6
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import List, Tuple
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from app import database
+from app.services.chat_service import FALLBACK_GREETING, chat_service
+from app.services.fast_path import FastPathAnswerer, fast_path
+from app.services.gemini_client import gemini_client
+from app.services.knowledge_base import KnowledgeSnapshot, knowledge_base
+from app.services.response_cache import ResponseCache
+from benchmarks.bench_load import percentile
+from benchmarks.synthetic import CLARITIES, COLORS, CUTS, SHAPES, make_inventory
+
+FACTUAL = [
+    "Do you have a {carat} carat {shape}?",
+    "Any {shape} diamonds under ${budget}?",
+    "What's your cheapest {shape}?",
+    "Biggest {shape} you have under ${budget}",
+    "How much is a {carat} carat {shape} with {clarity} clarity?",
+    "Price range for {color} color {shape} diamonds",
+    "How many {cut} cut {shape} diamonds do you have?",
+    "Looking for a {color}-{color2} color {carat} carat {shape} under {budget}",
+    "Show me {clarity} {shape} between {carat} and {carat2} carats",
+    "do you have {cut} cut {shape}s around {carat} carats",
+]
+FREE_FORM = [
+    "Hi there!",
+    "What's the difference between VS1 and VS2?",
+    "Is a {carat} carat {shape} a good choice for an engagement ring?",
+    "What about something bigger?",
+    "Can I see that one in platinum?",
+    "My budget is tight, what would you recommend?",
+    "Do you offer financing?",
+    "How long does shipping take?",
+    "Which is more sparkly, {shape} or round?",
+    "I like the second one, is it still available?",
+]
+
+
+def make_messages(count: int, factual: float, seed: int) -> List[Tuple[bool, str]]:
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        carat = rng.choice([0.5, 0.7, 1, 1.2, 1.5, 2, 2.5, 3])
+        slots = {
+            "carat": f"{carat:g}",
+            "carat2": f"{carat + 0.5:g}",
+            "shape": rng.choice(SHAPES).lower(),
+            "color": rng.choice(COLORS[:4]),
+            "color2": rng.choice(COLORS[4:]),
+            "clarity": rng.choice(CLARITIES[2:]),
+            "cut": rng.choice(CUTS).lower(),
+            "budget": f"{rng.choice([2, 3, 5, 8, 10, 15, 20]) * 1000:,}",
+        }
+        is_factual = rng.random() < factual
+        template = rng.choice(FACTUAL if is_factual else FREE_FORM)
+        messages.append((is_factual, template.format(**slots)))
+    return messages
+
+
+def bench_answerer(snapshot: KnowledgeSnapshot, messages: List[Tuple[bool, str]]) -> None:
+    answerer = FastPathAnswerer(enabled=True)
+    for label in ("cold memo", "warm memo"):
+        hits = {True: 0, False: 0}
+        totals = {True: 0, False: 0}
+        timings: List[float] = []
+        for is_factual, message in messages:
+            start = time.perf_counter()
+            reply = answerer.answer(message, snapshot)
+            elapsed = time.perf_counter() - start
+            totals[is_factual] += 1
+            if reply is not None:
+                hits[is_factual] += 1
+                timings.append(elapsed)
+        print(
+            f"{label:>10}: factual answered {hits[True]}/{totals[True]}, "
+            f"free-form answered {hits[False]}/{totals[False]}, "
+            f"latency p50 {percentile(timings, 0.5):.2f} ms  p99 {percentile(timings, 0.99):.2f} ms  "
+            f"max {max(timings, default=0) * 1000:.2f} ms"
+        )
+    example = next((m for f, m in messages if f), None)
+    if example:
+        print(f"  e.g. {example!r}\n    -> {answerer.answer(example, snapshot)!r}")
+
+
+async def converse(prefix: str, messages: List[Tuple[bool, str]], sessions: int) -> List[float]:
+    """Each session sends its share of the messages one after another"""
+    for i in range(sessions):
+        await chat_service.add_message(f"{prefix}-{i}", "assistant", FALLBACK_GREETING)
+
+    async def session(i: int) -> List[float]:
+        timings = []
+        for _, message in messages[i::sessions]:
+            start = time.perf_counter()
+            await chat_service.process_message(f"{prefix}-{i}", message)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    results = await asyncio.gather(*[session(i) for i in range(sessions)])
+    return [t for timings in results for t in timings]
+
+
+def bench_end_to_end(messages: List[Tuple[bool, str]], sessions: int) -> None:
+    backend = gemini_client.backend
+    print(f"\nend to end: {len(messages)} messages from {sessions} sessions, stub model {backend.latency}s "
+          f"+ {backend.tokens_per_second} tok/s")
+    print(f"{'fast path':>10} {'model calls':>12} {'wall s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for enabled in (False, True):
+        fast_path.enabled = enabled
+        chat_service.response_cache = ResponseCache(max_entries=0)
+        calls = backend.calls
+        start = time.perf_counter()
+        timings = asyncio.run(converse("on" if enabled else "off", messages, sessions))
+        wall = time.perf_counter() - start
+        print(
+            f"{'on' if enabled else 'off':>10} {backend.calls - calls:>12} {wall:>8.2f} "
+            f"{percentile(timings, 0.5):>8.1f} {percentile(timings, 0.99):>8.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="synthetic inventory size")
+    parser.add_argument("--messages", type=int, default=400)
+    parser.add_argument("--factual", type=float, default=0.6, help="share of structured inventory questions")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    snapshot = KnowledgeSnapshot(version=1, data=make_inventory(args.rows), image_documents=[])
+    knowledge_base._snapshot = snapshot
+    messages = make_messages(args.messages, args.factual, args.seed)
+    print(f"rows={args.rows} messages={args.messages} factual share={args.factual}")
+    bench_answerer(snapshot, messages)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+        bench_end_to_end(messages, args.sessions)
+
+
+if __name__ == "__main__":
+    main()
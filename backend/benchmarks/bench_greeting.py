@@ -0,0 +1,85 @@
+"""
+Time-to-first-message benchmark for new sessions.
+
+Opens new sessions through ChatService.get_greeting against a stub LLM with a
+fixed latency, once generating each greeting on demand (pool size 0) and once
+from a pre-filled greeting pool that refills in the background.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_greeting --sessions 50 --latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app import database
+from app.services.chat_service import chat_service
+from app.services.gemini_client import gemini_client
+from app.services.knowledge_base import KnowledgeSnapshot, knowledge_base
+from benchmarks.synthetic import make_inventory
+
+
+def install_stub(latency: float) -> None:
+    """Replace the Gemini call with a fixed-latency stub"""
+    async def stub(messages, **kwargs):
+        await asyncio.sleep(latency)
+        return "Hi there, welcome to Cygni! What are you shopping for today?"
+
+    gemini_client.generate_response_async = stub
+
+
+async def open_sessions(prefix: str, sessions: int, interval: float, prefill: bool) -> List[float]:
+    """Open sessions one after another, returning each time to first message"""
+    pool = chat_service.greeting_pool
+    if prefill:
+        pool.refill()
+        while pool.stats()["size"] < pool.target_size:
+            await asyncio.sleep(0.01)
+
+    timings = []
+    for i in range(sessions):
+        start = time.perf_counter()
+        await chat_service.get_greeting(f"{prefix}-{i}")
+        timings.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    await pool.stop()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=1.0, help="stub LLM latency in seconds")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between new visitors")
+    parser.add_argument("--pool-size", type=int, default=20)
+    args = parser.parse_args()
+
+    install_stub(args.latency)
+    knowledge_base._snapshot = KnowledgeSnapshot(version=1, data=make_inventory(100), image_documents=[])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+
+        results = {}
+        for label, size in (("on-demand", 0), ("pooled", args.pool_size)):
+            chat_service.greeting_pool.target_size = size
+            results[label] = asyncio.run(open_sessions(label, args.sessions, args.interval, prefill=size > 0))
+        database.close_db()
+
+    print(f"sessions={args.sessions} llm_latency={args.latency:.3f}s pool_size={args.pool_size}")
+    for label, timings in results.items():
+        timings_ms = sorted(t * 1000 for t in timings)
+        p95 = timings_ms[int(0.95 * (len(timings_ms) - 1))]
+        print(f"{label:>10}: p50 {statistics.median(timings_ms):9.2f} ms  p95 {p95:9.2f} ms  max {timings_ms[-1]:9.2f} ms")
+    print(f"pool: {chat_service.greeting_pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
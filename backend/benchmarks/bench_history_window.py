@@ -0,0 +1,141 @@
+"""
+Per-turn history payload benchmark for long conversations.
+
+Runs one long conversation through ChatService against a stub Gemini model
+whose latency grows with the size of the request, once sending the raw
+history (HISTORY_TOKEN_BUDGET=0, up to the 50 cached messages) and once
+through the token-budgeted history window with its rolling summary. Reports
+the estimated tokens of conversation sent per request and the simulated
+latency at several points of the conversation, plus the summary calls made.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_history_window --turns 200 --budget 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app import database
+from app.services.chat_service import chat_service
+from app.services.gemini_client import gemini_client
+from app.services.knowledge_base import KnowledgeSnapshot, knowledge_base
+from app.utils.tokens import estimate_tokens
+from benchmarks.synthetic import make_inventory
+
+QUESTIONS = [
+    "Do you have a {carat} carat oval diamond with {color} color?",
+    "What's the price of the {cut} cut round one you mentioned earlier, and is it certified?",
+    "Could you compare it with something in {color} color and VS1 clarity under {budget} dollars?",
+    "My partner prefers {cut} cuts, what would you suggest for an engagement ring around {carat} carats?",
+]
+REPLY = (
+    "We have a lovely {carat} carat option in {color} color with an {cut} cut at about {budget} dollars. "
+    "It's GIA certified and has great sparkle for the size. Want me to hold it or show a couple of alternatives?"
+)
+
+
+class StubChatSession:
+    """Records the conversation size of each request and sleeps in proportion to it"""
+
+    def __init__(self, model: "StubModel", history: List[Dict[str, Any]]):
+        self.model = model
+        self.history = [self._content(m["role"], m["parts"][0]) for m in history]
+
+    @staticmethod
+    def _content(role: str, text: str) -> Any:
+        return SimpleNamespace(role=role, parts=[SimpleNamespace(text=text)])
+
+    async def send_message_async(self, prompt: str, stream: bool = False) -> Any:
+        tokens = sum(estimate_tokens(c.parts[0].text) for c in self.history) + estimate_tokens(prompt)
+        self.model.requests.append(tokens)
+        await asyncio.sleep(self.model.base_latency + self.model.latency_per_1k * tokens / 1000)
+        reply = self.model.reply()
+        self.history += [self._content("user", prompt), self._content("model", reply)]
+        return SimpleNamespace(text=reply)
+
+
+class StubModel:
+    def __init__(self, base_latency: float, latency_per_1k: float, summary: bool = False):
+        self.base_latency = base_latency
+        self.latency_per_1k = latency_per_1k
+        self.summary = summary
+        self.requests: List[int] = []
+
+    def reply(self) -> str:
+        if self.summary:
+            return "Customer wants an oval or round diamond around 1 carat, G-H color, VS1, budget near 5000."
+        return REPLY.format(**random_slots())
+
+    def start_chat(self, history: List[Dict[str, Any]]) -> StubChatSession:
+        return StubChatSession(self, history)
+
+
+def random_slots() -> Dict[str, Any]:
+    return {
+        "carat": random.choice(["0.7", "1", "1.5", "2"]),
+        "color": random.choice(["D", "E", "F", "G", "H"]),
+        "cut": random.choice(["ideal", "excellent", "very good"]),
+        "budget": random.choice([3000, 5000, 8000, 12000]),
+    }
+
+
+def install_stub(base_latency: float, latency_per_1k: float) -> Dict[str, StubModel]:
+    """Chat turns go to the instruction model, summaries to the base model"""
+    models = {
+        "chat": StubModel(base_latency, latency_per_1k),
+        "summary": StubModel(base_latency, latency_per_1k, summary=True),
+    }
+    gemini_client._create_instruction_model = lambda system_instruction: (models["chat"], None)
+    gemini_client._instruction_models.clear()
+    gemini_client._model = models["summary"]
+    return models
+
+
+async def converse(session_id: str, turns: int) -> None:
+    for _ in range(turns):
+        await chat_service.process_message(session_id, random.choice(QUESTIONS).format(**random_slots()))
+    await chat_service.history_manager.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=2000, help="HISTORY_TOKEN_BUDGET for the managed run")
+    parser.add_argument("--base-latency", type=float, default=0.0, help="stub latency per request in seconds")
+    parser.add_argument("--latency-per-1k", type=float, default=0.002, help="stub latency per 1k request tokens")
+    args = parser.parse_args()
+
+    knowledge_base._snapshot = KnowledgeSnapshot(version=1, data=make_inventory(1000), image_documents=[])
+    chat_service.response_cache.max_entries = 0
+    chat_service.greeting_pool.target_size = 0
+    checkpoints = sorted({t for t in (10, 25, 50, 100, 200, 500, args.turns) if t <= args.turns})
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+        for label, budget in (("raw", 0), ("windowed", args.budget)):
+            random.seed(0)
+            models = install_stub(args.base_latency, args.latency_per_1k)
+            chat_service.history_manager.token_budget = budget
+            asyncio.run(converse(f"history-{label}", args.turns))
+            # The first chat request is the greeting
+            results[label] = (models["chat"].requests[1:], len(models["summary"].requests))
+        database.close_db()
+
+    print(f"turns={args.turns} budget={args.budget} latency={args.base_latency:.3f}s + {args.latency_per_1k:.3f}s/1k tokens")
+    print(f"{'':>10} " + " ".join(f"{f'turn {t}':>10}" for t in checkpoints) + f" {'summaries':>10}")
+    for label, (requests, summaries) in results.items():
+        print(f"{label + ' tok':>10} " + " ".join(f"{requests[t - 1]:>10,}" for t in checkpoints) + f" {summaries:>10}")
+        latencies = [args.base_latency + args.latency_per_1k * requests[t - 1] / 1000 for t in checkpoints]
+        print(f"{label + ' ms':>10} " + " ".join(f"{latency * 1000:>10.2f}" for latency in latencies))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Image ingestion payload benchmark.
+
+Generates --images synthetic phone photos (--width x --height JPEGs at
+quality 95, half of them stored sideways with an EXIF orientation tag) plus
+--duplicates recompressed, slightly smaller copies of some of them, as
+messaging apps produce. Each set is ingested through ImageIngestionPipeline
+against a stub vision model that uploads over a shared --bandwidth Mbit/s
+link and then takes --latency seconds to answer:
+
+- before: full-size files uploaded as they are, every photo analyzed
+- after: preprocessed (upright, --max-edge, --format at --quality) with
+  near-duplicates sharing an analysis
+- after, warm: the same with the derived images already cached on disk
+
+Reports model calls, bytes sent and wall time per image.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_image_preprocessing --images 12 --duplicates 4 --bandwidth 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+from PIL import Image
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.services.gemini_client import gemini_client
+from app.services.image_ingestion import ImageAnalysisCache, ImageIngestionPipeline, find_images
+from app.services.image_preprocessing import IMAGE_FORMATS, ImagePreprocessor, SOURCE_MIME_TYPES
+import app.services.gemini_client as gemini_client_module
+
+EXIF_ORIENTATION = 0x0112
+
+
+class StubVisionModel:
+    """Uploads over a shared link (one image at a time), then answers after a fixed latency"""
+
+    def __init__(self, bandwidth_mbps: float, latency: float):
+        self.bytes_per_second = bandwidth_mbps * 1e6 / 8
+        self.latency = latency
+        self.calls = 0
+        self.bytes_sent = 0
+        self._link = threading.Lock()
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents: List[Any]) -> Any:
+        size = len(contents[1]["data"])
+        with self._lock:
+            self.calls += 1
+            self.bytes_sent += size
+        with self._link:
+            time.sleep(size / self.bytes_per_second)
+        time.sleep(self.latency)
+        return SimpleNamespace(text=json.dumps({"type": "Ring", "gemstone": "Diamond", "carat": 1.0}))
+
+
+class PassthroughPreprocessor:
+    """What analyze_image sent before preprocessing: the file as it is"""
+
+    def prepare(self, path: Path, digest: str = None) -> Dict[str, Any]:
+        data = path.read_bytes()
+        with Image.open(path) as img:
+            mime_type = SOURCE_MIME_TYPES.get(img.format, "image/jpeg")
+        return {"data": data, "mime_type": mime_type, "sha256": digest}
+
+
+def make_photo(rng: np.random.Generator, width: int, height: int) -> Image.Image:
+    """Smooth blobs with sensor-like noise, which compresses about as badly as a real photo"""
+    base = rng.integers(0, 256, (9, 12, 3), dtype=np.uint8)
+    img = np.asarray(Image.fromarray(base).resize((width, height), Image.BICUBIC), dtype=np.int16)
+    img = img + rng.normal(0, 6, img.shape).astype(np.int16)
+    return Image.fromarray(np.clip(img, 0, 255).astype(np.uint8))
+
+
+def make_photos(directory: Path, images: int, duplicates: int, width: int, height: int) -> None:
+    rng = np.random.default_rng(0)
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(images):
+        img = make_photo(rng, width, height)
+        exif = Image.Exif()
+        if i % 2:
+            # Stored sideways, as phones do for portrait shots
+            img = img.transpose(Image.ROTATE_90)
+            exif[EXIF_ORIENTATION] = 6
+        img.save(directory / f"photo_{i:03d}.jpg", "JPEG", quality=95, exif=exif)
+    for i in range(duplicates):
+        source = directory / f"photo_{i % images:03d}.jpg"
+        with Image.open(source) as img:
+            exif = img.getexif()
+            copy = img.resize((img.width * 4 // 5, img.height * 4 // 5), Image.LANCZOS)
+        copy.save(directory / f"photo_{i % images:03d}_copy{i}.jpg", "JPEG", quality=80, exif=exif)
+
+
+def run(label: str, files: List[Path], work_dir: Path, preprocessor: Any, dedupe: bool,
+        args: argparse.Namespace) -> None:
+    model = StubVisionModel(args.bandwidth, args.latency)
+    gemini_client._model = model
+    gemini_client_module.image_preprocessor = preprocessor
+
+    cache = ImageAnalysisCache(str(work_dir / f"analysis-{label}.jsonl"), str(work_dir / "missing.json"))
+    pipeline = ImageIngestionPipeline(cache, workers=args.workers, max_retries=0, dedupe=dedupe)
+    start = time.perf_counter()
+    stats = pipeline.run(files)
+    wall = time.perf_counter() - start
+    print(
+        f"{label:>12} {model.calls:>6} {stats['duplicates']:>6} {model.bytes_sent / 1e6:>9.2f} "
+        f"{model.bytes_sent / max(1, model.calls) / 1e3:>10.0f} {wall:>8.2f} {wall / len(files) * 1000:>10.0f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--duplicates", type=int, default=4, help="recompressed copies of existing photos")
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--bandwidth", type=float, default=20, help="upload link in Mbit/s")
+    parser.add_argument("--latency", type=float, default=1.0, help="model seconds per image after upload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-edge", type=int, default=1024)
+    parser.add_argument("--format", default="jpeg", choices=sorted(IMAGE_FORMATS))
+    parser.add_argument("--quality", type=int, default=85)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        make_photos(work_dir / "images", args.images, args.duplicates, args.width, args.height)
+        files = sorted(find_images(str(work_dir / "images")))
+        source_bytes = sum(path.stat().st_size for path in files)
+        print(
+            f"{len(files)} photos ({args.duplicates} near-duplicates), {source_bytes / 1e6:.1f} MB, "
+            f"link {args.bandwidth} Mbit/s, model {args.latency}s, {args.workers} workers, "
+            f"max edge {args.max_edge} {args.format} q{args.quality}"
+        )
+        print(f"{'run':>12} {'calls':>6} {'dupes':>6} {'sent MB':>9} {'KB/call':>10} {'wall s':>8} {'ms/image':>10}")
+
+        preprocessor = ImagePreprocessor(args.max_edge, args.format, args.quality, str(work_dir / "derived"))
+        run("before", files, work_dir, PassthroughPreprocessor(), False, args)
+        run("after", files, work_dir, preprocessor, True, args)
+        run("after, warm", files, work_dir, preprocessor, True, args)
+        stats = preprocessor.stats()
+        print(f"derived cache hits: {stats['derived_cache_hits']} of {stats['prepared']} prepared")
+
+
+if __name__ == "__main__":
+    main()
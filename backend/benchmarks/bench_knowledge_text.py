@@ -0,0 +1,86 @@
+"""
+Knowledge text build benchmark for large catalogs.
+
+Renders synthetic inventories with the original row-by-row builder (iterrows,
+pd.isna per cell, string concatenation per field) and with the vectorized
+builder in both text formats, reporting build time, peak Python memory and
+output size. The row-by-row builder is skipped above --legacy-max-rows.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_knowledge_text --rows 1000 100000 1000000
+"""
+import argparse
+import os
+import time
+import tracemalloc
+from typing import Callable, List
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import pandas as pd
+
+from app.services.knowledge_base import create_diamond_documents, create_diamond_header
+from app.utils.tokens import estimate_tokens
+from benchmarks.synthetic import make_inventory
+
+
+def legacy_knowledge_text(data: pd.DataFrame) -> str:
+    """The original builder, kept here as the baseline"""
+    knowledge_parts = []
+    for idx, row in data.iterrows():
+        diamond_info = f"\nDiamond #{idx + 1}:\n"
+        for col in data.columns:
+            value = row[col]
+            if pd.isna(value):
+                value = "Not specified"
+            diamond_info += f"  - {col}: {value}\n"
+        knowledge_parts.append(diamond_info)
+    return "DIAMOND INVENTORY:\n" + "".join(knowledge_parts)
+
+
+def vectorized_knowledge_text(text_format: str) -> Callable[[pd.DataFrame], str]:
+    def build(data: pd.DataFrame) -> str:
+        documents = create_diamond_documents(data, text_format)
+        return "DIAMOND INVENTORY:\n" + create_diamond_header(data, text_format) + "".join(documents)
+    return build
+
+
+def measure(build: Callable[[pd.DataFrame], str], data: pd.DataFrame) -> List[float]:
+    """Build time (s), peak traced memory (MB) and output size (chars, estimated tokens)"""
+    start = time.perf_counter()
+    text = build(data)
+    elapsed = time.perf_counter() - start
+    size, tokens = len(text), estimate_tokens(text)
+    del text
+
+    tracemalloc.start()
+    build(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return [elapsed, peak / 1e6, size, tokens]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--legacy-max-rows", type=int, default=100000,
+                        help="skip the row-by-row builder above this many rows")
+    args = parser.parse_args()
+
+    builders = [
+        ("iterrows", legacy_knowledge_text),
+        ("blocks", vectorized_knowledge_text("blocks")),
+        ("table", vectorized_knowledge_text("table")),
+    ]
+    print(f"{'rows':>9} {'builder':>9} {'time (s)':>9} {'peak MB':>9} {'chars':>13} {'~tokens':>12}")
+    for rows in args.rows:
+        data = make_inventory(rows)
+        for label, build in builders:
+            if label == "iterrows" and rows > args.legacy_max_rows:
+                continue
+            elapsed, peak_mb, chars, tokens = measure(build, data)
+            print(f"{rows:>9,} {label:>9} {elapsed:>9.3f} {peak_mb:>9.1f} {chars:>13,} {tokens:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Traffic spike benchmark for the LLM dispatcher.
+
+Sends a burst of concurrent chat requests through ChatService to a stub Gemini
+model that answers 429 whenever more than --provider-limit calls are in flight
+(like a provider rate limit). Compares an unbounded dispatcher, where the
+spike trips the provider limit, with one bounded to the provider limit and a
+queue of --max-queue, where excess requests wait or are turned away locally
+with a Retry-After hint. A final run sends one standalone question from many
+sessions at once to show identical in-flight requests sharing a model call.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_llm_dispatch --requests 300 --provider-limit 20 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app import database
+from app.services.chat_service import FALLBACK_GREETING, chat_service
+from app.services.fast_path import fast_path
+from app.services.gemini_client import FALLBACK_RESPONSE, gemini_client
+from app.services.knowledge_base import KnowledgeSnapshot, knowledge_base
+from app.services.llm_dispatch import LLMDispatcher, LLMUnavailable
+from app.services.response_cache import ResponseCache
+from benchmarks.synthetic import make_inventory
+
+
+class ProviderBusy(Exception):
+    code = 429
+
+
+class StubChatSession:
+    def __init__(self, model: "StubModel", history: List[Dict[str, Any]]):
+        self.model = model
+        self.history = [self._content(m["role"], m["parts"][0]) for m in history]
+
+    @staticmethod
+    def _content(role: str, text: str) -> Any:
+        return SimpleNamespace(role=role, parts=[SimpleNamespace(text=text)])
+
+    async def send_message_async(self, prompt: str, stream: bool = False) -> Any:
+        model = self.model
+        model.calls += 1
+        if model.in_flight >= model.limit:
+            raise ProviderBusy("429 Resource has been exhausted")
+        model.in_flight += 1
+        try:
+            await asyncio.sleep(model.latency)
+        finally:
+            model.in_flight -= 1
+        self.history += [self._content("user", prompt), self._content("model", "stub reply")]
+        return SimpleNamespace(text="stub reply")
+
+
+class StubModel:
+    """Fixed-latency model that rejects calls beyond a concurrency limit"""
+
+    def __init__(self, latency: float, limit: int):
+        self.latency = latency
+        self.limit = limit
+        self.in_flight = 0
+        self.calls = 0
+
+    def start_chat(self, history: List[Dict[str, Any]]) -> StubChatSession:
+        return StubChatSession(self, history)
+
+
+async def burst(prefix: str, messages: List[str]) -> Dict[str, Any]:
+    for i in range(len(messages)):
+        await chat_service.add_message(f"{prefix}-{i}", "assistant", FALLBACK_GREETING)
+
+    async def one(i: int, message: str) -> tuple:
+        start = time.perf_counter()
+        try:
+            reply = await chat_service.process_message(f"{prefix}-{i}", message)
+            outcome = "ok" if reply != FALLBACK_RESPONSE else "apology"
+        except LLMUnavailable as e:
+            outcome = str(e.status_code)
+        return outcome, time.perf_counter() - start
+
+    results = await asyncio.gather(*[one(i, m) for i, m in enumerate(messages)])
+    outcomes: Dict[str, List[float]] = {}
+    for outcome, elapsed in results:
+        outcomes.setdefault(outcome, []).append(elapsed)
+    return outcomes
+
+
+def run(label: str, dispatcher: LLMDispatcher, model: StubModel, messages: List[str], coalesce: bool = True) -> None:
+    gemini_client.dispatcher = dispatcher
+    gemini_client._create_instruction_model = lambda system_instruction: (model, None)
+    gemini_client._instruction_models.clear()
+    # Coalescing keys come from the response cache, which is disabled to turn it off
+    chat_service.response_cache = ResponseCache(max_entries=5000 if coalesce else 0)
+
+    start = time.perf_counter()
+    outcomes = asyncio.run(burst(label, messages))
+    wall = time.perf_counter() - start
+
+    print(f"\n{label}: {len(messages)} requests in {wall:.2f}s, {model.calls} provider calls")
+    for outcome, timings in sorted(outcomes.items()):
+        timings_ms = sorted(t * 1000 for t in timings)
+        p95 = timings_ms[int(0.95 * (len(timings_ms) - 1))]
+        print(f"  {outcome:>8}: {len(timings):5d}  p50 {statistics.median(timings_ms):8.1f} ms  p95 {p95:8.1f} ms")
+    chat = dispatcher.stats()["stages"].get("chat")
+    if chat:
+        print(
+            f"  queue wait p50 {chat['queue_wait_p50'] * 1000:.1f} ms  p95 {chat['queue_wait_p95'] * 1000:.1f} ms  "
+            f"max {chat['queue_wait_max'] * 1000:.1f} ms  coalesced {chat['coalesced']}  rejected {chat['rejected']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--provider-limit", type=int, default=20, help="concurrent calls the stub provider accepts")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM latency in seconds")
+    parser.add_argument("--max-queue", type=int, default=100)
+    args = parser.parse_args()
+
+    knowledge_base._snapshot = KnowledgeSnapshot(version=1, data=make_inventory(100), image_documents=[])
+    chat_service.history_manager.token_budget = 0
+    # The questions are factual; measure model calls, not answers from the index
+    fast_path.enabled = False
+    distinct = [f"Do you have a {i / 10:.1f} carat oval diamond in stock?" for i in range(args.requests)]
+    identical = ["Do you have a 1 carat oval diamond in stock?"] * args.requests
+
+    print(f"requests={args.requests} provider_limit={args.provider_limit} latency={args.latency:.3f}s max_queue={args.max_queue}")
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+        run("unbounded", LLMDispatcher(max_concurrency=10 ** 6, max_queue=10 ** 6, provider_backoff=1),
+            StubModel(args.latency, args.provider_limit), distinct)
+        run("bounded", LLMDispatcher(max_concurrency=args.provider_limit, max_queue=args.max_queue, provider_backoff=1),
+            StubModel(args.latency, args.provider_limit), distinct)
+        run("identical/no-coalesce", LLMDispatcher(max_concurrency=args.provider_limit, max_queue=10 ** 6),
+            StubModel(args.latency, args.provider_limit), identical, coalesce=False)
+        run("identical", LLMDispatcher(max_concurrency=args.provider_limit, max_queue=10 ** 6),
+            StubModel(args.latency, args.provider_limit), identical)
+        database.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Fixed-rate HTTP load test of the chat API against the stub LLM backend.
+
+For each worker count, starts `uvicorn app.main:app --workers N` with
+LLM_BACKEND=stub, a synthetic inventory and a scratch database, then drives
+it open-loop at --rps requests per second for --duration seconds: a share of
+the requests open a new session through GET /chat/greeting/{id}, the rest
+POST /chat to one of the sessions opened so far. Requests are sent on
+schedule whether or not earlier ones finished, so queueing shows up as
+latency instead of a lower send rate. Reports p50/p95/p99 latency per
+endpoint, errors and completed requests per second.
+
+The stub's timing is set with --stub-latency / --stub-tps (or the
+LLM_STUB_* variables), so runs are reproducible and need no API key. Other
+settings, such as LLM_MAX_CONCURRENCY, pass through from the environment.
+Requires httpx (pip install httpx).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_load --workers 1 2 4 --rps 50 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+try:
+    import httpx
+except ImportError:
+    sys.exit("bench_load needs httpx: pip install httpx")
+
+from benchmarks.synthetic import make_inventory
+
+# Carat sizes vary so most questions miss the response cache and reach the model
+QUESTIONS = [
+    "Do you have a {carat} carat oval diamond?",
+    "What's the price of an ideal cut round around {carat} carats with D color?",
+    "Looking for a VVS1 emerald cut of {carat} carats under 5000",
+    "Any GIA certified cushion diamonds near {carat} carats in stock?",
+    "Can you show me something bigger than {carat} carats in the same color?",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/openapi.json")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def drive(client: httpx.AsyncClient, rps: float, duration: float,
+                greeting_share: float, seed: int) -> Tuple[Dict[str, List[float]], Dict[str, int], float]:
+    """Send requests on a fixed schedule; returns latencies and errors per endpoint and wall time"""
+    rng = random.Random(seed)
+    latencies: Dict[str, List[float]] = {"greeting": [], "chat": []}
+    errors: Dict[str, int] = {"greeting": 0, "chat": 0}
+    sessions: List[str] = []
+
+    async def request(endpoint: str, session_id: str, message: str) -> None:
+        start = time.perf_counter()
+        try:
+            if endpoint == "greeting":
+                response = await client.get(f"/chat/greeting/{session_id}")
+            else:
+                response = await client.post("/chat", json={"session_id": session_id, "message": message})
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            latencies[endpoint].append(time.perf_counter() - start)
+        else:
+            errors[endpoint] += 1
+
+    tasks = []
+    total = int(rps * duration)
+    start = time.perf_counter()
+    for i in range(total):
+        delay = start + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not sessions or rng.random() < greeting_share:
+            session_id = f"load-{seed}-{len(sessions)}"
+            sessions.append(session_id)
+            tasks.append(asyncio.create_task(request("greeting", session_id, "")))
+        else:
+            message = rng.choice(QUESTIONS).format(carat=rng.randint(30, 300) / 100)
+            tasks.append(asyncio.create_task(request("chat", rng.choice(sessions), message)))
+    await asyncio.gather(*tasks)
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+
+async def run(workers: int, args: argparse.Namespace, env: Dict[str, str]) -> None:
+    port = free_port()
+    server = start_server(workers, port, env)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+            await wait_ready(client)
+            # Let the greeting pools fill before measuring
+            await asyncio.sleep(args.warmup)
+            latencies, errors, wall = await drive(client, args.rps, args.duration, args.greeting_share, args.seed)
+    finally:
+        server.terminate()
+        server.wait()
+
+    completed = sum(len(values) for values in latencies.values())
+    for endpoint, values in latencies.items():
+        print(
+            f"{workers:>7} {endpoint:>9} {len(values):>6} {errors[endpoint]:>6} "
+            f"{percentile(values, 0.50):>9.1f} {percentile(values, 0.95):>9.1f} {percentile(values, 0.99):>9.1f}"
+        )
+    print(f"{workers:>7} {'total':>9} {completed:>6} {sum(errors.values()):>6}   throughput {completed / wall:.1f} req/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rps", type=float, default=50)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load per worker count")
+    parser.add_argument("--greeting-share", type=float, default=0.2, help="share of requests opening a new session")
+    parser.add_argument("--rows", type=int, default=1000, help="synthetic inventory size")
+    parser.add_argument("--stub-latency", type=float, default=0.5, help="stub time to first token in seconds")
+    parser.add_argument("--stub-tps", type=float, default=100, help="stub output tokens per second")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds between startup and load")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, "diamonds.xlsx")
+        make_inventory(args.rows).to_excel(excel_path, index=False)
+        env = {
+            **os.environ,
+            "GEMINI_API_KEY": "benchmark",
+            "LLM_BACKEND": "stub",
+            "LLM_STUB_LATENCY": str(args.stub_latency),
+            "LLM_STUB_TOKENS_PER_SECOND": str(args.stub_tps),
+            "EXCEL_FILE_PATH": excel_path,
+            "IMAGE_DATA_DIR": os.path.join(tmp, "images"),
+            "KNOWLEDGE_SNAPSHOT_DIR": os.path.join(tmp, "snapshot"),
+            "KNOWLEDGE_RELOAD_INTERVAL": "0",
+        }
+        print(
+            f"rps={args.rps} duration={args.duration}s greeting_share={args.greeting_share} "
+            f"stub={args.stub_latency}s + {args.stub_tps} tok/s rows={args.rows}"
+        )
+        print(f"{'workers':>7} {'endpoint':>9} {'ok':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for workers in args.workers:
+            env["DB_FILE"] = os.path.join(tmp, f"chat-{workers}.db")
+            asyncio.run(run(workers, args, env))
+
+
+if __name__ == "__main__":
+    main()
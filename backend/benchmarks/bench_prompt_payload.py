@@ -0,0 +1,125 @@
+"""
+Per-turn request payload benchmark for the system instruction.
+
+Runs a short conversation through ChatService against a stub Gemini model at
+several inventory sizes and measures the characters sent with each request on
+top of the replayed conversation history: the new user turn (with any retrieved
+items) and, unless it sits in a context cache, the system instruction. The
+"inline" column is what the old flow sent per turn, with instructions and
+knowledge pasted into the user message.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_prompt_payload --rows 100 1000 10000
+    python -m benchmarks.bench_prompt_payload --no-retrieval --context-cache
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app import database
+from app.prompts import format_chat_system_prompt
+from app.services import knowledge_base as knowledge_base_module
+from app.services.chat_service import chat_service
+from app.services.gemini_client import gemini_client
+from app.services.knowledge_base import KnowledgeSnapshot, knowledge_base
+from benchmarks.synthetic import make_inventory
+
+TURNS = [
+    "Do you have a 1 carat oval diamond?",
+    "What's the price of an ideal cut round with D color?",
+    "Looking for a VVS1 emerald cut under 5000",
+    "Any GIA certified cushion diamonds in stock?",
+]
+
+
+class StubChatSession:
+    """Records the payload of each request instead of calling the API"""
+
+    def __init__(self, model: "StubModel", history: List[Dict[str, Any]]):
+        self.model = model
+        self.history = [self._content(m["role"], m["parts"][0]) for m in history]
+
+    @staticmethod
+    def _content(role: str, text: str) -> Any:
+        return SimpleNamespace(role=role, parts=[SimpleNamespace(text=text)])
+
+    async def send_message_async(self, prompt: str, stream: bool = False) -> Any:
+        instruction_chars = 0 if self.model.cached else len(self.model.system_instruction)
+        self.model.requests.append(len(prompt) + instruction_chars)
+        self.history += [self._content("user", prompt), self._content("model", "stub reply")]
+        return SimpleNamespace(text="stub reply")
+
+
+class StubModel:
+    def __init__(self, system_instruction: str, cached: bool):
+        self.system_instruction = system_instruction
+        self.cached = cached
+        self.requests: List[int] = []
+
+    def start_chat(self, history: List[Dict[str, Any]]) -> StubChatSession:
+        return StubChatSession(self, history)
+
+
+def install_stub(context_cache: bool) -> List[StubModel]:
+    """Build stub models instead of Gemini ones; returns the list of models created"""
+    models: List[StubModel] = []
+
+    def create_instruction_model(system_instruction: str):
+        model = StubModel(system_instruction, cached=context_cache)
+        models.append(model)
+        return model, (SimpleNamespace(delete=lambda: None) if context_cache else None)
+
+    gemini_client._create_instruction_model = create_instruction_model
+    gemini_client._model = StubModel("", cached=False)
+    return models
+
+
+async def converse(session_id: str) -> None:
+    for message in TURNS:
+        await chat_service.process_message(session_id, message)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--no-retrieval", action="store_true", help="send the whole inventory as static knowledge")
+    parser.add_argument("--context-cache", action="store_true", help="model the system instruction as a context cache")
+    args = parser.parse_args()
+
+    knowledge_base_module.RETRIEVAL_ENABLED = not args.no_retrieval
+    chat_service.response_cache.max_entries = 0
+    models = install_stub(args.context_cache)
+
+    print(f"retrieval={not args.no_retrieval} context_cache={args.context_cache} turns={len(TURNS)}")
+    print(f"{'rows':>8} {'instruction':>12} {'inline/turn':>12} {'sent/turn':>10} {'last turn':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+
+        for version, rows in enumerate(args.rows, start=1):
+            snapshot = KnowledgeSnapshot(version=version, data=make_inventory(rows), image_documents=[])
+            knowledge_base._snapshot = snapshot
+            del models[:]
+
+            asyncio.run(converse(f"payload-{rows}"))
+
+            # Every request after the greeting belongs to the conversation
+            requests = [size for model in models for size in model.requests][1:]
+            inline = sum(
+                len(format_chat_system_prompt(snapshot.get_relevant_context(message))) + len(message)
+                for message in TURNS
+            ) / len(TURNS)
+            print(
+                f"{rows:>8} {len(snapshot.system_instruction):>12,} {inline:>12,.0f} "
+                f"{sum(requests) / len(requests):>10,.0f} {requests[-1]:>10,}"
+            )
+        database.close_db()
+
+
+if __name__ == "__main__":
+    main()
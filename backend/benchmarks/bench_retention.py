@@ -0,0 +1,166 @@
+"""
+Chat history retention benchmark.
+
+Seeds a database with --messages messages over --sessions sessions, of which
+--idle are stamped older than the retention period (sessions are contiguous
+runs of messages, as conversations are). While a writer thread keeps
+inserting messages into active sessions, one HistoryRetention run archives
+the idle sessions and deletes them in batches. Reports:
+
+- run time, messages archived, archive size and the database file size before
+  and after (including the VACUUM once enough of it is free)
+- insert latency of the writer before and during the run, which shows how
+  long the chunked deletes hold writers off
+- history-read latency of an active session before and after
+- export of a --long-session conversation from the archive and from the
+  database: rows per second and peak Python memory while streaming
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_retention --messages 1000000 --sessions 50000 --idle 0.7
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from app import database
+from app.services.history_retention import HistoryRetention
+from benchmarks.bench_load import percentile
+
+TTL_DAYS = 30
+
+
+def seed(path: str, messages: int, sessions: int, idle: float, long_session: int) -> List[str]:
+    """Sessions in id order, idle ones first; returns the active session ids"""
+    rng = random.Random(7)
+    conn = sqlite3.connect(path)
+    idle_sessions = int(sessions * idle)
+    old = datetime.now(timezone.utc) - timedelta(days=TTL_DAYS + 30)
+    per_session = max(1, (messages - 2 * long_session) // sessions)
+    batch = []
+
+    def add(session_id: str, count: int, stamp: datetime) -> None:
+        for i in range(count):
+            batch.append((session_id, "user" if i % 2 else "assistant",
+                          f"Message {i} of {session_id} about a {rng.randint(30, 300) / 100} carat oval diamond",
+                          stamp.strftime("%Y-%m-%d %H:%M:%S")))
+            if len(batch) >= 50_000:
+                conn.executemany("INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)", batch)
+                batch.clear()
+
+    add("long-archived", long_session, old)
+    for s in range(sessions):
+        is_idle = s < idle_sessions
+        # Idle sessions spread over a week of last activity, so several daily archives are written
+        stamp = old + timedelta(hours=s * 24 * 7 / max(1, idle_sessions)) if is_idle else datetime.now(timezone.utc)
+        add(f"session-{s}", per_session, stamp)
+    add("long-hot", long_session, datetime.now(timezone.utc))
+    conn.executemany("INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+    return [f"session-{s}" for s in range(idle_sessions, sessions)]
+
+
+def writer(active: List[str], stop: threading.Event, latencies: List[float]) -> None:
+    rng = random.Random(1)
+    while not stop.is_set():
+        start = time.perf_counter()
+        database.save_message(rng.choice(active), "user", "Do you have a 1 carat oval?")
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.002)
+
+
+def measure_writes(active: List[str], seconds: float) -> List[float]:
+    latencies: List[float] = []
+    stop = threading.Event()
+    thread = threading.Thread(target=writer, args=(active, stop, latencies))
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return latencies
+
+
+def measure_reads(active: List[str], count: int = 500) -> List[float]:
+    rng = random.Random(2)
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        database.get_chat_history(rng.choice(active), 50)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure_export(retention: HistoryRetention, session_id: str) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = sum(1 for _ in retention.export(session_id))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  export {session_id:>13}: {rows} messages in {elapsed:.2f}s "
+          f"({rows / elapsed:,.0f}/s), peak memory {peak / 1e6:.1f} MB")
+
+
+def db_size(path: str) -> float:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)) / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=50_000)
+    parser.add_argument("--idle", type=float, default=0.7, help="share of sessions past the retention period")
+    parser.add_argument("--long-session", type=int, default=50_000, help="messages in the exported sessions")
+    parser.add_argument("--batch-sessions", type=int, default=200)
+    parser.add_argument("--vacuum-free-ratio", type=float, default=0.25, help="0 skips the VACUUM")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db(write_behind=False)
+        start = time.perf_counter()
+        active = seed(database.DB_FILE, args.messages, args.sessions, args.idle, args.long_session)
+        print(f"seeded {args.messages} messages in {args.sessions} sessions ({args.idle:.0%} idle) "
+              f"in {time.perf_counter() - start:.1f}s, database {db_size(database.DB_FILE):.0f} MB")
+
+        retention = HistoryRetention(ttl_days=TTL_DAYS, interval=0, archive_dir=os.path.join(tmp, "archive"),
+                                     batch_sessions=args.batch_sessions, vacuum_free_ratio=args.vacuum_free_ratio)
+        baseline_writes = measure_writes(active, 2.0)
+        reads_before = measure_reads(active)
+
+        latencies: List[float] = []
+        stop = threading.Event()
+        thread = threading.Thread(target=writer, args=(active, stop, latencies))
+        thread.start()
+        result = asyncio.run(retention.run_once())
+        stop.set()
+        thread.join()
+        reads_after = measure_reads(active)
+        stats = retention.stats()
+
+        print(f"\nretention run: {result['sessions']} sessions, {result['messages']} messages in "
+              f"{result['seconds']:.1f}s, vacuumed: {result['vacuumed']}")
+        print(f"  archive: {stats['archive_files']} daily files, {stats['archive_bytes'] / 1e6:.1f} MB; "
+              f"database now {db_size(database.DB_FILE):.0f} MB")
+        print(f"{'inserts':>16} {'count':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for label, timings in (("before", baseline_writes), ("during run", latencies)):
+            print(f"{label:>16} {len(timings):>7} {percentile(timings, 0.5):>8.2f} "
+                  f"{percentile(timings, 0.99):>8.2f} {max(timings, default=0) * 1000:>8.2f}")
+        print(f"{'history reads':>16} {'count':>7} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, timings in (("before", reads_before), ("after", reads_after)):
+            print(f"{label:>16} {len(timings):>7} {percentile(timings, 0.5):>8.3f} {percentile(timings, 0.99):>8.3f}")
+        measure_export(retention, "long-archived")
+        measure_export(retention, "long-hot")
+        database.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Prompt size and latency benchmark for retrieval-augmented context.
+
+Compares the full-inventory context (every row in every prompt) against the
+top-k retrieved context at several inventory sizes. End-to-end latency is
+retrieval time plus a stub LLM whose latency grows with prompt tokens
+(fixed overhead + prefill time), so the numbers need no API key.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_retrieval --rows 100 10000 100000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.prompts import format_chat_system_prompt
+from app.services.knowledge_base import KnowledgeSnapshot
+from app.utils.tokens import estimate_tokens
+from benchmarks.synthetic import make_inventory
+
+QUERIES = [
+    "Do you have a 1 carat oval diamond?",
+    "What's the price of an ideal cut round with D color?",
+    "Looking for a VVS1 emerald cut under 5000",
+    "Any GIA certified cushion diamonds in stock?",
+]
+
+
+def build_knowledge_base(rows: int) -> KnowledgeSnapshot:
+    """Build a knowledge snapshot over synthetic rows without touching disk or the LLM"""
+    return KnowledgeSnapshot(version=1, data=make_inventory(rows), image_documents=[])
+
+
+def stub_llm_latency(prompt_tokens: int, overhead: float, prefill_rate: float) -> float:
+    """Modeled model latency: fixed overhead plus prompt prefill time"""
+    return overhead + prompt_tokens / prefill_rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--overhead", type=float, default=0.3, help="stub LLM fixed latency in seconds")
+    parser.add_argument("--prefill-rate", type=float, default=20_000, help="stub LLM prompt tokens per second")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'index_s':>8} {'full_tok':>10} {'rag_tok':>8} {'retr_ms':>8} {'full_e2e_s':>10} {'rag_e2e_s':>9}")
+    for rows in args.rows:
+        start = time.perf_counter()
+        kb = build_knowledge_base(rows)
+        index_time = time.perf_counter() - start
+
+        full_tokens = estimate_tokens(format_chat_system_prompt(kb.get_knowledge_context()))
+
+        rag_tokens, retrieval_time = 0, 0.0
+        for query in QUERIES:
+            start = time.perf_counter()
+            context = kb.get_relevant_context(query, top_k=args.top_k)
+            retrieval_time += time.perf_counter() - start
+            rag_tokens += estimate_tokens(format_chat_system_prompt(context))
+        rag_tokens //= len(QUERIES)
+        retrieval_time /= len(QUERIES)
+
+        full_e2e = stub_llm_latency(full_tokens, args.overhead, args.prefill_rate)
+        rag_e2e = retrieval_time + stub_llm_latency(rag_tokens, args.overhead, args.prefill_rate)
+        print(f"{rows:>8} {index_time:>8.2f} {full_tokens:>10} {rag_tokens:>8} "
+              f"{retrieval_time * 1000:>8.2f} {full_e2e:>10.2f} {rag_e2e:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Startup-time benchmark: import time, lifespan startup and first-request latency.
+
+Each measurement runs in a fresh interpreter against a synthetic Excel
+inventory, first without a compiled knowledge snapshot (cold build from Excel)
+and then memory-mapping the snapshot written by the first run (prebuilt).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup --rows 10000 --runs 3
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import make_inventory
+
+CHILD = r"""
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+client = TestClient(app.main.app)
+client.__enter__()
+started = time.perf_counter()
+
+client.get("/diamonds/search", params={"limit": 5})
+first_request = time.perf_counter()
+client.__exit__(None, None, None)
+
+print(json.dumps({
+    "import_s": imported - start,
+    "startup_s": started - imported,
+    "first_request_s": first_request - started,
+}))
+"""
+
+
+def measure(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, "diamonds.xlsx")
+        make_inventory(args.rows).to_excel(excel_path, index=False)
+        snapshot_path = os.path.join(tmp, "knowledge_snapshot")
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.getcwd(),
+            "GEMINI_API_KEY": "benchmark",
+            "EXCEL_FILE_PATH": excel_path,
+            "IMAGE_DATA_DIR": os.path.join(tmp, "images"),
+            "KNOWLEDGE_SNAPSHOT_DIR": snapshot_path,
+            "KNOWLEDGE_RELOAD_INTERVAL": "0",
+        }
+
+        print(f"rows={args.rows} runs={args.runs} (median seconds)")
+        print(f"{'mode':<10} {'import':>8} {'startup':>8} {'first_req':>10}")
+        for mode in ("cold", "prebuilt"):
+            results = []
+            for _ in range(args.runs):
+                if mode == "cold":
+                    shutil.rmtree(snapshot_path, ignore_errors=True)
+                results.append(measure(env))
+            row = {key: statistics.median(r[key] for r in results) for key in results[0]}
+            print(f"{mode:<10} {row['import_s']:>8.3f} {row['startup_s']:>8.3f} {row['first_request_s']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
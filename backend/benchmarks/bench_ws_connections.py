@@ -0,0 +1,186 @@
+"""
+WebSocket connection-count load test.
+
+Starts `uvicorn app.main:app` (one worker) with LLM_BACKEND=stub, then for
+each --connections step opens that many /chat/ws connections and holds them.
+It reports connect time (up to the session event with the greeting) and the
+worker's resident memory per connection. While the connections stay open,
+--active of them send a message every --think seconds for --duration
+seconds; the test reports time to first token and to the done event, and
+counts idle connections that dropped.
+
+Requires websockets and httpx (both come with uvicorn[standard] / pip
+install websockets httpx). Connection counts in the thousands need a high
+open-files limit; the test raises its own soft limit to the hard limit.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_ws_connections --connections 100 1000 5000 --active 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import websockets
+except ImportError:
+    sys.exit("bench_ws_connections needs websockets: pip install websockets")
+
+from benchmarks.bench_load import QUESTIONS, free_port, start_server, wait_ready, httpx, percentile
+from benchmarks.synthetic import make_inventory
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def open_connection(url: str, session_id: str, connect_times: List[float]) -> Optional[Any]:
+    start = time.perf_counter()
+    try:
+        ws = await websockets.connect(f"{url}?session_id={session_id}", max_queue=None, open_timeout=60)
+        while json.loads(await ws.recv())["type"] != "session":
+            pass
+    except Exception:
+        return None
+    connect_times.append(time.perf_counter() - start)
+    return ws
+
+
+async def converse(ws: Any, rng: random.Random, think: float, deadline: float,
+                   first_tokens: List[float], replies: List[float], errors: List[str]) -> None:
+    """Send a message every think seconds and time the streamed reply"""
+    await asyncio.sleep(rng.uniform(0, think))
+    while time.perf_counter() < deadline:
+        message = rng.choice(QUESTIONS).format(carat=rng.randint(30, 300) / 100)
+        start = time.perf_counter()
+        first = None
+        await ws.send(json.dumps({"type": "message", "message": message}))
+        while True:
+            event = json.loads(await ws.recv())
+            if event["type"] == "token" and first is None:
+                first = time.perf_counter() - start
+            elif event["type"] == "done":
+                first_tokens.append(first if first is not None else 0.0)
+                replies.append(time.perf_counter() - start)
+                break
+            elif event["type"] == "error":
+                errors.append(event.get("detail", ""))
+                break
+        await asyncio.sleep(max(0.0, think - (time.perf_counter() - start)))
+
+
+async def run(args: argparse.Namespace, env: Dict[str, str]) -> None:
+    port = free_port()
+    server = start_server(1, port, env)
+    url = f"ws://127.0.0.1:{port}/chat/ws"
+    sockets: List[Any] = []
+    rng = random.Random(args.seed)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            await wait_ready(client)
+        baseline = rss_mb(server.pid)
+        print(f"worker RSS at start: {baseline:.0f} MB" if baseline else "worker RSS unavailable")
+        print(
+            f"{'conns':>6} {'failed':>6} {'conn p50':>9} {'conn p99':>9} {'RSS MB':>7} {'KB/conn':>8} "
+            f"{'turns':>6} {'errors':>6} {'1st p50':>8} {'1st p99':>8} {'done p50':>9} {'done p99':>9} {'dropped':>7}"
+        )
+        for target in args.connections:
+            connect_times: List[float] = []
+            failed = 0
+            while len(sockets) < target:
+                batch = min(args.batch, target - len(sockets))
+                opened = await asyncio.gather(*[
+                    open_connection(url, f"ws-{len(sockets) + i}", connect_times) for i in range(batch)
+                ])
+                sockets.extend(ws for ws in opened if ws is not None)
+                failed += sum(1 for ws in opened if ws is None)
+                if failed and len(sockets) < target and all(ws is None for ws in opened):
+                    break
+            rss = rss_mb(server.pid)
+            per_connection = (rss - baseline) * 1024 / len(sockets) if rss and baseline and sockets else 0.0
+
+            first_tokens: List[float] = []
+            replies: List[float] = []
+            errors: List[str] = []
+            deadline = time.perf_counter() + args.duration
+            active = sockets[:args.active]
+            await asyncio.gather(*[
+                converse(ws, rng, args.think, deadline, first_tokens, replies, errors) for ws in active
+            ], return_exceptions=True)
+            dropped = sum(1 for ws in sockets if ws.state.name != "OPEN")
+
+            print(
+                f"{len(sockets):>6} {failed:>6} {percentile(connect_times, 0.5):>9.1f} "
+                f"{percentile(connect_times, 0.99):>9.1f} {rss or 0:>7.0f} {per_connection:>8.1f} "
+                f"{len(replies):>6} {len(errors):>6} {percentile(first_tokens, 0.5):>8.1f} "
+                f"{percentile(first_tokens, 0.99):>8.1f} {percentile(replies, 0.5):>9.1f} "
+                f"{percentile(replies, 0.99):>9.1f} {dropped:>7}"
+            )
+    finally:
+        await asyncio.gather(*[ws.close() for ws in sockets], return_exceptions=True)
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="open connections held at each step")
+    parser.add_argument("--active", type=int, default=50, help="connections sending messages at each step")
+    parser.add_argument("--think", type=float, default=2.0, help="seconds between messages of an active connection")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of conversation per step")
+    parser.add_argument("--batch", type=int, default=200, help="connections opened at once")
+    parser.add_argument("--rows", type=int, default=1000, help="synthetic inventory size")
+    parser.add_argument("--stub-latency", type=float, default=0.5, help="stub time to first token in seconds")
+    parser.add_argument("--stub-tps", type=float, default=100, help="stub output tokens per second")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Each connection is an open file on both ends
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < 2 * max(args.connections) + 100:
+        print(f"warning: open-files limit {hard} is low for {max(args.connections)} connections")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, "diamonds.xlsx")
+        make_inventory(args.rows).to_excel(excel_path, index=False)
+        env = {
+            **os.environ,
+            "GEMINI_API_KEY": "benchmark",
+            "LLM_BACKEND": "stub",
+            "LLM_STUB_LATENCY": str(args.stub_latency),
+            "LLM_STUB_TOKENS_PER_SECOND": str(args.stub_tps),
+            "EXCEL_FILE_PATH": excel_path,
+            "IMAGE_DATA_DIR": os.path.join(tmp, "images"),
+            "KNOWLEDGE_SNAPSHOT_DIR": os.path.join(tmp, "snapshot"),
+            "KNOWLEDGE_RELOAD_INTERVAL": "0",
+            "DB_FILE": os.path.join(tmp, "chat.db"),
+            "LOG_FILE": os.path.join(tmp, "app.log"),
+            "WS_MAX_CONNECTIONS": "0",
+            # Measure the connection layer, not the dispatcher's queue (override to include it)
+            "LLM_MAX_CONCURRENCY": os.environ.get("LLM_MAX_CONCURRENCY", "1000"),
+        }
+        print(
+            f"active={args.active} think={args.think}s duration={args.duration}s "
+            f"stub={args.stub_latency}s + {args.stub_tps} tok/s"
+        )
+        asyncio.run(run(args, env))
+
+
+if __name__ == "__main__":
+    main()
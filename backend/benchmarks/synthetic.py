@@ -0,0 +1,31 @@
+"""Synthetic diamond inventory used by the benchmarks."""
+import numpy as np
+import pandas as pd
+
+SHAPES = ["Round", "Oval", "Princess", "Emerald", "Cushion", "Pear", "Marquise", "Radiant", "Asscher", "Heart"]
+CUTS = ["Ideal", "Excellent", "Very Good", "Good", "Fair"]
+COLORS = ["D", "E", "F", "G", "H", "I", "J", "K"]
+CLARITIES = ["FL", "IF", "VVS1", "VVS2", "VS1", "VS2", "SI1", "SI2"]
+CERTIFICATIONS = ["GIA", "IGI", "HRD"]
+AVAILABILITY = ["In Stock", "On Request", "Reserved"]
+
+
+def make_inventory(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Build a diamond inventory frame with the columns from the README example"""
+    rng = np.random.default_rng(seed)
+    carat = np.round(rng.gamma(2.0, 0.5, rows) + 0.2, 2)
+    price = np.round(carat ** 1.8 * rng.uniform(2500, 6500, rows), 0)
+    df = pd.DataFrame({
+        "diamond_id": [f"D{i:07d}" for i in range(1, rows + 1)],
+        "carat": carat,
+        "cut": rng.choice(CUTS, rows),
+        "color": rng.choice(COLORS, rows),
+        "clarity": rng.choice(CLARITIES, rows),
+        "price_usd": price,
+        "shape": rng.choice(SHAPES, rows),
+        "certification": rng.choice(CERTIFICATIONS, rows),
+        "availability": rng.choice(AVAILABILITY, rows),
+    })
+    # A few missing values, as real spreadsheets have
+    df.loc[rng.random(rows) < 0.02, "certification"] = np.nan
+    return df
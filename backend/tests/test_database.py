@@ -0,0 +1,97 @@
+"""Tests for the write-behind message queue (run from backend: python -m pytest tests)"""
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from app import database
+from app.database import WriteBehindQueue
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "chat.db"))
+    database.init_db(write_behind=False)
+    yield
+    database.close_db()
+
+
+def stored_rows(session_id: str):
+    with database.get_pool().connection() as conn:
+        return [tuple(row) for row in conn.execute(
+            'SELECT role, content FROM messages WHERE session_id = ? ORDER BY id', (session_id,)
+        )]
+
+
+def start_writer(monkeypatch, pool, flush_interval: float = 0.0) -> WriteBehindQueue:
+    writer = WriteBehindQueue(pool, flush_interval=flush_interval)
+    monkeypatch.setattr(database, "_writer", writer)
+    return writer
+
+
+class FlakyPool:
+    """Pool whose first few write transactions insert their rows and then fail"""
+
+    def __init__(self, pool, failures: int):
+        self.pool = pool
+        self.failures = failures
+
+    @contextmanager
+    def connection(self):
+        with self.pool.connection() as conn:
+            yield conn
+            if self.failures > 0:
+                self.failures -= 1
+                raise sqlite3.OperationalError("database is locked")
+
+
+def test_queued_messages_are_read_before_they_are_written(db, monkeypatch):
+    database.save_message("s1", "assistant", "Welcome!")
+    # The writer waits a second for more rows before its first batch
+    writer = start_writer(monkeypatch, database.get_pool(), flush_interval=1.0)
+    database.save_message("s1", "user", "Any ovals?")
+    database.save_message("s1", "assistant", "Three of them.")
+    database.save_message("s2", "user", "Hello")
+
+    assert stored_rows("s1") == [("assistant", "Welcome!")]
+    history = database.get_chat_history("s1")
+    assert [(m["role"], m["content"]) for m in history] == [
+        ("assistant", "Welcome!"), ("user", "Any ovals?"), ("assistant", "Three of them.")
+    ]
+    assert all(m["timestamp"] for m in history)
+    assert [m["content"] for m in database.get_chat_history("s1", limit=2)] == ["Any ovals?", "Three of them."]
+    assert database.count_messages("s1") == 3
+    assert database.count_messages("s2") == 1
+
+    writer.flush()
+    assert database.get_chat_history("s1") == history
+    assert database.count_messages("s1") == 3
+    writer.stop()
+
+
+def test_failed_batch_is_retried_without_losing_or_repeating_rows(db, monkeypatch):
+    monkeypatch.setattr(WriteBehindQueue, "RETRY_DELAY", 0.0)
+    writer = start_writer(monkeypatch, FlakyPool(database.get_pool(), failures=2))
+    messages = [("user", "Any ovals?"), ("assistant", "Three of them."), ("user", "Cheapest?")]
+    for role, content in messages:
+        database.save_message("s1", role, content)
+    writer.flush()
+
+    assert writer.pool.failures == 0
+    assert stored_rows("s1") == messages
+    assert database.count_messages("s1") == 3
+    assert [(m["role"], m["content"]) for m in database.get_chat_history("s1")] == messages
+    writer.stop()
+
+
+def test_batch_that_keeps_failing_is_dropped_once(db, monkeypatch):
+    monkeypatch.setattr(WriteBehindQueue, "RETRY_DELAY", 0.0)
+    writer = start_writer(monkeypatch, FlakyPool(database.get_pool(), failures=WriteBehindQueue.WRITE_ATTEMPTS))
+    database.save_message("s1", "user", "Any ovals?")
+    writer.flush()
+    database.save_message("s1", "user", "Hello again")
+    writer.flush()
+
+    assert stored_rows("s1") == [("user", "Hello again")]
+    assert database.count_messages("s1") == 1
+    writer.stop()
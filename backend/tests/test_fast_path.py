@@ -0,0 +1,104 @@
+"""Tests for the fast path's question parsing and stock handling (run from backend: python -m pytest tests)"""
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from app.services.diamond_search import DiamondIndex
+from app.services.fast_path import FastPathAnswerer
+
+ROWS = [
+    # carat, cut, color, clarity, price, shape, availability
+    (2.0, "Ideal", "E", "VS1", 9000, "Emerald", "In Stock"),
+    (2.02, "Premium", "G", "SI1", 7000, "Emerald", "Reserved"),
+    (1.0, "Ideal", "D", "VVS1", 5000, "Round", "In Stock"),
+    (0.98, "Very Good", "F", "VS2", 3500, "Round", "On Request"),
+    (1.5, "Good", "H", "SI2", 4200, "Oval", "Reserved"),
+]
+COLUMNS = ["carat", "cut", "color", "clarity", "price_usd", "shape", "availability"]
+
+
+def make_index(availability: bool = True) -> DiamondIndex:
+    data = pd.DataFrame(ROWS, columns=COLUMNS)
+    if not availability:
+        data = data.drop(columns="availability")
+    return DiamondIndex(data)
+
+
+@pytest.fixture
+def answerer() -> FastPathAnswerer:
+    return FastPathAnswerer(enabled=True)
+
+
+def answer(answerer: FastPathAnswerer, message: str, availability: bool = True):
+    snapshot = SimpleNamespace(diamond_index=make_index(availability), version=1)
+    return answerer.answer(message, snapshot)
+
+
+@pytest.mark.parametrize("message, intent, ranges, members", [
+    ("do you have a 2 carat emerald cut?", "availability",
+     {"carat": (1.9, 2.1)}, {"shape": ["emerald"]}),
+    ("what's your cheapest oval", "superlative", {}, {"shape": ["oval"]}),
+    ("how many ideal cut round diamonds do you have", "count",
+     {}, {"cut": ["ideal"], "shape": ["round"]}),
+    ("price range for D-F color diamonds", "price_range", {}, {"color": ["d", "e", "f"]}),
+    ("any emerald diamonds under $8,000", "availability", {"price": (None, 8000)}, {"shape": ["emerald"]}),
+    ("show me round diamonds between 1 and 2 carats", "availability",
+     {"carat": (1, 2)}, {"shape": ["round"]}),
+])
+def test_parse_slots(answerer, message, intent, ranges, members):
+    question = answerer.parse(message, make_index())
+    assert question is not None
+    assert question.intent == intent
+    assert question.ranges == ranges
+    assert question.members == members
+
+
+@pytest.mark.parametrize("message", [
+    "do you have a 2 carat emerald cut and 1 carat round",
+    "any ovals under $5,000 and over $10,000",
+    "round diamonds between $3k and $5k under 4000",
+    "a 2 carat and a 3 carat emerald?",
+])
+def test_parse_rejects_repeated_numeric_slots(answerer, message):
+    assert answerer.parse(message, make_index()) is None
+
+
+@pytest.mark.parametrize("message", [
+    "what is the price of the second diamond",
+    "can you show me something cheaper please",
+    "is a 2 carat oval a good choice for an engagement ring?",
+    "how much?",
+])
+def test_parse_rejects_follow_ups_and_free_form(answerer, message):
+    assert answerer.parse(message, make_index()) is None
+
+
+def test_parse_marks_stock_questions(answerer):
+    assert answerer.parse("any emerald diamonds in stock?", make_index()).asks_stock
+    assert answerer.parse("is a 1 carat round available", make_index()).asks_stock
+    assert not answerer.parse("do you have a 1 carat round", make_index()).asks_stock
+
+
+def test_counts_only_in_stock_diamonds(answerer):
+    reply = answer(answerer, "how many emerald diamonds do you have")
+    # One of the two emeralds is reserved
+    assert reply.startswith("Just one in stock right now")
+    assert "$9,000" in reply
+
+    reply = answer(answerer, "any oval diamonds in stock?")
+    assert reply.startswith("We don't have any oval diamonds in stock right now")
+
+
+def test_without_availability_column_makes_no_stock_claims(answerer):
+    reply = answer(answerer, "how many emerald diamonds do you have", availability=False)
+    assert reply == "We have 2 emerald diamonds in our inventory. Want me to help narrow it down?"
+    for message in ("do you have a 1 carat round", "what's your cheapest oval", "do you have ovals"):
+        reply = answer(answerer, message, availability=False)
+        assert "in stock" not in reply and not reply.startswith("Yes")
+
+
+def test_stock_questions_go_to_model_when_stock_is_unknown(answerer):
+    assert answer(answerer, "any emerald diamonds in stock?", availability=False) is None
+    assert answer(answerer, "is a 1 carat round available", availability=False) is None
+    assert answerer.fallbacks == 2
@@ -0,0 +1,124 @@
+"""Tests for archiving idle chat sessions (run from backend: python -m pytest tests)"""
+import asyncio
+import gzip
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import database
+from app.services import history_retention as retention_module
+from app.services.history_retention import HistoryRetention
+
+
+def stamp(days_ago: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@pytest.fixture
+def retention(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "chat.db"))
+    monkeypatch.setattr(retention_module, "BATCH_PAUSE", 0)
+    database.init_db(write_behind=False)
+    yield HistoryRetention(ttl_days=30, interval=0, archive_dir=str(tmp_path / "archive"), batch_sessions=2)
+    database.close_db()
+
+
+def insert(session_id: str, days_ago: float, *contents: str) -> None:
+    # Inserted oldest first: retention relies on ids growing with time
+    with database.get_pool().connection() as conn:
+        conn.executemany(
+            'INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)',
+            [(session_id, "user" if i % 2 else "assistant", content, stamp(days_ago))
+             for i, content in enumerate(contents)]
+        )
+
+
+def stored(session_id: str):
+    return [message["content"] for message in database.iter_messages(session_id)]
+
+
+def exported(retention: HistoryRetention, session_id: str):
+    return [message["content"] for message in retention.export(session_id)]
+
+
+def seed() -> None:
+    insert("old-1", 45, "Welcome!", "Any ovals?", "Three of them.")
+    insert("old-2", 40, "Welcome!", "Héllo — 2ct emerald?")
+    insert("old-3", 35, "Welcome!")
+    insert("returning", 40, "Welcome!", "Any rounds?")
+    insert("recent", 29, "Welcome!", "Cheapest cushion?")
+    insert("returning", 1, "Back again")
+
+
+def test_archives_only_sessions_idle_past_the_ttl(retention):
+    seed()
+    archived = []
+    retention.on_archived = archived.extend
+
+    result = asyncio.run(retention.run_once())
+
+    assert sorted(archived) == ["old-1", "old-2", "old-3"]
+    assert (result["sessions"], result["messages"]) == (3, 6)
+    for session_id in archived:
+        assert database.count_messages(session_id) == 0
+        assert retention.has_history(session_id)
+    assert exported(retention, "old-1") == ["Welcome!", "Any ovals?", "Three of them."]
+    assert exported(retention, "old-2") == ["Welcome!", "Héllo — 2ct emerald?"]
+    assert stored("returning") == ["Welcome!", "Any rounds?", "Back again"]
+    assert stored("recent") == ["Welcome!", "Cheapest cushion?"]
+
+    # Nothing left to archive
+    assert asyncio.run(retention.run_once())["sessions"] == 0
+
+
+def test_message_after_last_id_survives(retention):
+    insert("s1", 40, "Welcome!", "Any ovals?")
+    idle = database.find_idle_sessions(stamp(30), 10)
+    assert [(session["session_id"], session["messages"]) for session in idle] == [("s1", 2)]
+
+    # The customer comes back between the scan and the archive write
+    insert("s1", 0, "Still there?")
+    retention.archive_dir.mkdir(parents=True)
+    _, deleted = retention._archive_batch(idle)
+
+    assert deleted == 2
+    assert stored("s1") == ["Still there?"]
+    assert exported(retention, "s1") == ["Welcome!", "Any ovals?", "Still there?"]
+
+
+def test_archive_member_is_readable_before_rows_are_deleted(retention, monkeypatch):
+    seed()
+    checked = []
+    archive_sessions = retention_module.archive_sessions
+
+    def checked_archive_sessions(segments):
+        for segment in segments:
+            # Still in the database, and already complete in the archive
+            from_archive = [m["content"] for m in retention._read_segment(segment, segment["session_id"])]
+            assert from_archive == stored(segment["session_id"])
+            path = retention.archive_dir / segment["archive"]
+            with open(path, "rb") as f:
+                f.seek(segment["member_offset"])
+                assert gzip.decompress(f.read(segment["member_length"]))
+            checked.append(segment["session_id"])
+        return archive_sessions(segments)
+
+    monkeypatch.setattr(retention_module, "archive_sessions", checked_archive_sessions)
+    asyncio.run(retention.run_once())
+    assert sorted(checked) == ["old-1", "old-2", "old-3"]
+
+
+def test_failed_archive_write_deletes_nothing(retention, monkeypatch):
+    seed()
+
+    def failing_fsync(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(retention_module.os, "fsync", failing_fsync)
+    with pytest.raises(OSError):
+        asyncio.run(retention.run_once())
+
+    assert stored("old-1") == ["Welcome!", "Any ovals?", "Three of them."]
+    assert stored("old-2") == ["Welcome!", "Héllo — 2ct emerald?"]
+    for session_id in ("old-1", "old-2", "old-3"):
+        assert database.get_archived_segments(session_id) == []
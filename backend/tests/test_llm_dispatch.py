@@ -0,0 +1,247 @@
+"""Tests for the model call dispatcher (run from backend: python -m pytest tests)"""
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm_dispatch import HEDGE_MIN_SAMPLES, DeadlineExceeded, LLMDispatcher, LLMUnavailable
+
+
+def make_dispatcher(**kwargs) -> LLMDispatcher:
+    options = {"max_concurrency": 1, "max_queue": 0, "rate": 0, "hedge_enabled": False}
+    options.update(kwargs)
+    return LLMDispatcher(**options)
+
+
+async def sleeper(seconds: float, result="ok"):
+    await asyncio.sleep(seconds)
+    return result
+
+
+def test_rejected_calls_count_as_requests():
+    dispatcher = make_dispatcher(hedge_budget=0.5)
+
+    async def scenario():
+        assert await dispatcher.run("chat", lambda: sleeper(0.05)) == "ok"
+        running = asyncio.create_task(dispatcher.run("chat", lambda: sleeper(0.05)))
+        await asyncio.sleep(0.01)
+        for _ in range(5):
+            with pytest.raises(LLMUnavailable) as rejected:
+                dispatcher.check("chat")
+            assert rejected.value.status_code == 429
+            # Retry-After is estimated from the dispatched call, not a negative count
+            assert dispatcher._retry_after() > 0
+        assert await running == "ok"
+        # Rejections under load must not use up the hedge budget
+        assert dispatcher._may_hedge("chat")
+
+    asyncio.run(scenario())
+    stats = dispatcher.stats()["stages"]["chat"]
+    assert stats["requests"] == 7
+    assert stats["rejected"] == 5
+    assert dispatcher._stage("chat").dispatched == 2
+    assert 0.04 < stats["service_time_avg"] < 0.5
+    assert stats["queue_wait_avg"] < 0.01
+
+
+def test_provider_busy_rejections_count_as_requests():
+    dispatcher = make_dispatcher(max_queue=10, provider_backoff=5)
+    dispatcher.provider_busy("chat", RuntimeError("429 Resource exhausted"))
+
+    async def scenario():
+        with pytest.raises(LLMUnavailable) as rejected:
+            await dispatcher.run("chat", lambda: sleeper(0))
+        assert rejected.value.status_code == 503
+
+    asyncio.run(scenario())
+    stats = dispatcher.stats()["stages"]["chat"]
+    assert (stats["requests"], stats["rejected"], stats["provider_busy"]) == (1, 1, 1)
+    assert dispatcher._stage("chat").dispatched == 0
+    assert stats["service_time_avg"] == 0.0
+
+
+class FakeCall:
+    """Model call that answers after a delay (or fails), recording when it started and if it was cancelled"""
+
+    def __init__(self, seconds: float, result="ok", error: Exception = None):
+        self.seconds = seconds
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = None
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        self.started = time.monotonic()
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def assert_slots_free(dispatcher: LLMDispatcher) -> None:
+    assert dispatcher._active == 0
+    assert dispatcher._waiting == 0
+    assert dispatcher._semaphore._value == dispatcher.max_concurrency
+
+
+def hedging_dispatcher(**kwargs) -> LLMDispatcher:
+    options = {"max_concurrency": 2, "max_queue": 10, "hedge_enabled": True,
+               "hedge_min_delay": 0.1, "hedge_budget": 1.0}
+    options.update(kwargs)
+    dispatcher = make_dispatcher(**options)
+    # Recent first attempts all took 50ms, so calls are hedged after the 100ms minimum
+    dispatcher._stage("chat").attempts.extend([0.05] * HEDGE_MIN_SAMPLES)
+    return dispatcher
+
+
+def test_deadline_in_queue():
+    dispatcher = make_dispatcher(max_queue=10)
+    queued = FakeCall(0)
+
+    async def scenario():
+        running = asyncio.create_task(dispatcher.run("chat", FakeCall(0.2)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(DeadlineExceeded) as expired:
+            await dispatcher.run("chat", queued, deadline=time.monotonic() + 0.05)
+        assert expired.value.phase == "queue"
+        assert expired.value.status_code == 504
+        assert await running == "ok"
+
+    asyncio.run(scenario())
+    assert queued.calls == 0
+    assert dispatcher.stats()["stages"]["chat"]["deadline_exceeded"] == 1
+    assert_slots_free(dispatcher)
+
+
+def test_deadline_in_generation_cancels_the_call():
+    dispatcher = make_dispatcher()
+    call = FakeCall(1.0)
+
+    async def scenario():
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded) as expired:
+            await dispatcher.run("chat", call, deadline=start + 0.05)
+        assert expired.value.phase == "generation"
+        assert time.monotonic() - start < 0.5
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert call.cancelled
+    # Counted for the hedging threshold as taking the whole deadline
+    assert list(dispatcher._stage("chat").attempts) == [pytest.approx(0.05, abs=0.03)]
+    assert_slots_free(dispatcher)
+
+
+def test_hedge_starts_after_the_delay_and_wins():
+    dispatcher = hedging_dispatcher()
+    primary, hedge = FakeCall(1.0, "primary"), FakeCall(0.01, "hedge")
+
+    async def scenario():
+        assert dispatcher.hedge_delay("chat") == pytest.approx(0.1)
+        start = time.monotonic()
+        assert await dispatcher.run("chat", primary, hedge=hedge) == "hedge"
+        assert hedge.started - start >= 0.09
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert primary.cancelled
+    stats = dispatcher.stats()["stages"]["chat"]
+    assert (stats["hedged"], stats["hedge_wins"]) == (1, 1)
+    # The cancelled primary says nothing about how long calls take
+    assert len(dispatcher._stage("chat").attempts) == HEDGE_MIN_SAMPLES
+    assert_slots_free(dispatcher)
+
+
+def test_losing_hedge_is_cancelled_and_its_slot_released():
+    dispatcher = hedging_dispatcher()
+    primary, hedge = FakeCall(0.15, "primary"), FakeCall(1.0, "hedge")
+
+    async def scenario():
+        assert await dispatcher.run("chat", primary, hedge=hedge) == "primary"
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert hedge.calls == 1 and hedge.cancelled
+    stats = dispatcher.stats()["stages"]["chat"]
+    assert (stats["hedged"], stats["hedge_wins"]) == (1, 0)
+    assert_slots_free(dispatcher)
+
+
+def test_fast_call_is_not_hedged():
+    dispatcher = hedging_dispatcher()
+    hedge = FakeCall(0, "hedge")
+
+    async def scenario():
+        assert await dispatcher.run("chat", FakeCall(0.02, "primary"), hedge=hedge) == "primary"
+
+    asyncio.run(scenario())
+    assert hedge.calls == 0
+    assert dispatcher.stats()["stages"]["chat"]["hedged"] == 0
+
+
+def test_hedges_stay_within_budget_and_free_slots():
+    dispatcher = hedging_dispatcher(hedge_budget=0.5)
+    hedges = [FakeCall(0.01, "hedge") for _ in range(2)]
+
+    async def scenario():
+        assert await dispatcher.run("chat", FakeCall(0.3, "primary"), hedge=hedges[0]) == "hedge"
+        # A second hedge would make 1 of 2 calls hedged, over the 50% budget
+        assert await dispatcher.run("chat", FakeCall(0.3, "primary"), hedge=hedges[1]) == "primary"
+
+    asyncio.run(scenario())
+    assert [hedge.calls for hedge in hedges] == [1, 0]
+
+    # With every slot taken there is nowhere to send a hedge
+    dispatcher = hedging_dispatcher(max_concurrency=1)
+    hedge = FakeCall(0.01, "hedge")
+
+    async def no_free_slot():
+        assert await dispatcher.run("chat", FakeCall(0.3, "primary"), hedge=hedge) == "primary"
+
+    asyncio.run(no_free_slot())
+    assert hedge.calls == 0
+
+
+def test_coalesced_followers_share_the_leaders_result():
+    dispatcher = make_dispatcher(max_queue=10)
+    leader = FakeCall(0.05, {"reply": "Three ovals"})
+    follower = FakeCall(0, {"reply": "unused"})
+
+    async def scenario():
+        results = await asyncio.gather(
+            dispatcher.run("chat", leader, coalesce_key="any ovals?"),
+            *[dispatcher.run("chat", follower, coalesce_key="any ovals?") for _ in range(3)]
+        )
+        assert all(result is results[0] for result in results)
+        assert results[0] == {"reply": "Three ovals"}
+
+    asyncio.run(scenario())
+    assert (leader.calls, follower.calls) == (1, 0)
+    stats = dispatcher.stats()["stages"]["chat"]
+    assert (stats["requests"], stats["coalesced"]) == (4, 3)
+    assert dispatcher._inflight == {}
+
+
+def test_coalesced_followers_get_the_leaders_error():
+    dispatcher = make_dispatcher(max_queue=10)
+    leader = FakeCall(0.05, error=ValueError("model failed"))
+
+    async def scenario():
+        results = await asyncio.gather(
+            dispatcher.run("chat", leader, coalesce_key="any ovals?"),
+            *[dispatcher.run("chat", FakeCall(0), coalesce_key="any ovals?") for _ in range(2)],
+            return_exceptions=True
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+        # Nothing is left in flight, so the next identical call runs again
+        assert await dispatcher.run("chat", FakeCall(0, "retried"), coalesce_key="any ovals?") == "retried"
+
+    asyncio.run(scenario())
+    assert leader.calls == 1
+    assert dispatcher.stats()["stages"]["chat"]["errors"] == 1
@@ -1,8 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import ChatHeader from './ChatHeader';
 import MessageList from './MessageList';
 import MessageInput from './MessageInput';
-import { chatAPI } from '../services/api';
+import { chatAPI, connectChatSocket } from '../services/api';
 import '../styles/chat.css';
 
 const ChatContainer = () => {
@@ -10,10 +10,78 @@ const ChatContainer = () => {
     const [isTyping, setIsTyping] = useState(false);
     const [sessionId] = useState(() => `session_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`);
     const [error, setError] = useState(null);
+    // Open WebSocket connection, or null to fall back to HTTP requests
+    const socketRef = useRef(null);
+    // Whether the last bot message is still receiving streamed tokens
+    const streamingRef = useRef(false);
+    // Whether a message sent over the socket is still waiting for its reply to finish
+    const awaitingReplyRef = useRef(false);
 
     useEffect(() => {
-        // Load greeting message on mount
-        loadGreeting();
+        // Prefer a persistent connection; it also delivers the greeting
+        let connected = false;
+        let unmounted = false;
+        setIsTyping(true);
+        const socket = connectChatSocket(sessionId, {
+            session: (event) => {
+                connected = true;
+                setIsTyping(false);
+                setMessages([{ content: event.greeting, timestamp: new Date().toISOString(), isBot: true }]);
+            },
+            typing: (event) => setIsTyping(event.active),
+            token: (event) => {
+                const wasStreaming = streamingRef.current;
+                streamingRef.current = true;
+                setMessages(prev => {
+                    if (!wasStreaming) {
+                        return [...prev, { content: event.token, timestamp: new Date().toISOString(), isBot: true }];
+                    }
+                    const last = prev[prev.length - 1];
+                    return [...prev.slice(0, -1), { ...last, content: last.content + event.token }];
+                });
+            },
+            done: () => {
+                streamingRef.current = false;
+                awaitingReplyRef.current = false;
+            },
+            error: (event) => {
+                console.error('Chat connection error:', event.detail);
+                streamingRef.current = false;
+                awaitingReplyRef.current = false;
+                setError('Failed to get response. Please try again.');
+            },
+            close: () => {
+                if (unmounted) {
+                    return;
+                }
+                socketRef.current = null;
+                const wasStreaming = streamingRef.current;
+                streamingRef.current = false;
+                setIsTyping(false);
+                if (awaitingReplyRef.current) {
+                    // Dropped mid-reply: replace the partial answer and let the user resend over HTTP
+                    awaitingReplyRef.current = false;
+                    setError('Connection lost while answering. Please send your message again.');
+                    setMessages(prev => [
+                        ...(wasStreaming ? prev.slice(0, -1) : prev),
+                        {
+                            content: 'Sorry, the connection was interrupted before I could finish. Please try again.',
+                            timestamp: new Date().toISOString(),
+                            isBot: true
+                        }
+                    ]);
+                }
+                if (!connected) {
+                    // WebSocket unavailable (e.g. blocked by a proxy): use HTTP
+                    loadGreeting();
+                }
+            },
+        });
+        socketRef.current = socket;
+        return () => {
+            unmounted = true;
+            socket.close();
+        };
     }, []);
 
     const loadGreeting = async () => {
@@ -52,6 +120,13 @@ const ChatContainer = () => {
         setIsTyping(true);
         setError(null);
 
+        if (socketRef.current && socketRef.current.isOpen()) {
+            // The reply arrives as typing/token/done events
+            awaitingReplyRef.current = true;
+            socketRef.current.send(messageText);
+            return;
+        }
+
         try {
             // Send message to backend
             const response = await chatAPI.sendMessage(messageText, sessionId);
@@ -1,12 +1,15 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import { Link } from 'react-router-dom';
 import '../styles/chat.css'; // Reuse existing styles for consistency
 
+const MAX_LOG_LINES = 500;
+
 const Insight = () => {
     const [stats, setStats] = useState(null);
     const [logs, setLogs] = useState([]);
     const [loading, setLoading] = useState(true);
+    const logCursor = useRef(null);
 
     useEffect(() => {
         const fetchData = async () => {
@@ -14,8 +17,13 @@ const Insight = () => {
                 const statsRes = await axios.get('http://localhost:8000/insight/stats');
                 setStats(statsRes.data);
 
-                const logsRes = await axios.get('http://localhost:8000/insight/logs');
-                setLogs(logsRes.data.logs);
+                // Only fetch lines written since the last poll
+                const logsRes = await axios.get('http://localhost:8000/insight/logs', {
+                    params: logCursor.current ? { cursor: logCursor.current } : {}
+                });
+                const { logs: newLogs, cursor, reset } = logsRes.data;
+                logCursor.current = cursor;
+                setLogs(prev => (reset ? newLogs : [...prev, ...newLogs]).slice(-MAX_LOG_LINES));
             } catch (error) {
                 console.error("Error fetching insight data:", error);
             } finally {
@@ -59,4 +59,34 @@ export const chatAPI = {
     },
 };
 
+/**
+ * Open a persistent chat connection for a session
+ * @param {string} sessionId - Session identifier
+ * @param {Object} handlers - Callbacks by event type (session, typing, token, done, error), plus close
+ * @returns {Object} Connection with send(message), close() and isOpen()
+ */
+export const connectChatSocket = (sessionId, handlers) => {
+    const url = `${API_BASE_URL.replace(/^http/, 'ws')}/chat/ws?session_id=${encodeURIComponent(sessionId)}`;
+    const socket = new WebSocket(url);
+
+    socket.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        const handler = handlers[data.type];
+        if (handler) {
+            handler(data);
+        }
+    };
+    socket.onclose = (event) => {
+        if (handlers.close) {
+            handlers.close(event);
+        }
+    };
+
+    return {
+        send: (message) => socket.send(JSON.stringify({ type: 'message', message })),
+        close: () => socket.close(),
+        isOpen: () => socket.readyState === WebSocket.OPEN,
+    };
+};
+
 export default apiClient;